@@ -0,0 +1,482 @@
+"""
+Async network module for Mediascope API
+"""
+import asyncio
+import copy
+import datetime
+import re
+from . import availability
+from . import errors
+from . import cache
+from . import poll
+from . import ratelimit
+from .net import MediascopeApiNetwork
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class AsyncMediascopeApiNetwork(MediascopeApiNetwork):
+    """
+    Класс для асинхронной работы с сетью Mediascope API.
+    Методы отправки запросов повторяют методы MediascopeApiNetwork, но являются корутинами.
+    Все запросы одного цикла событий выполняются через один пул соединений (httpx.AsyncClient),
+    для каждого цикла событий (например, каждого вызова asyncio.run) создается свой пул
+    """
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, settings_filename: str = None, cache_path: str = None, cache_enabled: bool = True,
+                 username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
+                 client_secret: str = None, keycloak_url: str = None, cache_backend: cache.CacheBackend = None,
+                 token_file: str = None, token_margin: float = 30, max_connections: int = 100, timeout: float = 60,
+                 transport=None):
+        if httpx is None:
+            raise ImportError('Для асинхронной работы необходимо установить пакет httpx: '
+                              'pip install mediascope_api_lib[async]')
+        super().__init__(settings_filename, cache_path, cache_enabled, username, passw, root_url, client_id,
+                         client_secret, keycloak_url, cache_backend, token_file, token_margin)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.transport = transport
+        # пул соединений, блокировка обновления токена и выполняемые запросы для каждого цикла событий
+        self._loop_states = {}
+
+    @classmethod
+    def from_network(cls, network: MediascopeApiNetwork, **kwargs):
+        """
+        Создать асинхронный сетевой модуль с настройками существующего MediascopeApiNetwork
+        """
+        anet = cls(username=network.username, passw=network.passw, root_url=network.root_url,
+                   client_id=network.client_id, client_secret=network.client_secret,
+                   keycloak_url=network.keycloak_url, **kwargs)
+        anet.proxies = network.proxies
+        if 'cache_backend' not in kwargs:
+            anet.cache_backend = network.cache_backend
+        anet.cache_ttl = dict(network.cache_ttl)
+        anet.cache_in_as_set = network.cache_in_as_set
+        anet.published_until = network.published_until
+        anet.rate_limiter = network.rate_limiter
+        anet.task_submit_retries = network.task_submit_retries
+        if 'token_file' not in kwargs and 'token_margin' not in kwargs:
+            # общий токен: обновление в одном модуле используется другим
+            anet.token_manager = network.token_manager
+        else:
+            anet.token = network.token
+        return anet
+
+    def _get_loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loop_states.get(loop)
+        if state is None:
+            # состояние завершенных циклов событий больше не используется
+            for closed in [i for i in self._loop_states if i.is_closed()]:
+                del self._loop_states[closed]
+            state = self._loop_states[loop] = {'client': None, 'token_lock': asyncio.Lock(), 'in_flight': {}}
+        return state
+
+    @property
+    def client(self):
+        """
+        Пул соединений текущего цикла событий или None, если он еще не создан
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        state = self._loop_states.get(loop)
+        return state['client'] if state is not None else None
+
+    def _get_client(self):
+        state = self._get_loop_state()
+        if state['client'] is None:
+            proxy = self.proxies.get('https') if self.proxies is not None else None
+            client_args = {
+                'limits': httpx.Limits(max_connections=self.max_connections,
+                                       max_keepalive_connections=self.max_connections),
+                'timeout': self.timeout
+            }
+            if self.transport is not None:
+                client_args['transport'] = self.transport
+            if proxy:
+                client_args['proxy'] = proxy
+            state['client'] = httpx.AsyncClient(**client_args)
+        return state['client']
+
+    async def close(self):
+        """
+        Закрыть пул соединений текущего цикла событий
+        """
+        state = self._loop_states.pop(asyncio.get_running_loop(), None)
+        if state is not None and state['client'] is not None:
+            await state['client'].aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(self, method: str, url: str, **kwargs):
+        client = self._get_client()
+        bucket = self.rate_limiter.get_bucket(method, url)
+        # отправка задания не повторяется при ответах 502, 503, 504, см. send_task_request
+        is_submit = url.startswith(self.root_url) and self.is_task_submit(method, url[len(self.root_url):])
+        retryable = self.rate_limiter.is_retryable(method, url)
+        req = None
+        attempt = 0
+        throttled = 0
+        while attempt <= self.retries.total:
+            if bucket is not None:
+                delay = bucket.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            req = await client.request(method.upper(), url, **kwargs)
+            if req.status_code == 429 and retryable and throttled < self.rate_limiter.max_retries:
+                # ответ 429 повторяется после паузы из заголовка Retry-After, частота запросов группы снижается
+                retry_after = ratelimit.get_retry_after(req.headers, throttled)
+                if bucket is None:
+                    bucket = self.rate_limiter.get_throttled_bucket(method, url)
+                if bucket is not None:
+                    bucket.on_throttled(retry_after)
+                else:
+                    await asyncio.sleep(retry_after)
+                throttled += 1
+                continue
+            if req.status_code not in self.RETRY_STATUSES or is_submit:
+                break
+            attempt += 1
+            if attempt <= self.retries.total:
+                await asyncio.sleep(self.retries.backoff_factor * (2 ** (attempt - 1)))
+        if bucket is not None and req.status_code != 429:
+            bucket.on_success()
+        return req
+
+    async def get_token(self, username: str, passw: str) -> dict:
+        """
+        Получить токен по имени пользователя и паролю
+        """
+        my_token_req = await self._request(
+            'post', self.keycloak_url,
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'username': username,
+                'password': passw,
+                'grant_type': 'password'
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        )
+        if my_token_req.status_code == 200:
+            t = my_token_req.json()
+            t['now'] = datetime.datetime.now()
+            return t
+        if my_token_req.status_code == 401:
+            raise errors.AuthorizationError('Ошибка авторизации!\nНе верный логин или пароль. ' +
+                                            'Проверьте параметры указанные в файле: settings.json', 401)
+        if my_token_req.status_code == 403:
+            raise errors.AccessForbiddenError()
+        raise errors.MediascopeApiError(f'Status code {my_token_req.status_code} response: {my_token_req.text}',
+                                        my_token_req.status_code)
+
+    async def get_token_by_refresh(self, refresh_token: str) -> dict:
+        """
+        Получить новый токен по refresh_token
+        """
+        my_token_req = await self._request(
+            'post', self.keycloak_url,
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'refresh_token': refresh_token,
+                'grant_type': 'refresh_token'
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        )
+        if my_token_req.status_code == 200:
+            t = my_token_req.json()
+            t['now'] = datetime.datetime.now()
+            return t
+        raise errors.MediascopeApiError(f'Status code {my_token_req.status_code} response: {my_token_req.text}',
+                                        my_token_req.status_code)
+
+    async def refresh_token(self):
+        """
+        Обновить текущий токен или получить новый. Одновременно выполняется только одно обновление
+        """
+        manager = self.token_manager
+        if manager.is_valid(self.token):
+            return
+        async with self._get_loop_state()['token_lock']:
+            if manager.is_valid(self.token):
+                return
+            token = None
+            if self.token.get('refresh_token') and manager.is_valid(self.token, 'refresh_expires_in'):
+                try:
+                    token = await self.get_token_by_refresh(self.token['refresh_token'])
+                except errors.MediascopeApiError:
+                    token = None
+            if token is None:
+                token = await self.get_token(self.username, self.passw)
+            manager.save(token)
+            self.token = token
+
+    def _get_headers(self, content_type='application/json'):
+        return {'Authorization': f'Bearer {self.token["access_token"]}',
+                'Content-Type': content_type}
+
+    async def send_request(self, method: str, endpoint: str, data: dict = None, use_cache: bool = False):
+        """
+        Асинхронно отправляет запрос в Mediascope-API, см. MediascopeApiNetwork.send_request
+        """
+        if method not in ['post', 'get', 'delete']:
+            raise ValueError(f'Method "{method}" is not supported')
+        if data is None:
+            data = []
+        await self.refresh_token()
+
+        cache_query = cache.get_query(method, endpoint, data, self.cache_in_as_set)
+        if use_cache and method in ['post', 'get']:
+            cache_data = self._get_cache(cache_query, endpoint, data=data)
+            if cache_data is not None:
+                return cache_data
+
+        async def send():
+            published_until = self.published_until
+            req = await self._request(method, self.root_url + endpoint,
+                                      headers=self._get_headers('application/json; charset=utf-8'),
+                                      content=f'{data}'.encode('utf-8'))
+            if req.status_code == 200:
+                rj = self._req_to_json(req, endpoint, data)
+                if use_cache:
+                    self._save_cache(cache_query, rj, availability.get_period(data), published_until)
+                return rj
+            self._raise_error(req)
+            return None
+
+        if use_cache and method in ['post', 'get']:
+            return await self._single_flight_async(('send_request', cache_query), send)
+        return await send()
+
+    async def send_task_request(self, endpoint: str, data, retries: int = None):
+        """
+        Асинхронно отправляет задание на расчет, см. MediascopeApiNetwork.send_task_request
+        """
+        if retries is None:
+            retries = self.task_submit_retries
+        attempt = 0
+        while True:
+            active_before = await self.get_active_tasks_count() if attempt < retries else None
+            try:
+                return await self.send_request('post', endpoint, data)
+            except (errors.MediascopeApiError, httpx.TransportError) as e:
+                if not self._is_ambiguous_error(e):
+                    raise
+                error = e
+            active_after = await self.get_active_tasks_count() if attempt < retries else None
+            self._check_task_resubmit(error, attempt < retries, active_before, active_after)
+            attempt += 1
+            await asyncio.sleep(self.submit_retries.backoff_factor * (2 ** (attempt - 1)))
+
+    async def get_active_tasks_count(self):
+        """
+        Асинхронно получить количество активных задач пользователя, см. MediascopeApiNetwork.get_active_tasks_count
+        """
+        if self.ACTIVE_TASKS_COUNT_ENDPOINT is None or not self._active_tasks_count_supported:
+            return None
+        try:
+            count = await self.send_request('get', self.ACTIVE_TASKS_COUNT_ENDPOINT)
+            return int(count.get('count'))
+        except errors.NotFoundError:
+            self._active_tasks_count_supported = False
+            return None
+        except (errors.MediascopeApiError, httpx.HTTPError, AttributeError, TypeError, ValueError):
+            return None
+
+    def _is_ambiguous_error(self, e) -> bool:
+        if isinstance(e, errors.MediascopeApiError):
+            return e.code in self.AMBIGUOUS_STATUSES
+        # ошибки подключения означают, что запрос не дошел до сервера
+        return not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+    async def send_request_lo(self, method: str, endpoint: str, data: dict = None,
+                              use_cache: bool = False, limit: int = 1000):
+        """
+        Асинхронно отправляет запрос в Mediascope-API с постраничной загрузкой,
+        см. MediascopeApiNetwork.send_request_lo
+        """
+        if method not in ['post', 'get', 'delete']:
+            raise ValueError(f'Method "{method}" is not supported')
+        if data is None:
+            data = []
+
+        cache_query = cache.get_query(method, endpoint, data, self.cache_in_as_set)
+        if use_cache and method in ['post', 'get']:
+            cache_data = self._get_cache(cache_query, endpoint, data=data)
+            if cache_data is not None:
+                return cache_data
+
+        async def load():
+            published_until = self.published_until
+            result = await self._load_pages_async(method, endpoint, data, limit)
+            if use_cache:
+                self._save_cache(cache_query, result, availability.get_period(data), published_until)
+            return result
+
+        if use_cache and method in ['post', 'get']:
+            return await self._single_flight_async(('send_request_lo', cache_query, limit), load)
+        return await load()
+
+    async def _load_pages_async(self, method: str, endpoint: str, data, limit: int):
+        result = {'header': {'total': 0}}
+        result_data = []
+        offset = 0
+        is_reading = True
+
+        while is_reading:
+            await self.refresh_token()
+            if endpoint.rfind('?') >= 0:
+                url = self.root_url + endpoint + f'&offset={offset}&limit={limit}'
+            else:
+                url = self.root_url + endpoint + f'?offset={offset}&limit={limit}'
+            req = await self._request(method, url, headers=self._get_headers(), content=f'{data}')
+
+            if req.status_code != 200:
+                self._raise_error(req)
+                break
+            rj = self._req_to_json(req, endpoint, data)
+            if rj is None or not isinstance(rj, dict):
+                break
+            if 'header' not in rj or 'data' not in rj:
+                break
+
+            total = int(rj['header'].get('total', limit))
+            result['header']['total'] = total
+            offset += limit
+            if offset >= total:
+                is_reading = False
+
+            if isinstance(rj['data'], list):
+                result_data.extend(rj['data'])
+
+        result['data'] = result_data
+        return result
+
+    async def _single_flight_async(self, key, func):
+        """
+        Выполнить запрос один раз для всех задач, одновременно запрашивающих одно и то же,
+        см. MediascopeApiNetwork._single_flight
+        """
+        in_flight = self._get_loop_state()['in_flight']
+        future = in_flight.get(key)
+        if future is not None:
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = asyncio.get_running_loop().create_future()
+        in_flight[key] = future
+        try:
+            result = await func()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # ошибка передается ожидающим задачам, если их нет - не выводится предупреждение
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del in_flight[key]
+
+    async def send_raw_request(self, method: str, endpoint: str, data: dict = None):
+        """
+        Асинхронно отправляет запрос в Mediascope-API и получает результат в сыром виде,
+        см. MediascopeApiNetwork.send_raw_request
+        """
+        if method not in ['post', 'get', 'delete']:
+            raise ValueError(f'Method "{method}" is not supported')
+        if data is None:
+            data = []
+        await self.refresh_token()
+        req = await self._request(method, self.root_url + endpoint, headers=self._get_headers(), content=f'{data}')
+        if req.status_code == 200:
+            return req.text
+        self._raise_error(req)
+        return None
+
+    async def send_crossweb_request(self, method: str, endpoint: str, data: dict = None):
+        """
+        Асинхронно отправляет запрос в Mediascope-API для проекта CrossWeb,
+        см. MediascopeApiNetwork.send_crossweb_request
+        """
+        rx = re.compile(r"Задача (?P<taskid>[0-9a-f-]+) поступила в обработку..*")
+        if method not in ['post', 'get', 'delete']:
+            raise ValueError(f'Method "{method}" is not supported')
+        if data is None:
+            data = []
+        await self.refresh_token()
+        req = await self._request(method, self.root_url + endpoint, headers=self._get_headers(), content=f'{data}')
+        if req.status_code == 200:
+            mh = rx.match(req.text)
+            if mh is not None:
+                return {"taskId": mh.group(1), "message": req.text}
+            return None
+        self._raise_error(req)
+        return None
+
+
+async def wait_tasks(get_state, tsk, status_delay=None):
+    """
+    Асинхронно ожидает окончание расчета задания или заданий. Задания списка ожидаются одновременно
+
+    Parameters
+    ----------
+
+    get_state : coroutine function
+        Функция получения состояния задания по его идентификатору, возвращает кортеж (статус, ответ сервера)
+
+    tsk : dict|list
+        Задание или список заданий в формате [{'task': {...}}, ...]
+
+    status_delay : int
+        Задержка в секундах между опросом статуса. По умолчанию подбирается автоматически (см. poll.PollScheduler)
+
+    Returns
+    -------
+    tsk : dict|list
+        Возвращает задание или список заданий, None - если одно из заданий завершилось с ошибкой
+    """
+    if isinstance(tsk, list):
+        waits = [wait_tasks(get_state, t['task'], status_delay) for t in tsk
+                 if t.get('task') is not None and t['task'].get('taskId') is not None]
+        results = await asyncio.gather(*waits)
+        if any(r is None for r in results):
+            return None
+        return tsk
+
+    if tsk is None or tsk.get('taskId') is None:
+        return None
+    tid = tsk['taskId']
+    scheduler = poll.PollScheduler([tid], fixed_delay=status_delay)
+    s = datetime.datetime.now()
+    while True:
+        await asyncio.sleep(scheduler.next_delay())
+        task_state, task_state_obj = await get_state(tid)
+        if task_state not in ('IN_PROGRESS', 'PENDING', 'IN_QUEUE', 'IDLE'):
+            break
+
+    if task_state != 'DONE':
+        message = task_state_obj.get('message', '') if isinstance(task_state_obj, dict) else ''
+        print(f"Задача {tid} завершилась со статусом {task_state}: {message}")
+        return None
+    tsk['message'] = 'DONE'
+    if isinstance(task_state_obj, dict):
+        tsk['dtRegister'] = task_state_obj.get('dtRegister', '')
+        tsk['dtFinish'] = task_state_obj.get('dtFinish', '')
+        tsk['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
+    poll.record_duration(tid, tsk.get('taskProcessingTimeSec', (datetime.datetime.now() - s).total_seconds()))
+    return tsk
@@ -0,0 +1,133 @@
+"""
+Auth module for Mediascope API
+"""
+import base64
+import datetime
+import json
+import os
+import threading
+from . import errors
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:
+    Fernet = None
+
+
+class TokenManager:
+    """
+    Класс для получения и обновления токена доступа к Mediascope-API.
+    Токен обновляется заранее, за margin секунд до истечения срока действия, с использованием refresh_token,
+    при невозможности обновления выполняется повторная авторизация по имени пользователя и паролю.
+    Одновременно выполняется только одно обновление токена.
+    При указании token_file токен сохраняется в зашифрованный файл и используется повторно другими процессами
+    """
+    PBKDF2_ITERATIONS = 200000
+
+    def __init__(self, network, margin: float = 30, token_file: str = None):
+        self.network = network
+        self.margin = margin
+        self.token_file = token_file
+        self.token = {}
+        self._lock = threading.Lock()
+        self._fernet = None
+        if token_file is not None and Fernet is None:
+            print('Для сохранения токена в файл необходимо установить пакет cryptography: pip install cryptography. '
+                  'Токен не будет сохраняться')
+            self.token_file = None
+
+    def is_valid(self, token: dict, expires_key: str = 'expires_in') -> bool:
+        """
+        Проверить, что срок действия токена истекает не ранее чем через margin секунд
+
+        Parameters
+        ----------
+
+        token : dict
+            Токен доступа к Mediascope-API
+
+        expires_key : str
+            Поле токена со сроком действия: expires_in - токен доступа, refresh_expires_in - refresh_token
+        """
+        if 'now' not in token or expires_key not in token:
+            return False
+        expires = token['now'] + datetime.timedelta(seconds=token[expires_key])
+        return expires - datetime.timedelta(seconds=self.margin) > datetime.datetime.now()
+
+    def get_token(self) -> dict:
+        """
+        Получить действующий токен, при необходимости обновить его
+
+        Returns
+        -------
+
+        token : dict
+            Токен доступа к Mediascope-API
+        """
+        token = self.token
+        if self.is_valid(token):
+            return token
+        with self._lock:
+            if self.is_valid(self.token):
+                return self.token
+            self.token = self._obtain_token()
+            return self.token
+
+    def _obtain_token(self) -> dict:
+        if self.token_file is not None and not self.token:
+            token = self._load()
+            if token is not None and self.is_valid(token):
+                return token
+            if token is not None:
+                self.token = token
+
+        token = None
+        if self.token.get('refresh_token') and self.is_valid(self.token, 'refresh_expires_in'):
+            try:
+                token = self.network.get_token_by_refresh(self.token['refresh_token'])
+            except errors.MediascopeApiError:
+                token = None
+        if token is None:
+            token = self.network.get_token(self.network.username, self.network.passw)
+        self.save(token)
+        return token
+
+    def _get_fernet(self):
+        if self._fernet is None:
+            # ключ шифрования формируется из учетных данных пользователя
+            salt = f'{self.network.username}\n{self.network.client_id}\n{self.network.keycloak_url}'.encode('utf-8')
+            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=self.PBKDF2_ITERATIONS)
+            key = base64.urlsafe_b64encode(kdf.derive(f'{self.network.passw}'.encode('utf-8')))
+            self._fernet = Fernet(key)
+        return self._fernet
+
+    def _load(self):
+        if not os.path.exists(self.token_file):
+            return None
+        try:
+            with open(self.token_file, 'rb') as f:
+                token = json.loads(self._get_fernet().decrypt(f.read()))
+            token['now'] = datetime.datetime.fromtimestamp(token['now'])
+            return token
+        except (InvalidToken, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, token: dict):
+        """
+        Сохранить токен в зашифрованный файл, если он задан
+        """
+        if self.token_file is None:
+            return
+        data = dict(token)
+        data['now'] = token['now'].timestamp()
+        encrypted = self._get_fernet().encrypt(json.dumps(data).encode('utf-8'))
+        dirname = os.path.dirname(self.token_file)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        tmp_filename = f'{self.token_file}.{os.getpid()}.tmp'
+        fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encrypted)
+        os.replace(tmp_filename, self.token_file)
@@ -0,0 +1,168 @@
+"""
+Availability module for Mediascope API
+"""
+import json
+import re
+
+# поля фильтров, содержащие дату исследования
+DATE_UNITS = ('researchDate',)
+
+# поля записей о доступных периодах, содержащие дату окончания периода
+PERIOD_TO_KEYS = ('to', 'periodTo', 'dateTo', 'endDate', 'researchDateTo')
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+def _get_date(value):
+    if isinstance(value, str) and _DATE_RE.match(value):
+        return value[:10]
+    return None
+
+
+# границы периода дат условия (первая дата, последняя дата), None - граница не ограничена
+_UNBOUNDED = (None, None)
+
+
+def _intersect(bounds):
+    lower = [b[0] for b in bounds if b[0] is not None]
+    upper = [b[1] for b in bounds if b[1] is not None]
+    return max(lower) if lower else None, min(upper) if upper else None
+
+
+def _union(bounds):
+    if not bounds:
+        return _UNBOUNDED
+    lower = [b[0] for b in bounds]
+    upper = [b[1] for b in bounds]
+    return None if None in lower else min(lower), None if None in upper else max(upper)
+
+
+def _get_condition_bounds(obj):
+    if obj.get('unit') not in DATE_UNITS:
+        return _UNBOUNDED
+    relation = obj.get('relation')
+    values = obj.get('value') if isinstance(obj.get('value'), list) else [obj.get('value')]
+    dates = [_get_date(v) for v in values]
+    if not dates or None in dates:
+        return _UNBOUNDED
+    if relation in ('EQ', 'IN'):
+        return min(dates), max(dates)
+    if relation in ('GT', 'GTE'):
+        return dates[0], None
+    if relation in ('LT', 'LTE'):
+        return None, dates[0]
+    # NEQ, NIN и неизвестные отношения не ограничивают период
+    return _UNBOUNDED
+
+
+def _get_bounds(obj):
+    """
+    Получить границы дат исследования, которым может соответствовать условие: для группы AND - пересечение
+    границ условий, для группы OR - объединение, остальные объекты задания объединяются как AND
+    """
+    if isinstance(obj, list):
+        return _intersect([_get_bounds(i) for i in obj])
+    if not isinstance(obj, dict):
+        return _UNBOUNDED
+    if 'unit' in obj and 'relation' in obj:
+        return _get_condition_bounds(obj)
+    if obj.get('isNot'):
+        return _UNBOUNDED
+    items = []
+    for key in ('elements', 'children'):
+        if isinstance(obj.get(key), list):
+            items.extend(obj[key])
+    if 'operand' in obj:
+        bounds = [_get_bounds(i) for i in items]
+        return _union(bounds) if str(obj['operand']).upper() == 'OR' else _intersect(bounds)
+    return _intersect([_get_bounds(v) for v in obj.values() if isinstance(v, (dict, list))])
+
+
+def get_period(obj):
+    """
+    Получить период дат, задаваемый фильтрами по дате исследования в задании или запросе.
+    Учитываются отношения условий и операторы групп: если период не ограничен сверху (например, только
+    условие >= или !=, или ветка OR без условия по дате), возвращается None
+
+    Parameters
+    ----------
+
+    obj : str|dict|list
+        Задание или тело запроса
+
+    Returns
+    -------
+
+    period : tuple
+        Кортеж (первая дата, последняя дата) в формате YYYY-MM-DD (первая дата может быть None, если период
+        не ограничен снизу) или None, если последняя дата периода не определена
+    """
+    if isinstance(obj, str):
+        if not any(unit in obj for unit in DATE_UNITS):
+            return None
+        try:
+            obj = json.loads(obj)
+        except ValueError:
+            return None
+    lower, upper = _get_bounds(obj)
+    if upper is None:
+        return None
+    return lower, upper
+
+
+def get_published_until(availability):
+    """
+    Получить дату, по которую включительно опубликованы данные.
+    Если доступных периодов несколько, используется наименьшая из дат окончания периодов
+
+    Parameters
+    ----------
+
+    availability : list
+        Список доступных периодов, например, результат get_availability_period или get_date_range
+        в виде списка записей (DataFrame.to_dict('records'))
+
+    Returns
+    -------
+
+    date : str
+        Дата в формате YYYY-MM-DD или None, если дату определить не удалось
+    """
+    if not isinstance(availability, list):
+        return None
+    dates = []
+    for item in availability:
+        if not isinstance(item, dict):
+            continue
+        item_dates = [_get_date(item.get(k)) for k in PERIOD_TO_KEYS]
+        item_dates = [d for d in item_dates if d is not None]
+        if not item_dates:
+            # поле с датой окончания не найдено - используется наибольшая дата записи
+            item_dates = [d for d in (_get_date(v) for v in item.values()) if d is not None]
+        if item_dates:
+            dates.append(max(item_dates))
+    return min(dates) if dates else None
+
+
+def is_closed(period, published_until) -> bool:
+    """
+    Проверить, что период полностью входит в опубликованные данные и результат расчета за него не изменится
+
+    Parameters
+    ----------
+
+    period : tuple
+        Период дат, см. get_period
+
+    published_until : str
+        Дата, по которую включительно опубликованы данные, см. get_published_until
+
+    Returns
+    -------
+
+    closed : bool
+        True - период закрыт, False - период затрагивает еще не опубликованные данные или не определен
+    """
+    if period is None or published_until is None:
+        return False
+    return period[1] <= published_until
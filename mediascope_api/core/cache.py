@@ -5,9 +5,34 @@ import os
 import hashlib
 import json
 import pathlib
-from datetime import datetime
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack = None
+    zstandard = None
 
 CACHE_PATH = '../.cache'
+DEFAULT_TTL = 86400
+
+# сжатые записи кэша начинаются с заголовка MAGIC и идентификатора формата,
+# записи без заголовка - обычный JSON (формат предыдущих версий библиотеки)
+MAGIC = b'MSAPI'
+CODEC_JSON = 'json'
+CODEC_JSON_ZLIB = 'json-zlib'
+CODEC_MSGPACK_ZSTD = 'msgpack-zstd'
+CODEC_AUTO = 'auto'
+_CODEC_IDS = {CODEC_JSON_ZLIB: b'\x01', CODEC_MSGPACK_ZSTD: b'\x02'}
+# записи меньшего размера сохраняются без сжатия
+COMPRESS_MIN_SIZE = 64 * 1024
+# ошибки чтения поврежденных записей кэша, такие записи считаются отсутствующими
+DECODE_ERRORS = (ValueError, zlib.error) if zstandard is None else (ValueError, zlib.error, zstandard.ZstdError)
 
 
 def get_hash(query: str) -> str:
@@ -23,6 +48,453 @@ def get_hash(query: str) -> str:
     return hashlib.md5(query.encode('utf-8')).hexdigest()
 
 
+def get_key(query: str, login: str = 'default') -> str:
+    """
+        Получить ключ кэша для запроса пользователя
+
+        Parameters
+        ----------
+
+        query : str
+            Запрос по которому формируются данные
+
+        login : str
+            Логин пользователя, добавляется в ключ для обеспечения уникальности кэша
+
+        Returns
+        -------
+
+        key : str
+            Ключ кэша
+    """
+    return login + '-' + get_hash(query)
+
+
+def dumps(value, codec: str = CODEC_AUTO) -> bytes:
+    """
+        Сериализовать объект для сохранения в кэш
+
+        Parameters
+        ----------
+
+        value : dict
+            Данные для кэширования
+
+        codec : str
+            Формат сериализации:
+                - json - JSON без сжатия
+                - json-zlib - JSON со сжатием zlib
+                - msgpack-zstd - msgpack со сжатием zstd (требуются пакеты msgpack и zstandard)
+                - auto - небольшие объекты сохраняются в JSON, остальные сжимаются
+                         в msgpack-zstd, если установлены пакеты msgpack и zstandard, иначе в json-zlib
+
+        Returns
+        -------
+
+        data : bytes
+            Сериализованный объект
+    """
+    if codec == CODEC_MSGPACK_ZSTD and msgpack is None:
+        raise ValueError('Для формата msgpack-zstd необходимо установить пакеты msgpack и zstandard')
+    if codec not in (CODEC_AUTO, CODEC_JSON, CODEC_JSON_ZLIB, CODEC_MSGPACK_ZSTD):
+        raise ValueError(f'Неизвестный формат кэша: {codec}')
+
+    if codec == CODEC_MSGPACK_ZSTD or (codec == CODEC_AUTO and msgpack is not None):
+        packed = msgpack.packb(value)
+        if codec == CODEC_MSGPACK_ZSTD or len(packed) >= COMPRESS_MIN_SIZE:
+            return MAGIC + _CODEC_IDS[CODEC_MSGPACK_ZSTD] + zstandard.ZstdCompressor().compress(packed)
+        return json.dumps(value).encode('utf-8')
+
+    data = json.dumps(value).encode('utf-8')
+    if codec == CODEC_JSON_ZLIB or (codec == CODEC_AUTO and len(data) >= COMPRESS_MIN_SIZE):
+        return MAGIC + _CODEC_IDS[CODEC_JSON_ZLIB] + zlib.compress(data)
+    return data
+
+
+def loads(data: bytes):
+    """
+        Восстановить объект из сериализованных данных кэша, см. dumps
+    """
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+    codec_id = data[len(MAGIC):len(MAGIC) + 1]
+    payload = data[len(MAGIC) + 1:]
+    if codec_id == _CODEC_IDS[CODEC_JSON_ZLIB]:
+        return json.loads(zlib.decompress(payload))
+    if codec_id == _CODEC_IDS[CODEC_MSGPACK_ZSTD]:
+        if msgpack is None:
+            raise ValueError('Для чтения кэша необходимо установить пакеты msgpack и zstandard')
+        return msgpack.unpackb(zstandard.ZstdDecompressor().decompress(payload))
+    raise ValueError('Неизвестный формат записи кэша')
+
+
+def _canonical(obj, in_as_set: bool):
+    if isinstance(obj, dict):
+        res = {k: _canonical(v, in_as_set) for k, v in obj.items()}
+        if in_as_set and str(res.get('relation', '')).upper() in ('IN', 'NIN') and isinstance(res.get('value'), list):
+            values = {json.dumps(v, sort_keys=True): v for v in res['value']}
+            res['value'] = [values[k] for k in sorted(values)]
+        return res
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v, in_as_set) for v in obj]
+    return obj
+
+
+def canonical_json(obj, in_as_set: bool = False) -> str:
+    """
+        Получить текст объекта в JSON формате, не зависящий от порядка ключей и форматирования
+
+        Parameters
+        ----------
+
+        obj : dict|list
+            Объект
+
+        in_as_set : bool
+            Считать списки значений условий IN и NIN множествами: порядок и повторы значений не учитываются
+
+        Returns
+        -------
+
+        text : str
+            Текст в JSON формате
+    """
+    return json.dumps(_canonical(obj, in_as_set), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def get_query(method: str, endpoint: str, data=None, in_as_set: bool = False) -> str:
+    """
+        Получить канонический текст запроса для формирования ключа кэша: параметры запроса в URL
+        и ключи тела запроса упорядочиваются, форматирование тела запроса не учитывается
+
+        Parameters
+        ----------
+
+        method : str
+            HTTP метод
+
+        endpoint : str
+            Путь к точке API с параметрами запроса
+
+        data : str|dict|list
+            Тело запроса
+
+        in_as_set : bool
+            Считать списки значений условий IN и NIN множествами, см. canonical_json
+
+        Returns
+        -------
+
+        query : str
+            Текст запроса
+    """
+    path, _, query_string = endpoint.partition('?')
+    if query_string:
+        path += '?' + '&'.join(sorted(p for p in query_string.split('&') if p))
+
+    if data is None:
+        data = []
+    if hasattr(data, 'canonical_body'):
+        body = data.canonical_body(in_as_set)
+    else:
+        if isinstance(data, (str, bytes)):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                data = data.strip() if isinstance(data, str) else data
+        body = canonical_json(data, in_as_set) if isinstance(data, (dict, list)) else f'{data}'
+    return f'{method}\n{path}\n{body}'
+
+
+class CacheBackend:
+    """
+    Базовый класс хранилища кэша. Хранилище сохраняет объекты по ключу вместе со временем сохранения,
+    устаревшие объекты (старше ttl секунд) не возвращаются
+    """
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+
+    def get(self, key: str, ttl: float = None):
+        """
+            Получить объект из кэша
+
+            Parameters
+            ----------
+
+            key : str
+                Ключ кэша, см. get_key
+
+            ttl : float
+                Время жизни объекта в секундах, по умолчанию - время жизни, заданное для хранилища
+
+            Returns
+            -------
+
+            obj : json
+                Сохраненный объект или None, если объект отсутствует или устарел
+        """
+        entry = self.load(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if time.time() - created >= (self.ttl if ttl is None else ttl):
+            return None
+        return value
+
+    def set(self, key: str, value):
+        """
+            Сохранить объект в кэш
+
+            Parameters
+            ----------
+
+            key : str
+                Ключ кэша, см. get_key
+
+            value : dict
+                Данные для кэширования
+        """
+        self.store(key, value, time.time())
+
+    def load(self, key: str):
+        """
+        Загрузить запись кэша, возвращает кортеж (время сохранения, объект) или None
+        """
+        raise NotImplementedError
+
+    def store(self, key: str, value, created: float):
+        """
+        Сохранить запись кэша с указанным временем сохранения
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """
+        Удалить запись кэша
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Очистить кэш
+        """
+        raise NotImplementedError
+
+
+class FileCacheBackend(CacheBackend):
+    """
+    Хранилище кэша в виде отдельного файла на каждый запрос. Файлы в формате JSON
+    предыдущих версий библиотеки читаются без изменений, формат новых записей задается параметром codec (см. dumps).
+    Время сохранения записи - время изменения файла
+    """
+    def __init__(self, path: str = None, ttl: float = DEFAULT_TTL, codec: str = CODEC_AUTO):
+        super().__init__(ttl)
+        self.path = CACHE_PATH if path is None else path
+        self.codec = codec
+
+    def _get_fname(self, key: str) -> str:
+        if not os.path.exists(self.path):
+            os.makedirs(self.path, exist_ok=True)
+        return os.path.join(self.path, key + '.cache')
+
+    @staticmethod
+    def _read(fname):
+        # файл может быть удален или поврежден (например, при аварийном завершении процесса)
+        try:
+            with open(fname, 'rb') as f:
+                return loads(f.read())
+        except (OSError,) + DECODE_ERRORS:
+            return None
+
+    def load(self, key: str):
+        fname = pathlib.Path(self._get_fname(key))
+        if not fname.exists():
+            return None
+        created = fname.stat().st_mtime
+        value = self._read(fname)
+        if value is None:
+            return None
+        return created, value
+
+    def get(self, key: str, ttl: float = None):
+        # проверяем время создания файла до его чтения
+        fname = pathlib.Path(self._get_fname(key))
+        if not fname.exists():
+            return None
+        if time.time() - fname.stat().st_mtime >= (self.ttl if ttl is None else ttl):
+            return None
+        return self._read(fname)
+
+    def store(self, key: str, value, created: float):
+        data = dumps(value, self.codec)
+        fname = self._get_fname(key)
+        # запись во временный файл и замена: параллельные чтения не получают частично записанный файл
+        tmp_fname = f'{fname}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_fname, 'wb') as f:
+                f.write(data)
+            os.utime(tmp_fname, (created, created))
+            os.replace(tmp_fname, fname)
+        except OSError:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+            raise
+
+    def delete(self, key: str):
+        fname = self._get_fname(key)
+        if os.path.exists(fname):
+            os.remove(fname)
+
+    def clear(self):
+        if not os.path.exists(self.path):
+            return
+        for fname in pathlib.Path(self.path).glob('*.cache'):
+            fname.unlink()
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Хранилище кэша в памяти процесса. При превышении заданного объема удаляются
+    давно не использованные записи (LRU). Объекты хранятся в сериализованном виде (JSON),
+    поэтому изменение полученного объекта не меняет кэш
+    """
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = DEFAULT_TTL):
+        super().__init__(ttl)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return entry[0], json.loads(entry[1])
+
+    def store(self, key: str, value, created: float):
+        # объем записи учитывается в байтах
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        size = len(data)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (created, data, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, old_size) = self._entries.popitem(last=False)
+                self.size -= old_size
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Хранилище кэша в одном файле базы SQLite. При превышении заданного объема удаляются
+    давно не использованные записи. Формат записей задается параметром codec (см. dumps).
+    Время последнего обращения к записям накапливается в памяти и записывается в базу
+    при сохранении записей или после ACCESS_FLUSH_SIZE обращений
+    """
+    ACCESS_FLUSH_SIZE = 100
+
+    def __init__(self, filename: str = None, max_bytes: int = 1024 * 1024 * 1024, ttl: float = DEFAULT_TTL,
+                 codec: str = CODEC_AUTO):
+        super().__init__(ttl)
+        self.codec = codec
+        if filename is None:
+            filename = os.path.join(CACHE_PATH, 'cache.sqlite')
+        dirname = os.path.dirname(filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute('create table if not exists cache (key text primary key, created real, '
+                           'accessed real, size integer, value blob)')
+        self._conn.execute('create index if not exists cache_accessed on cache (accessed)')
+        self._conn.commit()
+
+    def load(self, key: str):
+        with self._lock:
+            row = self._conn.execute('select created, value from cache where key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._conn.commit()
+        try:
+            return row[0], loads(row[1])
+        except DECODE_ERRORS:
+            return None
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._conn.executemany('update cache set accessed = ? where key = ?',
+                                   [(t, k) for k, t in self._accessed.items()])
+            self._accessed.clear()
+
+    def store(self, key: str, value, created: float):
+        data = dumps(value, self.codec)
+        with self._lock:
+            self._conn.execute('insert or replace into cache (key, created, accessed, size, value) '
+                               'values (?, ?, ?, ?, ?)', (key, created, time.time(), len(data), data))
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute('select coalesce(sum(size), 0) from cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('select key, size from cache order by accessed').fetchall()
+        keys = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            keys.append((key,))
+            total -= size
+        self._conn.executemany('delete from cache where key = ?', keys)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._conn.execute('delete from cache where key = ?', (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute('delete from cache')
+            self._conn.commit()
+
+    def close(self):
+        """
+        Закрыть соединение с базой
+        """
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
+
+
 def get_cache(query: str, login: str = 'default'):
     """
         Получить объект из кэша по его хэшу
@@ -44,15 +516,7 @@ def get_cache(query: str, login: str = 'default'):
     """
     if CACHE_PATH is None:
         return None
-    h = get_hash(query)
-    h = login + '-' + get_hash(query)
-    cache_filename = _get_cache_fname(h)
-    if not os.path.exists(cache_filename):
-        return None
-    if not _check_cache_is_valid(cache_filename):
-        return None
-    with open(cache_filename, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return FileCacheBackend(CACHE_PATH).get(get_key(query, login))
 
 
 def save_cache(query: str, jdata, login: str='default'):
@@ -73,24 +537,5 @@ def save_cache(query: str, jdata, login: str='default'):
 
     if CACHE_PATH is None:
         return None
-    h = login + '-' + get_hash(query)
-    cache_file = _get_cache_fname(h)
-    with open(cache_file, 'w', encoding='utf-8') as f:
-        json.dump(jdata, f)
-
-
-def _get_cache_fname(h: str) -> str:
-    file_path = os.path.join(CACHE_PATH, h + '.cache')
-    if not os.path.exists(CACHE_PATH):
-        os.makedirs(CACHE_PATH, exist_ok=True)
-    return file_path
-
-
-def _check_cache_is_valid(filename: str) -> bool:
-    fname = pathlib.Path(filename)
-    if fname.exists():
-        ctime = datetime.fromtimestamp(fname.stat().st_ctime)
-        td = datetime.now() - ctime
-        if td.total_seconds() < 86400:
-            return True
-    return False
+    FileCacheBackend(CACHE_PATH).set(get_key(query, login), jdata)
+
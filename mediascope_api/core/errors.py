@@ -81,3 +81,12 @@ class ServerError(MediascopeApiError):
     """
     def __init__(self, message: str = "Ошибка сервера", code: int = 500):
         super().__init__(message, code)
+
+
+class TaskSubmitError(ServerError):
+    """
+    Ошибка, возникающая, когда результат отправки задания неизвестен: сервер мог принять задание,
+    поэтому повторная отправка не выполняется.
+    """
+    def __init__(self, message: str = "Результат отправки задания неизвестен", code: int = 500):
+        super().__init__(message, code)
@@ -0,0 +1,431 @@
+"""
+Filter builder module for Mediascope API
+
+Условия фильтрации задаются объектами, без записи в SQL нотации и последующего разбора, например:
+
+    filters.And(filters.In('regionId', [1, 2]), filters.Range('age', 18, 44))
+    filters.Eq('sex', 1) | filters.Eq('sex', 2)
+
+Условия принимаются везде, где можно указать фильтр в SQL нотации, и преобразуются сразу в формат API
+"""
+import re
+from .sql import FilterNode, Condition, ConditionGroup, to_filter, from_json, parse_filter, sql_to_units
+
+
+class Eq(Condition):
+    """
+    Условие unit = value
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, value):
+        super().__init__(unit, 'EQ', value)
+
+
+class Ne(Condition):
+    """
+    Условие unit != value
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, value):
+        super().__init__(unit, 'NEQ', value)
+
+
+class Gt(Condition):
+    """
+    Условие unit > value
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, value):
+        super().__init__(unit, 'GT', value)
+
+
+class Lt(Condition):
+    """
+    Условие unit < value
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, value):
+        super().__init__(unit, 'LT', value)
+
+
+class Gte(Condition):
+    """
+    Условие unit >= value
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, value):
+        super().__init__(unit, 'GTE', value)
+
+
+class Lte(Condition):
+    """
+    Условие unit <= value
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, value):
+        super().__init__(unit, 'LTE', value)
+
+
+class In(Condition):
+    """
+    Условие unit in (values)
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, values):
+        super().__init__(unit, 'IN', _to_values(values))
+
+
+class NotIn(Condition):
+    """
+    Условие unit nin (values)
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, values):
+        super().__init__(unit, 'NIN', _to_values(values))
+
+
+class And(ConditionGroup):
+    """
+    Группа условий, объединенных оператором AND. Условия могут быть заданы в SQL нотации, в формате API
+    или объектами условий
+    """
+    __slots__ = ()
+
+    def __init__(self, *items):
+        super().__init__('AND', [to_filter(i) for i in items])
+
+
+class Or(ConditionGroup):
+    """
+    Группа условий, объединенных оператором OR. Условия могут быть заданы в SQL нотации, в формате API
+    или объектами условий
+    """
+    __slots__ = ()
+
+    def __init__(self, *items):
+        super().__init__('OR', [to_filter(i) for i in items])
+
+
+class Range(ConditionGroup):
+    """
+    Диапазон значений start <= unit <= end. Если граница не задана (None), условие по ней не добавляется
+    """
+    __slots__ = ()
+
+    def __init__(self, unit, start=None, end=None):
+        if start is None and end is None:
+            raise ValueError(f'Не задана ни одна из границ диапазона для "{unit}"')
+        items = []
+        if start is not None:
+            items.append(Gte(unit, start))
+        if end is not None:
+            items.append(Lte(unit, end))
+        super().__init__('AND', items)
+
+
+def _to_values(values):
+    if isinstance(values, (str, int, float)):
+        return values,
+    return tuple(values)
+
+
+def combine(operand, *items):
+    """
+    Объединить условия оператором AND или OR, пропуская незаданные (None) условия
+
+    Parameters
+    ----------
+
+    operand : str
+        Оператор: 'AND' или 'OR'
+
+    items : str | dict | FilterNode
+        Условия фильтрации
+
+
+    Returns
+    -------
+    node : FilterNode
+        Дерево условий или None, если ни одно условие не задано
+    """
+    operand = operand.upper()
+    if operand not in ('AND', 'OR'):
+        raise ValueError(f'Неизвестный оператор "{operand}", допустимые значения: AND, OR')
+    items = [to_filter(i) for i in items if i is not None]
+    if not items:
+        return None
+    if len(items) == 1:
+        return items[0]
+    return ConditionGroup(operand, items)
+
+
+# упрощать фильтры перед отправкой задания (см. optimize), при False фильтры передаются без изменений
+OPTIMIZE_FILTERS = True
+
+_SET_RELATIONS = ('EQ', 'IN', 'NEQ', 'NIN')
+_RANGE_RELATIONS = ('GT', 'GTE', 'LT', 'LTE')
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class _Never:
+    """
+    Условие, которому не соответствует ни одна запись
+    """
+
+
+_NEVER = _Never()
+
+
+def _unique(values):
+    # уникальные значения с сохранением порядка, 1, 1.0 и True считаются разными значениями
+    seen = set()
+    result = []
+    for v in values:
+        key = (type(v), v)
+        if key not in seen:
+            seen.add(key)
+            result.append(v)
+    return result
+
+
+def _values_condition(unit, values, relation):
+    if len(values) == 1:
+        return Condition(unit, 'EQ' if relation == 'IN' else 'NEQ', values[0])
+    return Condition(unit, relation, tuple(values))
+
+
+def _get_values(node):
+    return node.value if node.relation in ('IN', 'NIN') else (node.value,)
+
+
+def _get_kind(value):
+    # значения, которые можно сравнивать при объединении диапазонов: числа и даты YYYY-MM-DD
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 'number'
+    if isinstance(value, str) and _DATE_RE.match(value):
+        return 'date'
+    return None
+
+
+def _merge_and(unit, conditions):
+    """
+    Объединить условия AND по одному атрибуту: пересечение списков значений, исключение значений NIN и NEQ,
+    наиболее строгие границы диапазона. Возвращает список условий или _NEVER
+    """
+    include = None
+    exclude = []
+    bounds = [c for c in conditions if c.relation in _RANGE_RELATIONS]
+    kinds = {_get_kind(c.value) for c in bounds}
+    kind = kinds.pop() if len(kinds) == 1 else None
+    rest = [] if kind is not None else bounds
+    lower = upper = None
+    try:
+        for c in conditions:
+            if c.relation in ('EQ', 'IN'):
+                values = _unique(_get_values(c))
+                if include is None:
+                    include = values
+                else:
+                    keys = {(type(v), v) for v in values}
+                    include = [v for v in include if (type(v), v) in keys]
+            elif c.relation in ('NEQ', 'NIN'):
+                exclude.extend(_get_values(c))
+            elif kind is not None:
+                strict = c.relation in ('GT', 'LT')
+                if c.relation in ('GT', 'GTE'):
+                    if lower is None or c.value > lower[0] or (c.value == lower[0] and strict):
+                        lower = (c.value, strict)
+                elif upper is None or c.value < upper[0] or (c.value == upper[0] and strict):
+                    upper = (c.value, strict)
+        exclude = _unique(exclude)
+        excluded = {(type(v), v) for v in exclude}
+    except TypeError:
+        # несравнимые или нехэшируемые значения: условия не объединяются
+        return conditions
+
+    if lower is not None and upper is not None:
+        if lower[0] > upper[0] or (lower[0] == upper[0] and (lower[1] or upper[1])):
+            return _NEVER
+
+    def in_bounds(v):
+        if _get_kind(v) != kind:
+            return None
+        if lower is not None and (v < lower[0] or (v == lower[0] and lower[1])):
+            return False
+        if upper is not None and (v > upper[0] or (v == upper[0] and upper[1])):
+            return False
+        return True
+
+    result = []
+    if include is not None:
+        include = [v for v in include if (type(v), v) not in excluded]
+        checks = [in_bounds(v) for v in include] if lower is not None or upper is not None else []
+        if None not in checks:
+            # границы диапазона проверены для всех значений списка
+            include = [v for v, ok in zip(include, checks or [True] * len(include)) if ok]
+            lower = upper = None
+        if not include:
+            return _NEVER
+        result.append(_values_condition(unit, include, 'IN'))
+    elif exclude:
+        result.append(_values_condition(unit, exclude, 'NIN'))
+    if lower is not None and upper is not None and lower[0] == upper[0]:
+        if (type(lower[0]), lower[0]) in excluded:
+            return _NEVER
+        if include is None:
+            result = [Condition(unit, 'EQ', lower[0])]
+        else:
+            # значения списка, несравнимые с границами, не проверены: список сохраняется
+            result.append(Condition(unit, 'EQ', lower[0]))
+    else:
+        if lower is not None:
+            result.append(Condition(unit, 'GT' if lower[1] else 'GTE', lower[0]))
+        if upper is not None:
+            result.append(Condition(unit, 'LT' if upper[1] else 'LTE', upper[0]))
+    return result + rest
+
+
+def _merge_or(unit, conditions):
+    """
+    Объединить условия OR по одному атрибуту: объединение списков значений EQ и IN
+    """
+    values = []
+    rest = []
+    for c in conditions:
+        if c.relation in ('EQ', 'IN'):
+            values.extend(_get_values(c))
+        else:
+            rest.append(c)
+    if not values:
+        return conditions
+    try:
+        values = _unique(values)
+    except TypeError:
+        return conditions
+    return [_values_condition(unit, values, 'IN')] + rest
+
+
+def _fold(operand, items):
+    merge = _merge_and if operand == 'AND' else _merge_or
+    by_unit = {}
+    for i, item in enumerate(items):
+        if isinstance(item, Condition) and item.relation in _SET_RELATIONS + _RANGE_RELATIONS:
+            by_unit.setdefault(item.unit, []).append(i)
+    result = []
+    merged = set()
+    for i, item in enumerate(items):
+        if i in merged:
+            continue
+        indexes = by_unit.get(item.unit) if isinstance(item, Condition) else None
+        if indexes is None or len(indexes) < 2:
+            result.append(item)
+            continue
+        conditions = merge(item.unit, [items[j] for j in indexes])
+        if conditions is _NEVER:
+            return _NEVER
+        merged.update(indexes)
+        result.extend(conditions)
+    return result
+
+
+def _optimize(node):
+    if isinstance(node, Condition):
+        if node.relation in ('IN', 'NIN'):
+            try:
+                return _values_condition(node.unit, _unique(node.value), node.relation)
+            except TypeError:
+                return node
+        return node
+
+    items = []
+    keys = set()
+    for item in node.items:
+        item = _optimize(item)
+        if item is _NEVER:
+            if node.operand == 'AND':
+                return _NEVER
+            continue
+        if isinstance(item, ConditionGroup) and item.operand == node.operand:
+            children = item.items
+        else:
+            children = [item]
+        for child in children:
+            # повторяющиеся условия
+            key = repr(child)
+            if key not in keys:
+                keys.add(key)
+                items.append(child)
+    if not items:
+        return _NEVER
+    if len(items) > 1:
+        items = _fold(node.operand, items)
+        if items is _NEVER:
+            return _NEVER
+    if len(items) == 1:
+        return items[0]
+    return ConditionGroup(node.operand, items)
+
+
+def optimize(filter_obj, strict: bool = False):
+    """
+    Упростить условие фильтрации перед отправкой задания:
+        - вложенные группы с тем же оператором и группы из одного условия раскрываются;
+        - повторяющиеся условия и значения списков IN, NIN удаляются;
+        - условия OR по одному атрибуту (=, IN) объединяются в один список IN;
+        - условия AND по одному атрибуту объединяются: пересечение списков IN, исключение значений NIN и !=,
+          наиболее строгие границы диапазона (для чисел и дат YYYY-MM-DD);
+        - условия OR, которым не соответствует ни одна запись, удаляются
+
+    Parameters
+    ----------
+
+    filter_obj : str | dict | FilterNode
+        Условие фильтрации в SQL нотации, в формате API или дерево условий
+
+    strict : bool
+        Если условию не соответствует ни одна запись: True - возникает ошибка ValueError,
+        False - возвращается исходное дерево условий без упрощения (по умолчанию)
+
+
+    Returns
+    -------
+    node : FilterNode
+        Упрощенное дерево условий
+    """
+    node = to_filter(filter_obj)
+    result = _optimize(node)
+    if result is _NEVER:
+        if strict:
+            raise ValueError(f'Условия фильтра противоречат друг другу, ни одна запись им не соответствует: {node}')
+        return node
+    return result
+
+
+def optimize_filter(filter_obj, strict: bool = False):
+    """
+    Упростить условие фильтрации (см. optimize) и преобразовать в формат API
+
+    Parameters
+    ----------
+
+    filter_obj : str | dict | FilterNode
+        Условие фильтрации в SQL нотации, в формате API или дерево условий
+
+    strict : bool
+        Возникает ли ошибка ValueError, если условию не соответствует ни одна запись, см. optimize
+
+
+    Returns
+    -------
+    obj : dict
+        Условия фильтрации в формате API
+    """
+    return optimize(filter_obj, strict).to_json()
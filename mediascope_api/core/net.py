@@ -1,16 +1,123 @@
 """
 Network module for Mediascope API
 """
+import copy
 import datetime
 import time
 import re
 import os
+import threading
+import socket
+from concurrent.futures import ThreadPoolExecutor
 from urllib3.util import Retry
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import NewConnectionError
 from requests import Session
 from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, ConnectTimeout, ReadTimeout, \
+    RequestException
 from . import errors
 from . import utils
 from . import cache
+from . import auth
+from . import availability
+from . import ratelimit
+
+# ключи записи кэша с результатом запроса и датой публикации данных на момент запроса, см. _save_cache
+_CACHE_PUBLISHED_UNTIL_KEY = '_publishedUntil'
+_CACHE_VALUE_KEY = '_value'
+
+
+class MediascopeHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter с таймаутом по умолчанию, TCP keep-alive, ограничением частоты запросов
+    и счетчиками использования пула соединений
+    """
+    def __init__(self, timeout=None, tcp_keepalive: bool = True, rate_limiter: ratelimit.RateLimiter = None,
+                 *args, **kwargs):
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.socket_options = list(HTTPConnection.default_socket_options)
+        if tcp_keepalive:
+            self.socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            # параметры keep-alive доступны не на всех платформах
+            for name, value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 15), ('TCP_KEEPCNT', 4)):
+                if hasattr(socket, name):
+                    self.socket_options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._stats_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if timeout is None:
+            timeout = self.timeout
+        if self.rate_limiter is None:
+            return self._send(request, stream, timeout, verify, cert, proxies)
+
+        # ответ 429 повторяется после паузы из заголовка Retry-After, частота запросов группы снижается
+        bucket = self.rate_limiter.get_bucket(request.method, request.url)
+        retryable = self.rate_limiter.is_retryable(request.method, request.url)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+            resp = self._send(request, stream, timeout, verify, cert, proxies)
+            if resp.status_code != 429 or not retryable or attempt >= self.rate_limiter.max_retries:
+                break
+            retry_after = ratelimit.get_retry_after(resp.headers, attempt)
+            if bucket is None:
+                bucket = self.rate_limiter.get_throttled_bucket(request.method, request.url)
+            if bucket is not None:
+                bucket.on_throttled(retry_after)
+            else:
+                time.sleep(retry_after)
+            resp.close()
+            attempt += 1
+        if bucket is not None and resp.status_code != 429:
+            bucket.on_success()
+        return resp
+
+    def _send(self, request, stream, timeout, verify, cert, proxies):
+        with self._stats_lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+
+    def get_stats(self) -> dict:
+        """
+        Получить статистику использования пула соединений, см. MediascopeApiNetwork.get_pool_stats
+        """
+        pools = self.poolmanager.pools
+        connections = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        with self._stats_lock:
+            return {'requests': self.requests, 'in_flight': self.in_flight, 'peak_in_flight': self.peak_in_flight,
+                    'connections': connections, 'pool_maxsize': self._pool_maxsize}
+
+
+class _InFlightCall:
+    """
+    Выполняющийся запрос, см. MediascopeApiNetwork._single_flight
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
 
 
 class MediascopeApiNetwork:
@@ -18,23 +125,38 @@ class MediascopeApiNetwork:
     Класс для работы с сетью Mediascope API
     """
     DEFAULT_SETTINGS_FILENAME = 'settings.json'
+    # точки API отправки заданий и вложенные в них точки API статуса и результатов заданий
+    TASK_SUBMIT_PREFIXES = ('/task/', '/daily-task')
+    TASK_IDEMPOTENT_PREFIXES = ('/task/state', '/task/result')
+    ACTIVE_TASKS_COUNT_ENDPOINT = '/task/state/active-tasks-count'
+    # ответы, после которых неизвестно, принято ли задание сервером
+    AMBIGUOUS_STATUSES = (502, 503, 504)
 
     def __new__(cls, settings_filename: str = None, cache_path: str = None, cache_enabled: bool = True,
                 username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
-                client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
+                client_secret: str = None, keycloak_url: str = None,
+                cache_backend: cache.CacheBackend = None, token_file: str = None, token_margin: float = 30,
+                pool_connections: int = 10, pool_maxsize: int = 32, pool_block: bool = False,
+                timeout: tuple = (10, 600), tcp_keepalive: bool = True, *args, **kwargs):
         #if not hasattr(cls, 'instance'):
         #    cls.instance = super(MediascopeApiNetwork, cls).__new__(cls, *args, **kwargs)
         return super(MediascopeApiNetwork, cls).__new__(cls, *args, **kwargs) #cls.instance
 
     def __init__(self, settings_filename: str = None, cache_path: str = None, cache_enabled: bool = True,
                  username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
-                 client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
+                 client_secret: str = None, keycloak_url: str = None,
+                 cache_backend: cache.CacheBackend = None, token_file: str = None, token_margin: float = 30,
+                 pool_connections: int = 10, pool_maxsize: int = 32, pool_block: bool = False,
+                 timeout: tuple = (10, 600), tcp_keepalive: bool = True, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        if cache_path is not None and cache_enabled:
-            cache.cache_path = cache_path
-        elif not cache_enabled:
-            cache.cache_path = None
+        # хранилище кэша запросов, по умолчанию - файлы в каталоге cache_path
+        if not cache_enabled:
+            self.cache_backend = None
+        elif cache_backend is not None:
+            self.cache_backend = cache_backend
+        else:
+            self.cache_backend = cache.FileCacheBackend(cache_path)
 
         proxy_server = None
 
@@ -60,7 +182,29 @@ class MediascopeApiNetwork:
                 self.client_id is None or self.client_secret is None or self.keycloak_url is None:
             raise ValueError('Не указаны настройки для подключения к Mediascope-API')
 
-        self.token = {}
+        # токен доступа, обновляется заранее с запасом token_margin секунд,
+        # при указании token_file сохраняется в зашифрованный файл для повторного использования
+        self.token_manager = auth.TokenManager(self, token_margin, token_file)
+
+        # количество одновременных запросов при постраничной загрузке словарей (см. send_request_lo)
+        self.page_workers = 1
+
+        # время жизни кэша по точкам API (см. set_cache_ttl) и режим использования устаревшего кэша:
+        # если включен, устаревшая не более чем на stale_ttl секунд копия возвращается сразу,
+        # а обновление кэша выполняется в фоновом потоке
+        self.cache_ttl = {}
+        self.stale_while_revalidate = False
+        self.stale_ttl = 7 * 86400
+        # ключ кэша не зависит от порядка и повторов значений в условиях IN и NIN
+        self.cache_in_as_set = False
+        # дата, по которую включительно опубликованы данные (см. set_published_until):
+        # кэш запросов с фильтром по дате исследования в пределах опубликованного периода не устаревает
+        self.published_until = None
+        self._revalidating = set()
+        self._revalidate_lock = threading.Lock()
+        # выполняющиеся запросы к словарям: одинаковые одновременные запросы выполняются одним обращением к API
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
 
         self.proxies = None
         if proxy_server is not None:
@@ -77,9 +221,95 @@ class MediascopeApiNetwork:
             backoff_factor=1,
             status_forcelist=[502, 503, 504],
             allowed_methods={'POST', 'GET', 'DELETE'},
+            # ответы 429 обрабатываются ограничением частоты запросов (см. set_rate_limits)
+            respect_retry_after_header=False,
+        )
+
+        # отправка заданий не идемпотентна: повторяются только запросы, не дошедшие до сервера (ошибки подключения),
+        # при неизвестном результате отправки выполняется сверка, см. send_task_request
+        self.submit_retries = Retry(
+            total=5,
+            connect=5,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=1,
+            respect_retry_after_header=False,
         )
+        self.task_submit_retries = 1
+        self._active_tasks_count_supported = True
+
+        # ограничение частоты запросов по группам точек API (отправка заданий, статус заданий, словари),
+        # см. set_rate_limits
+        self.rate_limiter = ratelimit.RateLimiter(self.root_url)
+
+        # пул соединений: pool_connections - количество пулов (хостов), pool_maxsize - соединений в пуле,
+        # pool_block - ожидать освобождения соединения вместо открытия дополнительного,
+        # timeout - таймауты (подключение, чтение) в секундах по умолчанию для всех запросов
+        adapter_args = {'timeout': timeout, 'tcp_keepalive': tcp_keepalive, 'rate_limiter': self.rate_limiter,
+                        'pool_connections': pool_connections, 'pool_maxsize': pool_maxsize, 'pool_block': pool_block}
+        self.adapter = MediascopeHTTPAdapter(max_retries=self.retries, **adapter_args)
+        self.task_adapter = MediascopeHTTPAdapter(max_retries=self.submit_retries, **adapter_args)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        for prefix in self.TASK_SUBMIT_PREFIXES:
+            self.session.mount(self.root_url + prefix, self.task_adapter)
+        for prefix in self.TASK_IDEMPOTENT_PREFIXES:
+            self.session.mount(self.root_url + prefix, self.adapter)
+
+    def set_rate_limits(self, rates: dict):
+        """
+        Задать ограничение частоты запросов для групп точек API.
+        По умолчанию частота запросов не ограничивается. При получении ответа 429 (слишком много запросов)
+        запрос повторяется после паузы из заголовка Retry-After, а частота запросов группы снижается
+        (для неограниченной группы задается частота ratelimit.THROTTLED_RATES)
+
+        Parameters
+        ----------
+
+        rates : dict
+            Словарь {группа: частота запросов в секунду}, группы:
+                - task - отправка заданий
+                - state - опрос статуса заданий
+                - dictionary - словари, результаты заданий и остальные запросы
+            Для частоты можно указать кортеж (частота, количество одновременных запросов).
+            None - частота запросов группы не ограничивается до получения ответа 429
+            Пример: {'task': 2, 'state': (10, 20), 'dictionary': None}
+        """
+        self.rate_limiter.set_rates(rates)
+
+    def get_rate_limit_stats(self) -> dict:
+        """
+        Получить текущую частоту запросов и количество ответов 429 по группам точек API
+
+        Returns
+        -------
+
+        stats : dict
+            Словарь {группа: {'rate': текущая частота, 'max_rate': заданная частота, 'burst': количество
+            одновременных запросов, 'throttled': количество ответов 429}}
+        """
+        return self.rate_limiter.get_stats()
+
+    def get_pool_stats(self) -> dict:
+        """
+        Получить статистику использования пула соединений
+
+        Returns
+        -------
 
-        self.session.mount('https://', HTTPAdapter(max_retries=self.retries))
+        stats : dict
+            Словарь со статистикой:
+                - requests - количество отправленных запросов
+                - in_flight - количество выполняемых в данный момент запросов
+                - peak_in_flight - максимальное количество одновременно выполнявшихся запросов
+                - connections - количество открытых за все время соединений
+                - pool_maxsize - размер пула соединений
+                - task_submit - статистика отдельного пула соединений для отправки заданий
+        """
+        stats = self.adapter.get_stats()
+        stats['task_submit'] = self.task_adapter.get_stats()
+        return stats
 
     def get_token(self, username: str, passw: str) -> dict:
         """
@@ -124,18 +354,54 @@ class MediascopeApiNetwork:
         raise errors.MediascopeApiError(f'Status code {my_token_req.status_code} response: {my_token_req.text}',
                                         my_token_req.status_code)
 
+    def get_token_by_refresh(self, refresh_token: str) -> dict:
+        """
+        Получить новый токен по refresh_token
+
+        Parameters
+        ----------
+
+        refresh_token : str
+            Refresh token, полученный вместе с текущим токеном
+
+        Returns
+        -------
+
+        token : dict
+            Токен доступа к Mediascope-API
+        """
+        my_token_req = self.session.post(
+            url=self.keycloak_url,
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'refresh_token': refresh_token,
+                'grant_type': 'refresh_token'
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            proxies=self.proxies
+        )
+        if my_token_req.status_code == 200:
+            t = my_token_req.json()
+            t['now'] = datetime.datetime.now()
+            return t
+        raise errors.MediascopeApiError(f'Status code {my_token_req.status_code} response: {my_token_req.text}',
+                                        my_token_req.status_code)
+
+    @property
+    def token(self) -> dict:
+        return self.token_manager.token
+
+    @token.setter
+    def token(self, value: dict):
+        self.token_manager.token = value
+
     def refresh_token(self):
         """
-        Обновить текущий токен или получить новый с использованием username и passw сохраненных в настройках
+        Обновить текущий токен или получить новый с использованием username и passw сохраненных в настройках.
+        Токен обновляется заранее, за token_margin секунд до истечения срока действия
         """
-        if 'now' in self.token:
-            now = time.mktime(datetime.datetime.now().timetuple())
-            token_time = time.mktime(self.token['now'].timetuple())
-            token_exp = self.token['expires_in']
-            if token_time + token_exp - now <= 0:
-                self.token = self.get_token(self.username, self.passw)
-        else:
-            self.token = self.get_token(self.username, self.passw)
+        self.token_manager.get_token()
 
     def send_request(self, method: str, endpoint: str, data: dict = None, use_cache: bool = False):
         """
@@ -178,32 +444,144 @@ class MediascopeApiNetwork:
         self.refresh_token()
 
         # Check cache
-        cache_query = f'{method}\n{endpoint}\n{data}'
+        cache_query = cache.get_query(method, endpoint, data, self.cache_in_as_set)
         if use_cache and method in ['post', 'get']:
-            cache_data = cache.get_cache(cache_query, self.username)
+            cache_data = self._get_cache(cache_query, endpoint,
+                                         lambda: self.send_request(method, endpoint, data, use_cache=False), data)
             if cache_data is not None:
                 return cache_data
 
-        # No cache, request service
-        url = self.root_url + endpoint
-        headers = {'Authorization': f'Bearer {self.token["access_token"]}',
-                   'Content-Type': 'application/json; charset=utf-8'
-                   }
-        req = getattr(self.session, method)(url=url, headers=headers, data=f'{data}'.encode('utf-8'),
-                                            proxies=self.proxies)
+        def send():
+            # No cache, request service
+            published_until = self.published_until
+            url = self.root_url + endpoint
+            headers = {'Authorization': f'Bearer {self.token["access_token"]}',
+                       'Content-Type': 'application/json; charset=utf-8'
+                       }
+            req = getattr(self.session, method)(url=url, headers=headers, data=f'{data}'.encode('utf-8'),
+                                                proxies=self.proxies)
 
-        if req.status_code == 200:
-            # try to save in cache for next use
-            rj = self._req_to_json(req, endpoint, data)
-            if use_cache:
-                cache.save_cache(cache_query, rj, self.username)
-            return rj
-        else:
-            self._raise_error(req)
+            if req.status_code == 200:
+                # try to save in cache for next use
+                rj = self._req_to_json(req, endpoint, data)
+                if use_cache:
+                    self._save_cache(cache_query, rj, availability.get_period(data), published_until)
+                return rj
+            else:
+                self._raise_error(req)
+                return None
+
+        if use_cache and method in ['post', 'get']:
+            return self._single_flight(('send_request', cache_query), send)
+        return send()
+
+    def send_task_request(self, endpoint: str, data, retries: int = None):
+        """
+        Отправляет задание на расчет в Mediascope-API.
+        Запросы, не дошедшие до сервера (ошибки подключения), повторяются автоматически.
+        Перед отправкой запрашивается количество активных задач пользователя. Если результат отправки неизвестен
+        (таймаут ответа, обрыв соединения, ошибки 502, 503, 504), количество запрашивается снова: задание
+        отправляется повторно только если количество активных задач не увеличилось, то есть задание
+        не было принято сервером, иначе, а также если количество активных задач получить не удалось, возникает
+        ошибка TaskSubmitError. Если точка API количества активных задач в проекте отсутствует,
+        задание отправляется повторно без сверки
+
+        Parameters
+        ----------
+
+        endpoint : str
+            Путь к точке API отправки задания, например: /task/timeband
+
+        data : str|Task
+            Задание
+
+        retries : int
+            Количество повторных отправок задания, по умолчанию - значение атрибута task_submit_retries
+
+        Returns
+        -------
+
+        result : dict
+            Ответ сервера, содержит taskId
+        """
+        if retries is None:
+            retries = self.task_submit_retries
+        attempt = 0
+        while True:
+            # количество активных задач до отправки для сверки после неизвестного результата отправки
+            active_before = self.get_active_tasks_count() if attempt < retries else None
+            try:
+                return self.send_request('post', endpoint, data)
+            except (errors.MediascopeApiError, RequestException) as e:
+                if not self._is_ambiguous_error(e):
+                    raise
+                error = e
+            active_after = self.get_active_tasks_count() if attempt < retries else None
+            self._check_task_resubmit(error, attempt < retries, active_before, active_after)
+            attempt += 1
+            time.sleep(self.submit_retries.backoff_factor * (2 ** (attempt - 1)))
+
+    def _is_active_tasks_count_supported(self) -> bool:
+        return self.ACTIVE_TASKS_COUNT_ENDPOINT is not None and self._active_tasks_count_supported
+
+    def _check_task_resubmit(self, error, can_retry: bool, active_before, active_after):
+        """
+        Проверить после неизвестного результата отправки задания, что задание можно отправить повторно:
+        количество активных задач пользователя после отправки не больше, чем до отправки, то есть задание
+        не было принято сервером. Сервер не позволяет найти задание по его параметрам или названию, поэтому
+        при увеличении количества (в том числе из-за заданий, отправленных параллельно) задание
+        повторно не отправляется
+        """
+        if not self._is_active_tasks_count_supported():
+            # точка API отсутствует в проекте: задание отправляется повторно без сверки
+            if not can_retry:
+                raise error
+            return
+        if not can_retry or active_before is None or active_after is None or active_after > active_before:
+            raise errors.TaskSubmitError(f'Результат отправки задания неизвестен, задание могло быть принято '
+                                         f'сервером и повторно не отправляется: {error}') from error
+
+    def get_active_tasks_count(self):
+        """
+        Получить количество активных задач пользователя
+
+        Returns
+        -------
+
+        count : int
+            Количество активных задач или None, если его не удалось получить
+        """
+        if self.ACTIVE_TASKS_COUNT_ENDPOINT is None or not self._active_tasks_count_supported:
+            return None
+        try:
+            count = self.send_request('get', self.ACTIVE_TASKS_COUNT_ENDPOINT)
+            return int(count.get('count'))
+        except errors.NotFoundError:
+            # точка API отсутствует в проекте, повторно не запрашивается
+            self._active_tasks_count_supported = False
+            return None
+        except (errors.MediascopeApiError, RequestException, AttributeError, TypeError, ValueError):
             return None
 
+    @classmethod
+    def is_task_submit(cls, method: str, endpoint: str) -> bool:
+        """
+        Проверить, что запрос отправляет задание на расчет и не может быть безопасно повторен
+        """
+        return method.upper() == 'POST' and endpoint.startswith(cls.TASK_SUBMIT_PREFIXES) \
+            and not endpoint.startswith(cls.TASK_IDEMPOTENT_PREFIXES)
+
+    def _is_ambiguous_error(self, e) -> bool:
+        if isinstance(e, errors.MediascopeApiError):
+            return e.code in self.AMBIGUOUS_STATUSES
+        # ошибка подключения означает, что запрос не дошел до сервера
+        if isinstance(e, ConnectTimeout) or not isinstance(e, (ReadTimeout, RequestsConnectionError)):
+            return False
+        reason = getattr(e.args[0], 'reason', None) if e.args else None
+        return not isinstance(reason, NewConnectionError)
+
     def send_request_lo(self, method: str, endpoint: str, data: dict = None,
-                        use_cache: bool = False, limit: int = 1000):
+                        use_cache: bool = False, limit: int = 1000, workers: int = None):
         """
         Отправляет запрос в Mediascope-API
 
@@ -233,6 +611,12 @@ class MediascopeApiNetwork:
         limit : int
             Размер порции данных получаемых за один запрос
 
+        workers : int
+            Количество одновременных запросов при загрузке порций данных.
+            Первая порция загружается отдельно, чтобы получить общее количество записей,
+            остальные - параллельно, и затем собираются в исходном порядке.
+            По умолчанию используется значение атрибута page_workers (1 - последовательная загрузка)
+
         Returns
         -------
 
@@ -244,61 +628,140 @@ class MediascopeApiNetwork:
             raise ValueError(f'Method "{method}" is not supported')
         if data is None:
             data = []
+        if workers is None:
+            workers = self.page_workers
+        if workers < 1:
+            raise ValueError(f'Количество потоков должно быть больше 0: {workers}')
 
         # Check cache
-        cache_query = f'{method}\n{endpoint}\n{data}'
+        cache_query = cache.get_query(method, endpoint, data, self.cache_in_as_set)
         if use_cache and method in ['post', 'get']:
-            cache_data = cache.get_cache(cache_query, self.username)
+            cache_data = self._get_cache(cache_query, endpoint,
+                                         lambda: self.send_request_lo(method, endpoint, data, use_cache=False,
+                                                                      limit=limit, workers=workers), data)
             if cache_data is not None:
                 return cache_data
 
+        def load():
+            published_until = self.published_until
+            result = self._load_pages(method, endpoint, data, limit, workers)
+            if use_cache:
+                self._save_cache(cache_query, result, availability.get_period(data), published_until)
+            return result
+
+        if use_cache and method in ['post', 'get']:
+            return self._single_flight(('send_request_lo', cache_query, limit), load)
+        return load()
+
+    def _load_pages(self, method: str, endpoint: str, data, limit: int, workers: int):
         result = {'header': {'total': 0}}
         result_data = []
-        offset = 0
-        is_reading = True
-
-        while is_reading:
-            self.refresh_token()
 
-            # No cache, request service
-            if endpoint.rfind('?') >= 0:
-                url = self.root_url + endpoint + f'&offset={offset}&limit={limit}'
+        rj = self._get_page(method, endpoint, data, 0, limit)
+        if rj is not None:
+            total = int(rj['header'].get('total', 0))
+            result['header']['total'] = total
+            if isinstance(rj['data'], list):
+                result_data.extend(rj['data'])
+            offsets = list(range(limit, total, limit)) if 'total' in rj['header'] else []
+
+            if workers > 1 and len(offsets) > 1:
+                # токен обновляется до запуска потоков, чтобы не запрашивать его одновременно
+                self.refresh_token()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    pages = list(executor.map(lambda o: self._get_page(method, endpoint, data, o, limit), offsets))
             else:
-                url = self.root_url + endpoint + f'?offset={offset}&limit={limit}'
-            headers = {'Authorization': f'Bearer {self.token["access_token"]}',
-                       'Content-Type': 'application/json'
-                       }
-            req = getattr(self.session, method)(url=url, headers=headers, data=f'{data}', proxies=self.proxies)
-
-            if req.status_code == 200:
-                # try to save in cache for next use
-                rj = self._req_to_json(req, endpoint, data)
-                if rj is None or not isinstance(rj, dict):
-                    break
-                if 'header' not in rj or 'data' not in rj:
+                pages = []
+                for offset in offsets:
+                    page = self._get_page(method, endpoint, data, offset, limit)
+                    if page is None:
+                        break
+                    pages.append(page)
+
+            for page in pages:
+                if page is None:
                     break
-
-                header = rj['header']
-                if 'total' not in header:
-                    is_reading = False
-                    total = limit
-                total = int(header['total'])
-                result['header']['total'] = total
-                offset += limit
-                if offset >= total:
-                    is_reading = False
-
-                if isinstance(rj['data'], list):
-                    result_data.extend(rj['data'])
-            else:
-                self._raise_error(req)
-                break
+                if isinstance(page['data'], list):
+                    result_data.extend(page['data'])
 
         result['data'] = result_data
-        if use_cache:
-            cache.save_cache(cache_query, result, self.username)
         return result
 
+    def iter_request_lo(self, method: str, endpoint: str, data: dict = None, limit: int = 1000):
+        """
+        Отправляет запрос в Mediascope-API с постраничной загрузкой и возвращает порции данных по мере загрузки.
+        В отличие от send_request_lo не накапливает данные в памяти и не использует кэш
+
+        Parameters
+        ----------
+
+        method : str
+            HTTP метод:
+                - get
+                - post
+
+        endpoint : str
+            Путь к точке API, к которому идет обращение. Конкатенируется с основным URL
+
+        data : dict
+            Данные отправляемые в запросе к API
+
+        limit : int
+            Размер порции данных получаемых за один запрос
+
+        Returns
+        -------
+
+        pages : generator
+            Генератор ответов Mediascope-API, каждый ответ содержит разделы header и data
+        """
+        if method not in ['post', 'get', 'delete']:
+            raise ValueError(f'Method "{method}" is not supported')
+        if data is None:
+            data = []
+
+        offset = 0
+        while True:
+            rj = self._get_page(method, endpoint, data, offset, limit)
+            if rj is None:
+                return
+            yield rj
+            offset += limit
+            if 'total' not in rj['header'] or offset >= int(rj['header']['total']):
+                return
+
+    def _get_page(self, method: str, endpoint: str, data, offset: int, limit: int):
+        """
+        Загрузить одну порцию данных, начиная с offset
+
+        Returns
+        -------
+
+        result : dict
+            Ответ Mediascope-API с разделами header и data или None, если ответ не содержит данных
+        """
+        self.refresh_token()
+
+        # No cache, request service
+        if endpoint.rfind('?') >= 0:
+            url = self.root_url + endpoint + f'&offset={offset}&limit={limit}'
+        else:
+            url = self.root_url + endpoint + f'?offset={offset}&limit={limit}'
+        headers = {'Authorization': f'Bearer {self.token["access_token"]}',
+                   'Content-Type': 'application/json'
+                   }
+        req = getattr(self.session, method)(url=url, headers=headers, data=f'{data}', proxies=self.proxies)
+
+        if req.status_code != 200:
+            self._raise_error(req)
+            return None
+        rj = self._req_to_json(req, endpoint, data)
+        if rj is None or not isinstance(rj, dict):
+            return None
+        if 'header' not in rj or 'data' not in rj:
+            return None
+        return rj
+
     def send_raw_request(self, method: str, endpoint: str, data: dict = None):
         """
         Отправляет запрос в Mediascope-API, и получает результат в сыром виде (как есть - в тексте)
@@ -447,6 +910,162 @@ class MediascopeApiNetwork:
             treq.append(f"--data-raw '{data}'")
         print(" \\\n".join(treq))
 
+    def set_cache_ttl(self, ttl_policy: dict):
+        """
+        Задать время жизни кэша для точек API
+
+        Parameters
+        ----------
+
+        ttl_policy : dict
+            Словарь {путь к точке API: время жизни в секундах}, например: {'/dictionary/tv/day-week': 2592000}.
+            Время жизни задается для точки API и всех вложенных путей.
+            Для остальных точек используется время жизни, заданное в хранилище кэша
+        """
+        self.cache_ttl.update(ttl_policy)
+
+    def set_published_until(self, availability_period):
+        """
+        Задать дату, по которую включительно опубликованы данные. Результаты запросов с фильтром
+        по дате исследования, полностью входящим в период, опубликованный на момент запроса,
+        хранятся в кэше без ограничения времени. Дата задается явно, например:
+        network.set_published_until(cats.get_availability_period().to_dict('records'))
+
+        Parameters
+        ----------
+
+        availability_period : str|list
+            Дата в формате YYYY-MM-DD или список доступных периодов (DataFrame.to_dict('records')),
+            см. availability.get_published_until
+        """
+        if isinstance(availability_period, str) or availability_period is None:
+            self.published_until = availability_period
+        else:
+            self.published_until = availability.get_published_until(availability_period)
+
+    def get_cache_ttl(self, endpoint: str):
+        """
+        Получить время жизни кэша для точки API
+
+        Parameters
+        ----------
+
+        endpoint : str
+            Путь к точке API, может содержать параметры запроса
+
+        Returns
+        -------
+
+        ttl : float
+            Время жизни в секундах или None, если для точки API время жизни не задано
+        """
+        path = endpoint.split('?')[0].rstrip('/')
+        while path:
+            if path in self.cache_ttl:
+                return self.cache_ttl[path]
+            path = path[:path.rfind('/')]
+        return None
+
+    @staticmethod
+    def _wrap_cache(value, period, published_until):
+        # для запросов с фильтром по дате исследования вместе с результатом сохраняется дата,
+        # по которую были опубликованы данные на момент запроса
+        if period is None or published_until is None:
+            return value
+        return {_CACHE_PUBLISHED_UNTIL_KEY: published_until, _CACHE_VALUE_KEY: value}
+
+    @staticmethod
+    def _unwrap_cache(value):
+        if isinstance(value, dict) and len(value) == 2 and _CACHE_PUBLISHED_UNTIL_KEY in value \
+                and _CACHE_VALUE_KEY in value:
+            return value[_CACHE_VALUE_KEY], value[_CACHE_PUBLISHED_UNTIL_KEY]
+        return value, None
+
+    def _get_cache(self, query: str, endpoint: str, refresh=None, data=None):
+        if self.cache_backend is None:
+            return None
+        key = cache.get_key(query, self.username)
+        ttl = self.get_cache_ttl(endpoint)
+        period = availability.get_period(data) if data is not None else None
+        if period is None and (not self.stale_while_revalidate or refresh is None):
+            value = self.cache_backend.get(key, ttl)
+            return None if value is None else self._unwrap_cache(value)[0]
+
+        entry = self.cache_backend.load(key)
+        if entry is None:
+            return None
+        created, value = entry
+        value, published_until = self._unwrap_cache(value)
+        # период полностью входил в опубликованные на момент запроса данные: результат не изменится
+        if availability.is_closed(period, published_until):
+            return value
+        age = time.time() - created
+        if ttl is None:
+            ttl = self.cache_backend.ttl
+        if age < ttl:
+            return value
+        if not self.stale_while_revalidate or refresh is None or age >= ttl + self.stale_ttl:
+            return None
+        self._revalidate(key, refresh, period)
+        return value
+
+    def _revalidate(self, key: str, refresh, period=None):
+        """
+        Обновить запись кэша в фоновом потоке. Для каждой записи выполняется не более одного обновления
+        """
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                published_until = self.published_until
+                data = refresh()
+                if data is not None:
+                    self.cache_backend.set(key, self._wrap_cache(data, period, published_until))
+            except Exception as e:
+                print(f'Не удалось обновить кэш: {e}')
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _single_flight(self, key, func):
+        """
+        Выполнить запрос один раз для всех потоков, одновременно запрашивающих одно и то же.
+        Первый поток выполняет запрос, остальные ожидают его завершения и получают копию результата или ту же ошибку
+        """
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def _save_cache(self, query: str, data, period=None, published_until=None):
+        if self.cache_backend is None:
+            return
+        self.cache_backend.set(cache.get_key(query, self.username), self._wrap_cache(data, period, published_until))
+
     @staticmethod
     def _req_to_json(req, endpoint, data):
         try:
@@ -480,3 +1099,73 @@ class MediascopeApiNetwork:
             raise errors.NotFoundError(f'Ресурс не найден: "{req.text}"', req.status_code)
         else:
             raise errors.MediascopeApiError(f'Ошибка: "{req.text}"', req.status_code)
+
+
+# общие для всех классов проектов сетевые модули по ключу (root_url, username, настройки кэша и параметры сети)
+_networks = {}
+_networks_lock = threading.Lock()
+
+
+def _get_network_key(root_url, username, cache_path, cache_enabled, kwargs):
+    options = []
+    for name, value in sorted(kwargs.items()):
+        try:
+            hash(value)
+        except TypeError:
+            # нехэшируемые параметры сравниваются по объекту
+            value = id(value)
+        options.append((name, value))
+    return root_url, username, cache_enabled, cache_path, tuple(options)
+
+
+def get_network(settings_filename: str = None, cache_path: str = None, cache_enabled: bool = True,
+                username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
+                client_secret: str = None, keycloak_url: str = None, **kwargs) -> MediascopeApiNetwork:
+    """
+    Получить общий сетевой модуль для указанных настроек подключения. Сетевой модуль создается один раз
+    для каждого сочетания root_url, username, настроек кэша (cache_path, cache_enabled) и дополнительных
+    параметров (kwargs), все классы проектов с одинаковыми настройками используют общие соединения, токен и кэш
+
+    Parameters
+    ----------
+
+    settings_filename : str
+        Имя файла с настройками подключения, используется, если настройки не заданы параметрами
+
+    cache_path : str
+        Каталог кэша
+
+    cache_enabled : bool
+        Флаг использования кэша
+
+    username, passw, root_url, client_id, client_secret, keycloak_url : str
+        Настройки подключения к Mediascope-API
+
+    kwargs : dict
+        Дополнительные параметры MediascopeApiNetwork (cache_backend, token_file, token_margin, pool_connections,
+        pool_maxsize, pool_block, timeout, tcp_keepalive)
+
+    Returns
+    -------
+
+    network : MediascopeApiNetwork
+        Сетевой модуль
+    """
+    settings = (username, passw, root_url, client_id, client_secret, keycloak_url)
+    if any(v is None for v in settings):
+        if settings_filename is None:
+            if not os.path.exists(MediascopeApiNetwork.DEFAULT_SETTINGS_FILENAME):
+                raise ValueError('Не указаны настройки для подключения к Mediascope-API')
+            settings_filename = MediascopeApiNetwork.DEFAULT_SETTINGS_FILENAME
+        settings = utils.load_settings(settings_filename)[:6]
+
+    key = _get_network_key(settings[2], settings[0], cache_path, cache_enabled, kwargs)
+    with _networks_lock:
+        network = _networks.get(key)
+        # при смене пароля или клиента создается новый сетевой модуль
+        if network is None or (network.passw, network.client_id, network.client_secret, network.keycloak_url) != \
+                (settings[1], settings[3], settings[4], settings[5]):
+            network = MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw, root_url,
+                                           client_id, client_secret, keycloak_url, **kwargs)
+            _networks[key] = network
+        return network
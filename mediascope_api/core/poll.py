@@ -0,0 +1,129 @@
+"""
+Poll module for Mediascope API
+"""
+import random
+import threading
+from collections import OrderedDict
+
+# сглаженное время расчета заданий по типам и тип каждого отправленного задания. Типы заданий удаляются
+# после сохранения времени расчета, задания, которые не были завершены или не ожидались, вытесняются
+# при превышении MAX_TASKS
+MAX_TASKS = 10000
+_durations = {}
+_task_types = OrderedDict()
+_lock = threading.Lock()
+
+
+def register_task(task_id: str, task_type: str):
+    """
+    Запомнить тип отправленного задания, чтобы при ожидании учитывать время расчета заданий того же типа
+
+    Parameters
+    ----------
+
+    task_id : str
+        Идентификатор задания
+
+    task_type : str
+        Тип задания с указанием проекта, например: mediavortex:timeband
+    """
+    if task_id is None or task_type is None:
+        return
+    with _lock:
+        _task_types[task_id] = task_type
+        _task_types.move_to_end(task_id)
+        while len(_task_types) > MAX_TASKS:
+            _task_types.popitem(last=False)
+
+
+def record_duration(task_id: str, duration, smoothing: float = 0.5):
+    """
+    Сохранить время расчета завершенного задания
+
+    Parameters
+    ----------
+
+    task_id : str
+        Идентификатор задания
+
+    duration : float
+        Время расчета задания в секундах
+
+    smoothing : float
+        Вес нового значения при сглаживании времени расчета заданий одного типа
+    """
+    with _lock:
+        task_type = _task_types.pop(task_id, None)
+        try:
+            duration = float(duration)
+        except (TypeError, ValueError):
+            return
+        if task_type is None:
+            return
+        prev = _durations.get(task_type)
+        if prev is None:
+            _durations[task_type] = duration
+        else:
+            _durations[task_type] = smoothing * duration + (1 - smoothing) * prev
+
+
+def get_expected_duration(task_ids: list):
+    """
+    Получить ожидаемое время расчета заданий по истории заданий тех же типов
+
+    Parameters
+    ----------
+
+    task_ids : list
+        Список идентификаторов заданий
+
+    Returns
+    -------
+    duration : float
+        Ожидаемое время расчета в секундах или None, если история отсутствует
+    """
+    with _lock:
+        durations = [_durations.get(_task_types.get(tid)) for tid in task_ids]
+    durations = [d for d in durations if d is not None]
+    if len(durations) == 0:
+        return None
+    return max(durations)
+
+
+class PollScheduler:
+    """
+    Планировщик опроса статуса заданий: экспоненциальное увеличение задержки со случайным разбросом
+    и ограничением сверху. Первая задержка рассчитывается по времени расчета ранее выполненных заданий того же типа
+    """
+    def __init__(self, task_ids: list = None, min_delay: float = 0.5, max_delay: float = 30,
+                 factor: float = 1.5, jitter: float = 0.2, fixed_delay: float = None):
+        if fixed_delay is not None:
+            min_delay = max_delay = fixed_delay
+            jitter = 0
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.expected = get_expected_duration(task_ids or [])
+        self.delay = None
+
+    def _clamp(self, value):
+        return min(self.max_delay, max(self.min_delay, value))
+
+    def next_delay(self) -> float:
+        """
+        Получить задержку в секундах перед следующим опросом статуса
+        """
+        if self.delay is None:
+            if self.expected is not None:
+                # первый опрос - незадолго до ожидаемого окончания расчета, далее - частые опросы с ростом задержки
+                delay = self._clamp(self.expected * 0.8)
+                self.delay = self._clamp(self.expected * 0.1)
+            else:
+                delay = self.delay = self.min_delay
+        else:
+            self.delay = self._clamp(self.delay * self.factor)
+            delay = self.delay
+        if self.jitter > 0:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
@@ -0,0 +1,247 @@
+"""
+Rate limit module for Mediascope API
+"""
+import datetime
+import email.utils
+import threading
+import time
+from urllib.parse import urlsplit
+
+# группы точек API с отдельными ограничениями частоты запросов:
+# task - отправка заданий, state - опрос статуса заданий, dictionary - словари, результаты и остальные запросы
+GROUP_TASK = 'task'
+GROUP_STATE = 'state'
+GROUP_DICTIONARY = 'dictionary'
+
+# частота запросов по умолчанию не ограничивается (None)
+DEFAULT_RATES = {
+    GROUP_TASK: None,
+    GROUP_STATE: None,
+    GROUP_DICTIONARY: None
+}
+
+# частота запросов в секунду, которая задается для неограниченной группы после первого ответа 429,
+# затем частота снижается и восстанавливается адаптивно (см. TokenBucket)
+THROTTLED_RATES = {
+    GROUP_TASK: 5,
+    GROUP_STATE: 10,
+    GROUP_DICTIONARY: 20
+}
+
+
+def get_retry_after(headers, attempt: int, max_delay: float = 600) -> float:
+    """
+    Получить время ожидания перед повтором запроса из заголовка Retry-After ответа 429.
+    Заголовок может содержать количество секунд или дату, если заголовок отсутствует,
+    время ожидания увеличивается экспоненциально с каждой попыткой
+
+    Parameters
+    ----------
+
+    headers : dict
+        Заголовки ответа
+
+    attempt : int
+        Номер попытки, начиная с 0
+
+    max_delay : float
+        Максимальное время ожидания в секундах
+
+    Returns
+    -------
+
+    delay : float
+        Время ожидания в секундах
+    """
+    value = headers.get('Retry-After') if headers is not None else None
+    delay = None
+    if value:
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                dt = email.utils.parsedate_to_datetime(value)
+                delay = (dt - datetime.datetime.now(dt.tzinfo)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+    if delay is None:
+        delay = 2 ** attempt
+    return min(max(delay, 0), max_delay)
+
+
+class TokenBucket:
+    """
+    Корзина токенов: запросы выполняются с частотой не более rate в секунду, допускается
+    одновременная отправка не более burst запросов.
+    При получении ответа 429 частота уменьшается вдвое (но не ниже min_rate) и запросы приостанавливаются
+    на время из заголовка Retry-After, после успешных ответов частота постепенно восстанавливается до rate
+    """
+    DECREASE_FACTOR = 0.5
+    INCREASE_STEP = 0.05
+
+    def __init__(self, rate: float, burst: float = None, min_rate: float = None):
+        if rate <= 0:
+            raise ValueError(f'Частота запросов должна быть больше 0: {rate}')
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Занять токен для запроса
+
+        Returns
+        -------
+
+        delay : float
+            Время в секундах, которое необходимо подождать перед отправкой запроса
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now)
+
+    def acquire(self):
+        """
+        Дождаться возможности отправить запрос
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_throttled(self, retry_after: float):
+        """
+        Учесть ответ 429: уменьшить частоту запросов и приостановить запросы на retry_after секунд
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.DECREASE_FACTOR)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self):
+        """
+        Учесть успешный ответ: постепенно восстановить частоту запросов
+        """
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.INCREASE_STEP)
+
+    def get_stats(self) -> dict:
+        """
+        Получить текущую частоту запросов и количество полученных ответов 429
+        """
+        return {'rate': self.rate, 'max_rate': self.max_rate, 'burst': self.burst, 'throttled': self.throttled}
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов к Mediascope API по группам точек API (см. DEFAULT_RATES).
+    Ограничение применяется только к запросам к root_url, запросы авторизации не ограничиваются.
+    По умолчанию частота не ограничивается, пока сервер не ответит 429 (см. get_throttled_bucket)
+    """
+
+    def __init__(self, root_url: str = None, rates: dict = None, max_retries: int = 5):
+        self.root_url = root_url
+        self.max_retries = max_retries
+        self.buckets = {}
+        self._lock = threading.Lock()
+        self.set_rates(DEFAULT_RATES if rates is None else rates)
+
+    def set_rates(self, rates: dict):
+        """
+        Задать частоту запросов для групп точек API
+
+        Parameters
+        ----------
+
+        rates : dict
+            Словарь {группа: частота в секунду}, например {'task': 2, 'state': 5}.
+            Для частоты можно указать кортеж (частота, количество одновременных запросов).
+            None - частота запросов группы не ограничивается до получения ответа 429
+        """
+        for group, rate in rates.items():
+            if group not in DEFAULT_RATES:
+                raise ValueError(f'Неизвестная группа точек API "{group}", '
+                                 f'допустимые значения: {", ".join(DEFAULT_RATES)}')
+            with self._lock:
+                if rate is None:
+                    self.buckets.pop(group, None)
+                elif isinstance(rate, (tuple, list)):
+                    self.buckets[group] = TokenBucket(*rate)
+                else:
+                    self.buckets[group] = TokenBucket(rate)
+
+    def get_group(self, method: str, url: str):
+        """
+        Определить группу точки API для запроса
+
+        Returns
+        -------
+
+        group : str
+            Группа точки API или None, если запрос не ограничивается
+        """
+        if self.root_url is not None and not url.startswith(self.root_url):
+            return None
+        path = urlsplit(url).path
+        if '/task/state' in path:
+            return GROUP_STATE
+        if ('/task/' in path or path.endswith('/daily-task')) and method.upper() == 'POST':
+            return GROUP_TASK
+        return GROUP_DICTIONARY
+
+    def is_retryable(self, method: str, url: str) -> bool:
+        """
+        Проверить, что ответ 429 на запрос повторяется автоматически. Ответ 429 на отправку задания
+        означает, что достигнут лимит активных задач пользователя: такой ответ не повторяется
+        и не снижает частоту запросов, его обрабатывает вызывающий код (ошибка TooManyRequestsError)
+        """
+        return self.get_group(method, url) != GROUP_TASK
+
+    def get_bucket(self, method: str, url: str):
+        """
+        Получить корзину токенов для запроса или None, если запрос не ограничивается
+        """
+        group = self.get_group(method, url)
+        if group is None:
+            return None
+        return self.buckets.get(group)
+
+    def get_throttled_bucket(self, method: str, url: str):
+        """
+        Получить корзину токенов для запроса, получившего ответ 429. Если частота запросов группы
+        не ограничена, для группы создается корзина с частотой THROTTLED_RATES
+
+        Returns
+        -------
+
+        bucket : TokenBucket
+            Корзина токенов или None, если запрос не ограничивается
+        """
+        group = self.get_group(method, url)
+        if group is None:
+            return None
+        with self._lock:
+            bucket = self.buckets.get(group)
+            if bucket is None:
+                bucket = TokenBucket(THROTTLED_RATES[group])
+                self.buckets[group] = bucket
+            return bucket
+
+    def get_stats(self) -> dict:
+        """
+        Получить текущую частоту запросов и количество ответов 429 по группам точек API
+        """
+        return {group: bucket.get_stats() for group, bucket in self.buckets.items()}
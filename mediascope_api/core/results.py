@@ -0,0 +1,167 @@
+"""
+Result cache module for Mediascope API
+"""
+import datetime
+import time
+from . import availability
+from . import cache
+
+
+class ResultCache:
+    """
+    Кэш результатов расчета заданий. Ключ кэша формируется по каноническому тексту задания
+    (см. cache.get_query), поэтому одинаковые задания рассчитываются на сервере один раз.
+    Вместе с результатом сохраняются идентификатор задания и период доступных данных на момент расчета.
+    Результаты хранятся в хранилище кэша сетевого модуля, при отключенном кэше не сохраняются.
+    Результаты заданий за периоды, данные за которые были полностью опубликованы на момент расчета,
+    не устаревают, остальные результаты хранятся ttl секунд
+    """
+    DEFAULT_TTL = cache.DEFAULT_TTL
+
+    def __init__(self, network, project: str, ttl: float = DEFAULT_TTL):
+        self.network = network
+        self.project = project
+        self.ttl = ttl
+
+    def get_key(self, task) -> str:
+        """
+        Получить ключ кэша для задания
+
+        Parameters
+        ----------
+
+        task : str|dict|Task
+            Задание
+
+        Returns
+        -------
+
+        key : str
+            Ключ кэша
+        """
+        query = cache.get_query('task', f'/{self.project}', task, self.network.cache_in_as_set)
+        return cache.get_key(query, f'result-{self.network.username}')
+
+    def get(self, task):
+        """
+        Получить сохраненный результат расчета задания
+
+        Parameters
+        ----------
+
+        task : str|dict|Task
+            Задание
+
+        Returns
+        -------
+
+        entry : dict
+            Запись кэша или None, если задание не рассчитывалось:
+                - taskId - идентификатор задания, результат которого сохранен
+                - dtSaved - дата и время сохранения результата
+                - availability - период доступных данных на момент расчета
+                - result - результат расчета задания
+        """
+        if self.network.cache_backend is None:
+            return None
+        entry = self.network.cache_backend.load(self.get_key(task))
+        if entry is None:
+            return None
+        created, value = entry
+        if time.time() - created < self.ttl or self.is_closed(task, value):
+            return value
+        return None
+
+    @staticmethod
+    def is_closed(task, entry) -> bool:
+        """
+        Проверить, что задание рассчитано за период, данные за который были полностью опубликованы
+        на момент расчета, и сохраненный результат не изменится
+
+        Parameters
+        ----------
+
+        task : str|dict|Task
+            Задание
+
+        entry : dict
+            Запись кэша, см. get
+        """
+        if not isinstance(entry, dict):
+            return False
+        published_until = availability.get_published_until(entry.get('availability'))
+        return availability.is_closed(availability.get_period(task), published_until)
+
+    def save(self, task, task_id: str, result, availability=None):
+        """
+        Сохранить результат расчета задания
+
+        Parameters
+        ----------
+
+        task : str|dict|Task
+            Задание
+
+        task_id : str
+            Идентификатор рассчитанного задания
+
+        result : dict
+            Результат расчета задания
+
+        availability : list
+            Период доступных данных на момент расчета
+        """
+        if self.network.cache_backend is None:
+            return
+        entry = {
+            'taskId': task_id,
+            'dtSaved': datetime.datetime.now().isoformat(),
+            'availability': availability,
+            'result': result
+        }
+        self.network.cache_backend.set(self.get_key(task), entry)
+
+    def delete(self, task):
+        """
+        Удалить сохраненный результат расчета задания
+        """
+        if self.network.cache_backend is None:
+            return
+        self.network.cache_backend.delete(self.get_key(task))
+
+    def submit_or_reuse(self, task, send_task, wait_task, get_result, get_availability=None):
+        """
+        Получить результат расчета задания из кэша, если такое же задание уже рассчитано,
+        иначе отправить задание на расчет, дождаться окончания расчета и сохранить результат
+
+        Parameters
+        ----------
+
+        task : str|dict|Task
+            Задание
+
+        send_task, wait_task, get_result : function
+            Методы отправки задания, ожидания расчета и получения результата класса заданий
+
+        get_availability : function
+            Функция получения периода доступных данных. Период запрашивается до отправки задания:
+            данные, опубликованные во время расчета, могли не войти в результат
+
+        Returns
+        -------
+
+        result : dict
+            Результат расчета задания
+        """
+        entry = self.get(task)
+        if entry is not None:
+            return entry['result']
+
+        availability = get_availability() if get_availability is not None else None
+        tsk = wait_task(send_task(task))
+        if tsk is None or tsk.get('taskId') is None:
+            return None
+        result = get_result(tsk)
+        if result is not None:
+            self.save(task, tsk['taskId'], result, availability)
+        return result
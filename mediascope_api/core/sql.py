@@ -1,6 +1,9 @@
 """
 Module for parsing SQL-like expressions to API format
 """
+import functools
+import re
+import threading
 import pyparsing
 
 # Проверяем, какая версия pyparsing используется
@@ -50,6 +53,8 @@ if IS_NEW_PYPARSE:
     removeQuotes = pyparsing.remove_quotes
     setName = lambda obj, name: obj.set_name(name)
     setParseAction = lambda obj, func: obj.set_parse_action(func)
+    addParseAction = lambda obj, func: obj.add_parse_action(func)
+    downcaseTokens = ppc.downcase_tokens
     parseString = lambda parser, text: parser.parse_string(text)
     asList = lambda obj: obj.as_list()
 
@@ -80,6 +85,8 @@ else:
     # Создаем функции-обертки для совместимости
     setName = lambda obj, name: obj.setName(name)
     setParseAction = lambda obj, func: obj.setParseAction(func)
+    addParseAction = lambda obj, func: obj.addParseAction(func)
+    downcaseTokens = ppc.downcaseTokens
     parseString = lambda parser, text: parser.parseString(text)
     asList = lambda obj: obj.asList()
 
@@ -88,10 +95,16 @@ else:
     RPAR = ")"
 
 
-def _prepare_sql_parser():
+def _prepare_sql_parser(downcase=False):
     """
     Подготовка SQL-like парсера для разбора условий в фильтрах.
 
+    Parameters
+    ----------
+
+    downcase : bool
+        Переводить имена атрибутов в нижний регистр
+
     Returns
     -------
 
@@ -109,15 +122,19 @@ def _prepare_sql_parser():
 
     column_name = delimitedList(ident, ".", combine=True)
     setName(column_name, "column name")
+    if downcase:
+        addParseAction(column_name, downcaseTokens)
 
     binop = oneOf("= != > < <= >=", caseless=True)
     real_num = ppc.real()
     int_num = ppc.signed_integer()
 
+    # кавычки удаляются у копии, общий объект pyparsing quotedString не изменяется
+    quoted_string = quotedString.copy()
+    setParseAction(quoted_string, removeQuotes)
     column_rval = (
-            real_num | int_num | quotedString | column_name
+            real_num | int_num | quoted_string | column_name
     )
-    setParseAction(quotedString, removeQuotes)
 
     # Для новой версии pyparsing используем Literal для скобок
     if IS_NEW_PYPARSE:
@@ -153,118 +170,517 @@ def _prepare_sql_parser():
     return simple_sql
 
 
-def _get_point(left_obj, logic_operand, right_obj):
+# количество разобранных условий, хранимых в кэше parse_sql
+SQL_CACHE_SIZE = 1024
+
+_sql_parsers = threading.local()
+_sql_parser_lock = threading.Lock()
+
+
+def _get_sql_parser(downcase=False):
+    """
+    Получить SQL-like парсер. Грамматика pyparsing не допускает одновременного разбора в нескольких потоках,
+    поэтому парсер создается один раз для каждого потока и используется в нем повторно
+    """
+    parsers = getattr(_sql_parsers, 'parsers', None)
+    if parsers is None:
+        parsers = _sql_parsers.parsers = {}
+    sql_parser = parsers.get(downcase)
+    if sql_parser is None:
+        # создание грамматики изменяет общие объекты pyparsing
+        with _sql_parser_lock:
+            sql_parser = parsers[downcase] = _prepare_sql_parser(downcase)
+    return sql_parser
+
+
+def _freeze(obj):
+    if isinstance(obj, list):
+        return tuple(_freeze(i) for i in obj)
+    return obj
+
+
+def _thaw(obj):
+    if isinstance(obj, tuple):
+        return [_thaw(i) for i in obj]
+    return obj
+
+
+# быстрый разбор условий без pyparsing (см. _parse_sql_fast), при False используется только pyparsing
+USE_FAST_PARSER = True
+
+# лексемы грамматики _prepare_sql_parser, регулярные выражения чисел и строк совпадают с pyparsing
+_SQL_TOKEN_RE = re.compile(r"""
+    (?P<skip>[ \t\n\r]+|--[^\n]*)
+    |(?P<real>[+-]?(?:\d+\.\d*|\.\d+))
+    |(?P<int>[+-]?\d+)
+    |(?P<str>"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*"|'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*')
+    |(?P<name>[A-Za-z][A-Za-z0-9_$]*(?:\.[A-Za-z][A-Za-z0-9_$]*)*)
+    |(?P<op><=|>=|!=|=|<|>)
+    |(?P<punct>[(),])
+""", re.VERBOSE)
+
+_SQL_KEYWORDS = ('and', 'or', 'in', 'notin', 'nin')
+_SQL_IDENT_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_$')
+
+
+class _FastParseError(Exception):
     """
-    Формирует объект - point понятный для API
+    Условие не поддерживается быстрым разбором, используется pyparsing
+    """
+
+
+def _tokenize_sql(sql_text, downcase=False):
+    tokens = []
+    pos = 0
+    end = len(sql_text)
+    match = _SQL_TOKEN_RE.match
+    while pos < end:
+        m = match(sql_text, pos)
+        if m is None:
+            raise _FastParseError(pos)
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'skip':
+            pass
+        elif kind == 'name':
+            # ключевое слово или имя вплотную после числа pyparsing не распознает
+            if pos > 0 and sql_text[pos - 1] in _SQL_IDENT_CHARS:
+                raise _FastParseError(pos)
+            lower = value.lower()
+            if lower in _SQL_KEYWORDS:
+                tokens.append(('kw', lower))
+            else:
+                tokens.append(('name', lower if downcase else value))
+        elif kind == 'int':
+            tokens.append(('value', int(value)))
+        elif kind == 'real':
+            tokens.append(('value', float(value)))
+        elif kind == 'str':
+            tokens.append(('value', value[1:-1]))
+        else:
+            tokens.append((kind, value))
+        pos = m.end()
+    tokens.append(('end', None))
+    return tokens
+
+
+class _SqlParser:
+    """
+    Разбор условия методом рекурсивного спуска, результат совпадает с результатом pyparsing (asList)
+    в виде вложенных кортежей. При любом отклонении от грамматики возникает _FastParseError
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _next(self, kind, value=None):
+        token = self.tokens[self.pos]
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise _FastParseError(self.pos)
+        self.pos += 1
+        return token[1]
+
+    def parse(self):
+        result = self._parse_chain('or')
+        self._next('end')
+        return result
+
+    def _parse_chain(self, operand):
+        parse_item = self._parse_primary if operand == 'and' else lambda: self._parse_chain('and')
+        items = [parse_item()]
+        tokens = self.tokens
+        while tokens[self.pos] == ('kw', operand):
+            self.pos += 1
+            items.append(operand)
+            items.append(parse_item())
+        return items[0] if len(items) == 1 else tuple(items)
+
+    def _parse_primary(self):
+        if self.tokens[self.pos] == ('punct', '('):
+            self.pos += 1
+            result = self._parse_chain('or')
+            self._next('punct', ')')
+            return result
+        return self._parse_condition()
+
+    def _parse_condition(self):
+        column = self._next('name')
+        kind, value = self.tokens[self.pos]
+        self.pos += 1
+        if kind == 'op':
+            rval_kind, rval = self.tokens[self.pos]
+            if rval_kind not in ('value', 'name'):
+                raise _FastParseError(self.pos)
+            self.pos += 1
+            return column, value, rval
+        if kind == 'kw' and value in ('in', 'notin', 'nin'):
+            return column, value, self._parse_list()
+        raise _FastParseError(self.pos)
+
+    def _parse_list(self):
+        self._next('punct', '(')
+        items = ['(']
+        tokens = self.tokens
+        while True:
+            kind, value = tokens[self.pos]
+            if kind not in ('value', 'name'):
+                raise _FastParseError(self.pos)
+            items.append(value)
+            kind, value = tokens[self.pos + 1]
+            self.pos += 2
+            if kind != 'punct':
+                raise _FastParseError(self.pos)
+            if value == ')':
+                break
+            if value != ',':
+                raise _FastParseError(self.pos)
+        items.append(')')
+        return tuple(items)
+
+
+def _parse_sql_fast(sql_text, downcase=False):
+    """
+    Разобрать условие без pyparsing. Поддерживаются сравнения, IN, NOTIN, NIN со списками значений,
+    AND, OR, скобки и комментарии --. Для остальных условий возникает _FastParseError
+    """
+    return _SqlParser(_tokenize_sql(sql_text, downcase)).parse()
+
+
+def _parse_sql_pyparsing(sql_text, downcase=False):
+    sql_obj = parseString(_get_sql_parser(downcase), sql_text)
+    return _freeze(asList(sql_obj)[0])
+
+
+@functools.lru_cache(maxsize=SQL_CACHE_SIZE)
+def parse_sql(sql_text, downcase=False):
+    """
+    Разобрать условие фильтрации, записанное в SQL нотации. Условие разбирается быстрым парсером,
+    условия, которые он не поддерживает, - с помощью pyparsing. Результаты разбора кэшируются
+    (последние SQL_CACHE_SIZE условий), поэтому возвращается неизменяемый объект,
+    очистить кэш можно методом parse_sql.cache_clear()
 
     Parameters
     ----------
 
-    left_obj : str
-        Левая часть выражения
-    logic_operand : str
-        Логический оператор
-    right_obj : obj
-        Правая часть выражения
+    sql_text : str
+        Текст условия в SQL формате
+
+    downcase : bool
+        Переводить имена атрибутов в нижний регистр
 
 
     Returns
     -------
-    point : dict
-        Объект - point понятный для API
-
-    """
-    # корректируем демо атрибуты: переводим названия в идентификаторы
-    # if left_obj in self.demo_dict:
-    #     left_obj = self.demo_dict[left_obj]['v']
-    # проверяем логику
-    point = {}
-    if logic_operand in ['in', 'notin', 'nin']:
-        # ожидаем в правой части список атрибутов, бежим по нему
-        if isinstance(right_obj, list):
-            point = {"unit": left_obj, "relation": str(logic_operand).upper(), "value": []}
-            for robj in right_obj:
-                if isinstance(robj, str) and (robj == '(' or robj == ')'):
-                    # пропускаем скобки, объекты и так лежат в отдельном списке
-                    continue
-                # формируем условие в json формате
-                point['value'].append(robj)
-    elif logic_operand == '!=':
-        point = {"unit": left_obj, "relation": "NEQ", "value": right_obj}
-    elif logic_operand == '>':
-        point = {"unit": left_obj, "relation": "GT", "value": right_obj}
-    elif logic_operand == '<':
-        point = {"unit": left_obj, "relation": "LT", "value": right_obj}
-    elif logic_operand == '>=':
-        point = {"unit": left_obj, "relation": "GTE", "value": right_obj}
-    elif logic_operand == '<=':
-        point = {"unit": left_obj, "relation": "LTE", "value": right_obj}
-    else:
-        point = {"unit": left_obj, "relation": "EQ", "value": right_obj}
+    obj : tuple
+        Дерево разбора условия в виде вложенных кортежей
+    """
+    if USE_FAST_PARSER:
+        try:
+            return _parse_sql_fast(sql_text, downcase)
+        except _FastParseError:
+            pass
+    return _parse_sql_pyparsing(sql_text, downcase)
+
+
+# операторы условий SQL нотации и соответствующие им отношения API
+SQL_RELATIONS = {
+    '=': 'EQ',
+    '!=': 'NEQ',
+    '>': 'GT',
+    '<': 'LT',
+    '>=': 'GTE',
+    '<=': 'LTE',
+    'in': 'IN',
+    'notin': 'NIN',
+    'nin': 'NIN'
+}
+
+
+# отношение API -> оператор SQL нотации, используется при записи дерева условий в SQL нотации
+RELATION_OPERATORS = {
+    'EQ': '=',
+    'NEQ': '!=',
+    'GT': '>',
+    'LT': '<',
+    'GTE': '>=',
+    'LTE': '<=',
+    'IN': 'in',
+    'NIN': 'nin'
+}
+
+
+def _sql_value(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+class FilterNode:
+    """
+    Базовый класс узлов дерева условий фильтра. Узлы объединяются операторами & (AND) и | (OR)
+    и принимаются везде, где можно указать фильтр в SQL нотации
+    """
+    __slots__ = ()
+
+    def to_json(self):
+        """
+        Условия фильтрации в формате API (MediaVortex, CrossWeb, Counter)
+        """
+        return ApiEmitter().emit(self)
+
+    def to_responsum(self, units=None):
+        """
+        Условия фильтрации в формате Responsum API, см. ResponsumEmitter
+        """
+        return ResponsumEmitter(units).emit(self)
+
+    def to_sql(self):
+        """
+        Условие фильтрации в SQL нотации
+        """
+        raise NotImplementedError
 
-    return point
+    def __str__(self):
+        return self.to_sql()
 
+    def __and__(self, other):
+        return ConditionGroup('AND', [self, to_filter(other)])
 
-def _find_points(obj):
+    def __or__(self, other):
+        return ConditionGroup('OR', [self, to_filter(other)])
+
+
+class Condition(FilterNode):
     """
-    Ищет в исходном объекте, объекты типа point и преобразует их в формат API
+    Условие фильтра: атрибут, отношение (см. SQL_RELATIONS) и значение.
+    Для отношений IN и NIN значение - кортеж значений
     """
-    if isinstance(obj, list):
-        if len(obj) == 3 and isinstance(obj[0], str) and obj[1] in ['=', '!=', 'in', 'nin', ">", "<", ">=", "<="]:
-            return _get_point(obj[0], obj[1], obj[2])
-    i = 0
-    while i < len(obj):
-        obj_item = obj[i]
-        if isinstance(obj_item, list):
-            obj[i] = _find_points(obj_item)
-        i += 1
-    return obj
+    __slots__ = ('unit', 'relation', 'value')
+
+    def __init__(self, unit, relation, value):
+        self.unit = unit
+        self.relation = relation
+        self.value = value
+
+    def __eq__(self, other):
+        return (isinstance(other, Condition) and self.unit == other.unit and self.relation == other.relation
+                and self.value == other.value)
+
+    def __repr__(self):
+        return f'Condition({self.unit!r}, {self.relation!r}, {self.value!r})'
+
+    def to_sql(self):
+        if self.relation in ('IN', 'NIN'):
+            value = '(' + ', '.join(_sql_value(v) for v in self.value) + ')'
+        else:
+            value = _sql_value(self.value)
+        return f'{self.unit} {RELATION_OPERATORS[self.relation]} {value}'
 
 
-def _parse_expr(obj):
+class ConditionGroup(FilterNode):
     """
-    Преобразует выражение для фильтрации из набора вложенных списков в формат API
+    Группа условий фильтра, объединенных оператором AND или OR
+    """
+    __slots__ = ('operand', 'items')
+
+    def __init__(self, operand, items):
+        self.operand = operand
+        self.items = items
+
+    def __eq__(self, other):
+        return isinstance(other, ConditionGroup) and self.operand == other.operand and self.items == other.items
+
+    def __repr__(self):
+        return f'ConditionGroup({self.operand!r}, {self.items!r})'
+
+    def to_sql(self):
+        return f' {self.operand.lower()} '.join(
+            f'({i.to_sql()})' if isinstance(i, ConditionGroup) else i.to_sql() for i in self.items)
+
+
+def _to_ast(tree):
+    if len(tree) == 3 and isinstance(tree[0], str) and tree[1] in SQL_RELATIONS:
+        relation = SQL_RELATIONS[tree[1]]
+        if relation in ('IN', 'NIN'):
+            # значения списка без открывающей и закрывающей скобок
+            return Condition(tree[0], relation, tuple(_thaw(i) for i in tree[2][1:-1]))
+        return Condition(tree[0], relation, tree[2])
+    return ConditionGroup(tree[1].upper(), [_to_ast(i) for i in tree[::2]])
+
+
+def parse_filter(sql_text, downcase=False):
+    """
+    Разобрать условие фильтрации, записанное в SQL нотации, в дерево условий (Condition, ConditionGroup).
+    Дерево не зависит от формата API и преобразуется в JSON с помощью ApiEmitter или ResponsumEmitter
 
     Parameters
     ----------
 
-    obj : dict | list
-        Объект с условиями фильтрации в виде набора вложенных списков, полученный после работы SQL парсера
+    sql_text : str
+        Текст условия в SQL формате
+
+    downcase : bool
+        Переводить имена атрибутов в нижний регистр
 
 
     Returns
     -------
-    jdat : dict
+    node : Condition | ConditionGroup
+        Дерево условий
+    """
+    return _to_ast(parse_sql(sql_text, downcase))
+
+
+def from_json(obj):
+    """
+    Преобразовать условия фильтрации в формате API (см. sql_to_json) в дерево условий
+
+    Parameters
+    ----------
+
+    obj : dict
         Условия фильтрации в формате API
+
+
+    Returns
+    -------
+    node : Condition | ConditionGroup
+        Дерево условий
     """
-    if isinstance(obj, list):
-        jdata = {}
-        for obj_item in obj:
-            if isinstance(obj_item, list):
-                ret_data = _parse_expr(obj_item)
-                if jdata.get('children') is None:
-                    jdata['children'] = [ret_data]
-                else:
-                    jdata['children'].append(ret_data)
-            elif isinstance(obj_item, dict):  # and 'point' in obj_item.keys():
-                if obj_item.get('elements') is None:
-                    if jdata.get('elements') is None:
-                        jdata['elements'] = []
-                    jdata['elements'].append(obj_item)
-                else:
-                    if jdata.get('children') is None:
-                        jdata['children'] = []
-                    jdata['children'].append(obj_item)
-            elif isinstance(obj_item, str) and obj_item in ['or', 'and']:
-                jdata["operand"] = obj_item.upper()
-        return jdata
+    items = []
+    for element in obj.get('elements') or []:
+        value = element.get('value')
+        if element['relation'] in ('IN', 'NIN') and isinstance(value, list):
+            value = tuple(value)
+        items.append(Condition(element['unit'], element['relation'], value))
+    items.extend(from_json(child) for child in obj.get('children') or [])
+    if len(items) == 1 and obj.get('operand', 'OR') == 'OR' and isinstance(items[0], Condition):
+        return items[0]
+    return ConditionGroup(obj.get('operand', 'OR'), items)
+
+
+def to_filter(obj):
+    """
+    Получить дерево условий из условия в SQL нотации, в формате API или дерева условий
+
+    Parameters
+    ----------
+
+    obj : str | dict | FilterNode
+        Условие фильтрации
+
+
+    Returns
+    -------
+    node : FilterNode
+        Дерево условий
+    """
+    if isinstance(obj, FilterNode):
+        return obj
+    if isinstance(obj, str):
+        return parse_filter(obj)
     if isinstance(obj, dict):
-        jdata = {'elements': []}
-        jdata['elements'].append(obj)
-        jdata["operand"] = 'OR'
+        return from_json(obj)
+    raise ValueError(f'Неверно задан фильтр: {obj!r}')
+
+
+class FilterEmitter:
+    """
+    Базовый класс преобразования дерева условий в JSON формат API.
+    Наследники определяют формат условия (condition), группы (group) и условия верхнего уровня (emit)
+    """
+
+    def emit(self, node):
+        raise NotImplementedError
+
+    def condition(self, node):
+        raise NotImplementedError
+
+    def group(self, node):
+        raise NotImplementedError
+
+    def item(self, node):
+        if isinstance(node, ConditionGroup):
+            return self.group(node)
+        return self.condition(node)
+
+
+class ApiEmitter(FilterEmitter):
+    """
+    Формат фильтров MediaVortex, CrossWeb, Counter: {"operand": ..., "elements": [{"unit", "relation", "value"}],
+    "children": [...]}
+    """
+
+    def emit(self, node):
+        if isinstance(node, ConditionGroup):
+            return self.group(node)
+        return {'elements': [self.condition(node)], 'operand': 'OR'}
+
+    def condition(self, node):
+        value = list(node.value) if node.relation in ('IN', 'NIN') else node.value
+        return {"unit": node.unit, "relation": node.relation, "value": value}
+
+    def group(self, node):
+        jdata = {}
+        for i, item in enumerate(node.items):
+            if i == 1:
+                jdata['operand'] = node.operand
+            key = 'children' if isinstance(item, ConditionGroup) else 'elements'
+            jdata.setdefault(key, []).append(self.item(item))
+        jdata.setdefault('operand', node.operand)
         return jdata
 
 
+class ResponsumEmitter(FilterEmitter):
+    """
+    Формат фильтров Responsum: {"children": [{"point": {"type", "val"}, "operator", "isNot"}], "logic", "isNot"}
+
+    Parameters
+    ----------
+
+    units : dict
+        Словарь {атрибут в нижнем регистре: идентификатор}, атрибуты условий заменяются идентификаторами
+    """
+    # отношение -> (оператор Responsum, отрицание)
+    OPERATORS = {
+        'EQ': ('EQUAL', False),
+        'NEQ': ('EQUAL', True),
+        'GT': ('ABOVE', False),
+        'LT': ('LESS', False),
+        'GTE': ('LESS', True),
+        'LTE': ('ABOVE', True)
+    }
+
+    def __init__(self, units=None):
+        self.units = units if units is not None else {}
+
+    def emit(self, node):
+        if isinstance(node, ConditionGroup):
+            return self.group(node)
+        return {'children': [self.condition(node)], 'logic': 'OR', 'isNot': False}
+
+    @staticmethod
+    def _point(unit, operator, is_not, value):
+        return {"point": {"type": unit, "val": value}, "operator": operator, "isNot": is_not}
+
+    def condition(self, node):
+        # имена атрибутов Responsum не зависят от регистра
+        unit = node.unit.lower() if isinstance(node.unit, str) else node.unit
+        unit = self.units.get(unit, unit)
+        if node.relation in ('IN', 'NIN'):
+            return {
+                "children": [self._point(unit, "EQUAL", False, v) for v in node.value],
+                "logic": "OR",
+                "isNot": node.relation == 'NIN'
+            }
+        operator, is_not = self.OPERATORS[node.relation]
+        return self._point(unit, operator, is_not, node.value)
+
+    def group(self, node):
+        return {'children': [self.item(i) for i in node.items], 'logic': node.operand, 'isNot': False}
+
+
 def sql_to_json(sql_text):
     """
     Преобразует условие фильтрации записанное в SQL нотации, в формат API
@@ -282,12 +698,31 @@ def sql_to_json(sql_text):
         Условия фильтрации в формате API
 
     """
-    sql_parser = _prepare_sql_parser()
-    sql_obj = parseString(sql_parser, sql_text)
+    return ApiEmitter().emit(parse_filter(sql_text))
+
 
-    s = asList(sql_obj)[0]
-    prep_points = _find_points(s)
-    return _parse_expr(prep_points)
+def sql_to_responsum(sql_text, units=None):
+    """
+    Преобразует условие фильтрации записанное в SQL нотации, в формат Responsum API.
+    Имена атрибутов переводятся в нижний регистр
+
+    Parameters
+    ----------
+
+    sql_text : str
+        Текст условия в SQL формате
+
+    units : dict
+        Словарь {атрибут в нижнем регистре: идентификатор}, атрибуты условий заменяются идентификаторами
+
+
+    Returns
+    -------
+    obj : dict
+        Условия фильтрации в формате Responsum API
+
+    """
+    return ResponsumEmitter(units).emit(parse_filter(sql_text, downcase=True))
 
 
 def sql_to_units(sql_text):
@@ -297,8 +732,8 @@ def sql_to_units(sql_text):
     Parameters
     ----------
 
-    sql_text : str
-        Текст условия в SQL формате
+    sql_text : str | dict | FilterNode
+        Текст условия в SQL формате, условия в формате API или дерево условий
 
 
     Returns
@@ -307,17 +742,14 @@ def sql_to_units(sql_text):
         Список элементов фильтров
 
     """
-    sql_parser = _prepare_sql_parser()
-    sql_obj = parseString(sql_parser, sql_text)
-
-    s = asList(sql_obj)[0]
-    prep_points = _find_points(s)
     result = []
-
-    if isinstance(prep_points, list):
-        result = [i['unit'] for i in prep_points if isinstance(i, dict)]
-    else:
-        result = [prep_points['unit']]
+    nodes = [to_filter(sql_text)]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ConditionGroup):
+            nodes.extend(reversed(node.items))
+        else:
+            result.append(node.unit)
     return result
 
 
@@ -1,10 +1,100 @@
 """
 Tasks module for Mediascope API
 """
+import json
 import pandas as pd
+from ..core import cache
+from ..core import filters
 from ..core import utils
 from ..core import sql
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_json(obj) -> str:
+    """
+    Сериализовать объект в компактный JSON. Используется orjson, если он установлен
+
+    Parameters
+    ----------
+
+    obj : dict
+        Объект для сериализации
+
+    Returns
+    -------
+    text : str
+        Текст в JSON формате
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+        except TypeError:
+            # типы, которые не поддерживает orjson, сериализуются стандартным модулем
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class Task(str):
+    """
+    Задание для Mediascope API: текст задания в JSON формате (str), как и в предыдущих версиях библиотеки.
+    Текст формируется один раз при создании задания и используется при отправке задания и формировании
+    ключа кэша. Задание не изменяется, параметры задания возвращает атрибут params (копия в виде словаря)
+    """
+    def __new__(cls, data=None):
+        if data is None:
+            data = {}
+        if not isinstance(data, str):
+            data = to_json(data)
+        task = super().__new__(cls, data)
+        task._canonical_body = {}
+        return task
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Получить задание из текста в JSON формате, словаря или задания
+
+        Parameters
+        ----------
+
+        data : str|dict|Task
+            Задание
+
+        Returns
+        -------
+        task : Task
+            Задание
+        """
+        if isinstance(data, Task):
+            return data
+        return cls(data)
+
+    @property
+    def body(self) -> str:
+        """
+        Текст задания в JSON формате
+        """
+        return str(self)
+
+    @property
+    def params(self) -> dict:
+        """
+        Параметры задания в виде словаря. Возвращается новый словарь, его изменение не меняет задание
+        """
+        return json.loads(self)
+
+    def canonical_body(self, in_as_set: bool = False) -> str:
+        """
+        Текст задания в каноническом JSON формате для формирования ключа кэша, см. cache.canonical_json
+        """
+        if in_as_set not in self._canonical_body:
+            self._canonical_body[in_as_set] = cache.canonical_json(self.params, in_as_set)
+        return self._canonical_body[in_as_set]
+
 
 class TaskBuilder:
     """
@@ -126,13 +216,17 @@ class TaskBuilder:
     @staticmethod
     def add_filter(tsk: dict, filter_obj, filter_name):
         """
-        Добавляет фильтр
+        Добавляет фильтр: условие в SQL нотации, в формате API или дерево условий (см. модуль filters).
+        Условия в SQL нотации и деревья условий упрощаются перед добавлением, см. filters.optimize
         """
         if filter_obj is not None:
             if isinstance(filter_obj, dict):
-                tsk['filter'][filter_name] = filter
-            elif isinstance(filter_obj, str):
-                tsk['filter'][filter_name] = sql.sql_to_json(filter_obj)
+                tsk['filter'][filter_name] = filter_obj
+            elif isinstance(filter_obj, (str, sql.FilterNode)):
+                if filters.OPTIMIZE_FILTERS:
+                    tsk['filter'][filter_name] = filters.optimize_filter(filter_obj)
+                else:
+                    tsk['filter'][filter_name] = sql.to_filter(filter_obj).to_json()
             elif filter_name == 'respondentFilter' and isinstance(filter_obj, pd.DataFrame):
                 tsk['filter'][filter_name] = utils.get_dict_from_dataframe(filter_obj)
 
@@ -7,8 +7,56 @@ import subprocess
 import datetime as dt
 import pandas as pd
 import re
+import threading
 import requests
 
+class cached_property:
+    """
+    Свойство, значение которого вычисляется при первом обращении и сохраняется в объекте.
+    Используется для отложенной загрузки справочников: каждый справочник загружается не более одного раза.
+    Блокировка создается для каждого объекта и свойства, поэтому загрузка разных справочников не блокирует друг друга
+    """
+    _locks_guard = threading.Lock()
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def _get_lock(self, cache):
+        with self._locks_guard:
+            locks = cache.setdefault('_cached_property_locks', {})
+            return locks.setdefault(self.name, threading.RLock())
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        cache = instance.__dict__
+        if self.name not in cache:
+            with self._get_lock(cache):
+                if self.name not in cache:
+                    cache[self.name] = self.func(instance)
+        return cache[self.name]
+
+
+def reset_cached_properties(instance):
+    """
+    Удалить сохраненные значения свойств cached_property объекта, при следующем обращении они загружаются заново.
+    Используется в классах-одиночках при смене сетевого модуля, чтобы не возвращать справочники другого пользователя
+
+    Parameters
+    ----------
+
+    instance : object
+        Объект, значения свойств которого удаляются
+    """
+    cache = instance.__dict__
+    for klass in type(instance).__mro__:
+        for name, attr in vars(klass).items():
+            if isinstance(attr, cached_property):
+                cache.pop(name, None)
+
+
 def load_settings(settings_filename: str = 'settings.json'):
     """
         Загрузить настройки из файла
@@ -101,6 +149,90 @@ def get_dict_from_dataframe(df):
     return res
 
 
+def items_to_df(items, columns=None):
+    """
+    Преобразовать список записей словаря в DataFrame. Записи могут содержать разный набор полей
+    (особенно для nullable полей), отсутствующие значения заполняются пустой строкой
+
+    Parameters
+    ----------
+
+    items : list
+        Список записей (dict)
+
+    columns : list
+        Список столбцов. Если не задан, используются все поля записей в порядке появления
+
+    Returns
+    -------
+    df : DataFrame
+    """
+    res_headers = list(columns) if columns is not None else []
+    if columns is None:
+        for item in items:
+            for k in item.keys():
+                if k not in res_headers:
+                    res_headers.append(k)
+
+    res = {h: [item.get(h, '') for item in items] for h in res_headers}
+    return pd.DataFrame(res, columns=res_headers)
+
+
+def iter_pages_to_df(pages):
+    """
+    Преобразовать порции данных (например, результат MediascopeApiNetwork.iter_request_lo) в DataFrame по одной
+    на порцию. Все DataFrame содержат одинаковый набор столбцов: столбцы первой порции, новые поля
+    последующих порций добавляются в конец
+
+    Parameters
+    ----------
+
+    pages : iterable
+        Ответы Mediascope-API с разделом data
+
+    Returns
+    -------
+    dfs : generator
+        Генератор DataFrame
+    """
+    columns = []
+    for page in pages:
+        items = page.get('data') if isinstance(page, dict) else None
+        if not isinstance(items, list) or len(items) == 0:
+            continue
+        for item in items:
+            for k in item.keys():
+                if k not in columns:
+                    columns.append(k)
+        yield items_to_df(items, columns)
+
+
+def reindex_df(data, columns):
+    """
+    Привести DataFrame или DataFrame, которые возвращает генератор (см. iter_pages_to_df), к списку столбцов.
+    Отсутствующие столбцы заполняются пустой строкой
+
+    Parameters
+    ----------
+
+    data : DataFrame|generator
+        DataFrame или генератор DataFrame
+
+    columns : list
+        Список столбцов
+
+    Returns
+    -------
+    data : DataFrame|generator
+        DataFrame или генератор DataFrame
+    """
+    if data is None:
+        return None
+    if isinstance(data, pd.DataFrame):
+        return data.reindex(columns=columns, fill_value='')
+    return (df.reindex(columns=columns, fill_value='') for df in data)
+
+
 def format_time_column(dataframe, writer, column_names, sheet_name, index):
     """
     Изменяет формат колонки со временем при сохранении в Excel
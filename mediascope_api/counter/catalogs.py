@@ -6,6 +6,7 @@ import json
 
 import pandas as pd
 from ..core import net
+from ..core import utils
 
 
 class CounterCats:
@@ -17,6 +18,11 @@ class CounterCats:
         'area-type': '/dictionary/area-type'
     }
 
+    # время жизни кэша словарей в секундах (по ключам _urls), для остальных словарей - 1 день
+    _cache_ttl = {
+        'area-type': 30 * 86400
+    }
+
     def __new__(cls, settings_filename: str = None, cache_path: str = None, cache_enabled: bool = True,
                 username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
                 client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
@@ -29,8 +35,9 @@ class CounterCats:
                  username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
                  client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.msapi_network = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                      root_url, client_id, client_secret, keycloak_url)
+        self.msapi_network = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                             root_url, client_id, client_secret, keycloak_url)
+        self.msapi_network.set_cache_ttl({self._urls[k]: v for k, v in self._cache_ttl.items()})
 
     @staticmethod
     def _get_query(vals):
@@ -77,7 +84,7 @@ class CounterCats:
             f'Запрошены записи: {offset} - {offset + limit}\nВсего найдено записей: {total}\n')
 
     def _get_dict(self, entity_name, search_params=None, body_params=None, offset=None, limit=None,
-                  use_cache=True, request_type='post'):
+                  use_cache=True, request_type='post', chunk_size=None):
         """
         Получить словарь из API
 
@@ -99,12 +106,19 @@ class CounterCats:
         limit : int
             Количество записей в возвращаемом наборе данных
 
+        chunk_size : int
+            Размер порции записей. Если задан, возвращается генератор DataFrame по одному на порцию,
+            порции загружаются по мере обращения к генератору (см. MediascopeApiNetwork.iter_request_lo)
+
         Returns
         -------
         products : DataFrame
 
-            DataFrame с объектами словаря
+            DataFrame с объектами словаря или генератор DataFrame, если задан chunk_size
         """
+        if chunk_size is not None and (offset is not None or limit is not None):
+            raise ValueError("Параметр chunk_size не используется совместно с параметрами offset и limit")
+
         if self._urls.get(entity_name) is None:
             return None
 
@@ -120,6 +134,11 @@ class CounterCats:
 
         post_data = self._get_post_data(body_params)
 
+        if chunk_size is not None:
+            # справочник загружается порциями без накопления в памяти, кэш не используется
+            pages = self.msapi_network.iter_request_lo(request_type, url, data=post_data, limit=chunk_size)
+            return utils.iter_pages_to_df(pages)
+
         data = self.msapi_network.send_request_lo(
             request_type, url, data=post_data, use_cache=use_cache)
 
@@ -129,37 +148,20 @@ class CounterCats:
         if 'header' not in data or 'data' not in data:
             return None
 
-        # извлекаем все заголовки столбцов (их может быть разное количество, особенно для поля notes)
-        res_headers = []
-        for item in data['data']:
-            for k, _ in item.items():
-                if k not in res_headers:
-                    res_headers.append(k)
-
-        # инициализируем списки данных столбцов
-        res = {}
-        for h in res_headers:
-            res[h] = []
-
-        # наполняем найденные столбцы значениями
-        for item in data['data']:
-            for h in res_headers:
-                if h in item.keys():
-                    res[h].append(item[h])
-                else:
-                    res[h].append('')
+        df = utils.items_to_df(data['data'])
+
         # print header
         if offset is not None and limit is not None:
             self._print_header(data['header'], offset, limit)
         else:
             self._print_header(data['header'], 0, data['header']['total'])
-        return pd.DataFrame(res)
+        return df
 
     def get_adcampaigns(self, advertisement_ids=None, advertisement_names=None, advertisement_campaign_ids=None,
                          advertisement_campaign_names=None, brand_ids=None, brand_names=None,
                          advertisement_agency_ids=None, advertisement_agency_names=None, tmsecs=None, 
                          advertisement_description=None, created_date=None, start_date=None, end_date=None,
-                         order_by=None, order_dir=None, offset=None, limit=None, use_cache=True):
+                         order_by=None, order_dir=None, offset=None, limit=None, use_cache=True, chunk_size=None):
         """
         Получить рекламные кампании
 
@@ -223,11 +225,17 @@ class CounterCats:
             с такими же параметрами - читает его из кэша, это позволяет существенно ускорить
             получение данных.
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с рекламными кампаниями
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {
@@ -251,7 +259,7 @@ class CounterCats:
             'endDate': end_date
         }
 
-        return self._get_dict('ad-campaigns', search_params, body_params, offset, limit, use_cache)
+        return self._get_dict('ad-campaigns', search_params, body_params, offset, limit, use_cache, chunk_size)
 
     def get_areatype(self, use_cache=False):
         """
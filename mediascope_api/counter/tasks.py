@@ -7,7 +7,10 @@ import datetime as dt
 import pandas as pd
 import numpy as np
 import pendulum
+from ..core import async_net
 from ..core import net
+from ..core import poll
+from ..core import results
 from ..core import tasks
 from ..core import errors
 from ..core import sql
@@ -51,8 +54,8 @@ class CounterTask:
         super().__init__(*args, **kwargs)
         if check_version:
             utils.check_version()
-        self.msapi_network = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                      root_url, client_id, client_secret, keycloak_url)
+        self.msapi_network = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                             root_url, client_id, client_secret, keycloak_url)
         self.task_builder = tasks.TaskBuilder()
 
     @staticmethod
@@ -172,8 +175,8 @@ class CounterTask:
             данных и на их основе посчитается статистика.
         Returns
         -------
-        text : json
-            Результат расчета
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
 
         # Собираем JSON
@@ -209,7 +212,7 @@ class CounterTask:
         }
         self.task_builder.save_report_info(tinfo)
         # Возвращаем JSON
-        return json.dumps(tsk)
+        return tasks.Task(tsk)
         #return tsk
 
     def send_task(self, task: dict):
@@ -219,8 +222,8 @@ class CounterTask:
         Parameters
         ----------
 
-        task : str
-            Текст задания в JSON формате
+        task : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
 
         Returns
         -------
@@ -232,11 +235,15 @@ class CounterTask:
             print('Задание пустое')
             return None
         try:
-            return self.msapi_network.send_request('post', '/daily-task', task)
+            tsk = self.msapi_network.send_task_request('/daily-task', task)
         except errors.BadRequestError as e:
             print(f"Ошибка: {e}")
+            return None
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), 'counter:daily-task')
+        return tsk
 
-    def wait_task(self, tsk, status_delay=3, task_delay=0.2):
+    def wait_task(self, tsk, status_delay=None, task_delay=0.2):
         """
         Ожидает окончание расчета задания или заданий.
 
@@ -264,7 +271,8 @@ class CounterTask:
                 ]
 
         status_delay : int
-            Задержка в секундах между опросом статуса. По умолчанию 3 с
+            Задержка в секундах между опросом статуса. По умолчанию не задана: задержка увеличивается
+            экспоненциально, начиная со значения, рассчитанного по времени расчета предыдущих заданий того же типа
 
         task_delay : int
             Задержка в секундах между опросом статуса каждого задания для списка заданий. По умолчанию 0.2 с
@@ -279,12 +287,13 @@ class CounterTask:
         if isinstance(tsk, dict):
             if tsk.get('taskId') is not None:
                 tid = tsk.get('taskId', None)
+                scheduler = poll.PollScheduler([tid], fixed_delay=status_delay)
                 task_state = ''
                 task_state_obj = None
                 cnt = 0
                 while cnt < 5:
                     try:
-                        time.sleep(status_delay)
+                        time.sleep(scheduler.next_delay())
                         task_state_obj = self.msapi_network.send_request('get', f'/task/state/{tid}')
                     except errors.NotFoundError:
                         cnt += 1
@@ -302,13 +311,12 @@ class CounterTask:
                 # DONE, FAILED, IN_PROGRESS, CANCELLED, IN_QUEUE
                 while task_state == 'IN_QUEUE' or task_state == 'IN_PROGRESS':
                     print('=', end=' ')
-                    time.sleep(status_delay)
+                    time.sleep(scheduler.next_delay())
                     task_state_obj = self.msapi_network.send_request('get', f'/task/state/{tsk["taskId"]}')
                     if task_state_obj is not None:
                         task_state = task_state_obj.get('taskStatus', '')
                 if task_state == 'FAILED':
                     print(f"Задача завершилась с ошибкой: {task_state_obj.get('message', '')}")
-                time.sleep(1)
                 e = dt.datetime.now()
                 print(f"] время расчета: {str(e - s)}")
                 if task_state == 'DONE':
@@ -316,6 +324,7 @@ class CounterTask:
                     tsk['dtRegister'] = task_state_obj.get('dtRegister', '')
                     tsk['dtFinish'] = task_state_obj.get('dtFinish', '')
                     tsk['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
+                    poll.record_duration(tid, tsk['taskProcessingTimeSec'])
                     return tsk
         elif isinstance(tsk, list):
             task_list = list()
@@ -329,8 +338,9 @@ class CounterTask:
             if len(task_list) > 0:
                 print(f'Расчет задач ({len(task_list)}) [ ', end='')
                 s = dt.datetime.now()
+                scheduler = poll.PollScheduler([t['task']['taskId'] for t in task_list], fixed_delay=status_delay)
                 while True:
-                    time.sleep(status_delay)
+                    time.sleep(scheduler.next_delay())
                     # запросим состояние
                     done_count = 0
                     for t in task_list:
@@ -348,6 +358,7 @@ class CounterTask:
                             t['task']['dtRegister'] = task_state_obj.get('dtRegister', '')
                             t['task']['dtFinish'] = task_state_obj.get('dtFinish', '')
                             t['task']['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
+                            poll.record_duration(tid, t['task']['taskProcessingTimeSec'])
                             done_count += 1
                         else:
                             errs[tid] = t
@@ -553,6 +564,135 @@ class CounterTask:
             return None
         return self.msapi_network.send_request('get', f'/task/result/{tsk["taskId"]}')
 
+    def submit_or_reuse(self, data, status_delay=None):
+        """
+        Получить результат расчета задания. Если такое же задание уже было рассчитано,
+        результат берется из кэша результатов без отправки задания на сервер,
+        иначе задание отправляется на расчет, а результат сохраняется в кэш.
+
+        Parameters
+        ----------
+
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
+
+        status_delay : int
+            Задержка в секундах между опросом статуса задания, см. wait_task
+
+        Returns
+        -------
+        result : dict
+            Результат расчета задания
+        """
+        if data is None:
+            print('Задание пустое')
+            return None
+        data = tasks.Task.from_json(data)
+        result_cache = results.ResultCache(self.msapi_network, 'counter')
+        return result_cache.submit_or_reuse(data, self.send_task, lambda tsk: self.wait_task(tsk, status_delay),
+                                            self.get_result)
+
+    def get_result_info(self, data):
+        """
+        Получить информацию о сохраненном в кэше результате расчета задания
+
+        Parameters
+        ----------
+
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
+
+        Returns
+        -------
+        info : dict
+            Информация о результате или None, если результат не сохранен:
+                - taskId - идентификатор задания, результат которого сохранен
+                - dtSaved - дата и время сохранения результата
+                - availability - период доступных данных на момент расчета
+        """
+        entry = results.ResultCache(self.msapi_network, 'counter').get(tasks.Task.from_json(data))
+        if entry is None:
+            return None
+        return {k: v for k, v in entry.items() if k != 'result'}
+
+    def _get_async_network(self):
+        if getattr(self, 'async_network_module', None) is None:
+            self.async_network_module = async_net.AsyncMediascopeApiNetwork.from_network(self.msapi_network)
+        return self.async_network_module
+
+    async def send_task_async(self, task: dict):
+        """
+        Асинхронно отправить задание на расчет, см. send_task
+
+        Parameters
+        ----------
+
+        task : str
+            Текст задания в JSON формате
+
+        Returns
+        -------
+        text : json
+            Ответ сервера, содержит taskid, который необходим для получения результата
+        """
+        if task is None:
+            print('Задание пустое')
+            return None
+        try:
+            tsk = await self._get_async_network().send_task_request('/daily-task', task)
+        except errors.BadRequestError as e:
+            print(f"Ошибка: {e}")
+            return None
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), 'counter:daily-task')
+        return tsk
+
+    async def _get_task_state_async(self, tid):
+        task_state_obj = await self._get_async_network().send_request('get', f'/task/state/{tid}')
+        if task_state_obj is None:
+            return '', None
+        return task_state_obj.get('taskStatus', ''), task_state_obj
+
+    async def wait_task_async(self, tsk, status_delay=None):
+        """
+        Асинхронно ожидает окончание расчета задания или заданий, см. wait_task.
+        Задания списка ожидаются одновременно
+
+        Parameters
+        ----------
+
+        tsk : dict|list
+            Задание или список заданий
+
+        status_delay : int
+            Задержка в секундах между опросом статуса. По умолчанию подбирается автоматически
+
+        Returns
+        -------
+        tsk : dict|list
+            Возвращает задание или список заданий, None - если одно из заданий завершилось с ошибкой
+        """
+        return await async_net.wait_tasks(self._get_task_state_async, tsk, status_delay)
+
+    async def get_result_async(self, tsk):
+        """
+        Асинхронно получить результат выполнения задания по его ID
+
+        Parameters
+        ----------
+
+        tsk : dict
+            Задание
+
+        Returns
+        -------
+        text : json
+            Результат выполнения задания в JSON формате
+        """
+        if tsk is None or tsk.get('taskId') is None:
+            return None
+        return await self._get_async_network().send_request('get', f'/task/result/{tsk["taskId"]}')
+
     @staticmethod
     def result2table(data, project_name: str = None):
         """
@@ -4,6 +4,7 @@ Module for work with CrossWeb catalogs
 import json
 import pandas as pd
 from ..core import net
+from ..core import utils
 
 class CrossWebCats:
     """
@@ -78,6 +79,27 @@ class CrossWebCats:
         'spr_mass_media': '/dictionary/common/spr-mass-media',
     }
 
+    # время жизни кэша словарей в секундах (по ключам _urls), для остальных словарей - 1 день
+    _cache_ttl = {
+        'date_range': 3600,
+        'usetype': 30 * 86400,
+        'media_usetype': 30 * 86400,
+        'media_sp_usetype': 30 * 86400,
+        'consumption_media_usetype': 30 * 86400,
+        'media_total_usetype': 30 * 86400,
+        'media_duplication_usetype': 30 * 86400,
+        'profile_usetype': 30 * 86400,
+        'monitoring_usetype': 30 * 86400,
+        'profile_duplication_usetype': 30 * 86400,
+        'ad_source_type': 30 * 86400,
+        'ad_video_utility': 30 * 86400,
+        'property': 7 * 86400,
+        'media_property': 7 * 86400,
+        'monitoring_property': 7 * 86400,
+        'media_duplication_property': 7 * 86400,
+        'profile_duplication_property': 7 * 86400
+    }
+
     def __new__(cls, facility_id=None, settings_filename: str = None, cache_path: str = None, cache_enabled: bool = True,
                 username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
                 client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
@@ -90,20 +112,90 @@ class CrossWebCats:
                  username: str = None, passw: str = None, root_url: str = None, client_id: str = None,
                  client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # load holdings
-        self.msapi_network = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                      root_url, client_id, client_secret, keycloak_url)
-        self.usetypes = self.get_usetype()
-        self.demo_attribs = self.load_property()
-        self.media_attribs = self.load_media_property()
-        self.units = self.get_media_unit()
-        self.hour_units = self.get_hour_media_unit()
-        self.units_total = self.get_media_total_unit()
-        self.hour_units_total = self.get_hour_media_total_unit()
-        self.units_ad = self.get_ad_unit()
-        self.units_monitoring = self.get_monitoring_unit()
-        self.units_media_duplication = self.get_media_duplication_unit()
-        self.units_consumption_media = self.get_consumption_media_unit()
+        network = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                  root_url, client_id, client_secret, keycloak_url)
+        # объект создается один раз: при смене сетевого модуля справочники загружаются заново
+        if getattr(self, 'msapi_network', None) is not network:
+            utils.reset_cached_properties(self)
+        self.msapi_network = network
+        self.msapi_network.set_cache_ttl({self._urls[k]: v for k, v in self._cache_ttl.items()})
+
+    @utils.cached_property
+    def usetypes(self):
+        """
+        Типы пользования, загружаются при первом обращении (см. get_usetype)
+        """
+        return self.get_usetype()
+
+    @utils.cached_property
+    def demo_attribs(self):
+        """
+        Демографические переменные, загружаются при первом обращении (см. load_property)
+        """
+        return self.load_property()
+
+    @utils.cached_property
+    def media_attribs(self):
+        """
+        Медиа переменные, загружаются при первом обращении (см. load_media_property)
+        """
+        return self.load_media_property()
+
+    @utils.cached_property
+    def units(self):
+        """
+        Атрибуты отчетов Media, загружаются при первом обращении (см. get_media_unit)
+        """
+        return self.get_media_unit()
+
+    @utils.cached_property
+    def hour_units(self):
+        """
+        Атрибуты отчетов Hour Media, загружаются при первом обращении (см. get_hour_media_unit)
+        """
+        return self.get_hour_media_unit()
+
+    @utils.cached_property
+    def units_total(self):
+        """
+        Атрибуты отчетов Media Total, загружаются при первом обращении (см. get_media_total_unit)
+        """
+        return self.get_media_total_unit()
+
+    @utils.cached_property
+    def hour_units_total(self):
+        """
+        Атрибуты отчетов Hour Media Total, загружаются при первом обращении (см. get_hour_media_total_unit)
+        """
+        return self.get_hour_media_total_unit()
+
+    @utils.cached_property
+    def units_ad(self):
+        """
+        Атрибуты отчетов по рекламе, загружаются при первом обращении (см. get_ad_unit)
+        """
+        return self.get_ad_unit()
+
+    @utils.cached_property
+    def units_monitoring(self):
+        """
+        Атрибуты отчетов Monitoring, загружаются при первом обращении (см. get_monitoring_unit)
+        """
+        return self.get_monitoring_unit()
+
+    @utils.cached_property
+    def units_media_duplication(self):
+        """
+        Атрибуты отчетов Media Duplication, загружаются при первом обращении (см. get_media_duplication_unit)
+        """
+        return self.get_media_duplication_unit()
+
+    @utils.cached_property
+    def units_consumption_media(self):
+        """
+        Атрибуты отчетов Consumption Media, загружаются при первом обращении (см. get_consumption_media_unit)
+        """
+        return self.get_consumption_media_unit()
 
     def load_property(self):
         """
@@ -429,7 +521,8 @@ class CrossWebCats:
         total = header["total"]
         print(f'Запрошены записи: {offset} - {offset + limit}\nВсего найдено записей: {total}\n')
 
-    def _get_dict(self, entity_name, search_params=None, body_params=None, offset=None, limit=None, use_cache=True):
+    def _get_dict(self, entity_name, search_params=None, body_params=None, offset=None, limit=None, use_cache=True,
+                  chunk_size=None):
         """
         Получить словарь из API
 
@@ -451,12 +544,19 @@ class CrossWebCats:
         limit : int
             Количество записей в возвращаемом наборе данных
 
+        chunk_size : int
+            Размер порции записей. Если задан, возвращается генератор DataFrame по одному на порцию,
+            порции загружаются по мере обращения к генератору (см. MediascopeApiNetwork.iter_request_lo)
+
         Returns
         -------
         products : DataFrame
 
-            DataFrame с объектами словаря
+            DataFrame с объектами словаря или генератор DataFrame, если задан chunk_size
         """
+        if chunk_size is not None and (offset is not None or limit is not None):
+            raise ValueError("Параметр chunk_size не используется совместно с параметрами offset и limit")
+
         if self._urls.get(entity_name) is None:
             return None
 
@@ -471,7 +571,12 @@ class CrossWebCats:
             url += query
     
         post_data = self._get_post_data(body_params)
-        
+
+        if chunk_size is not None:
+            # справочник загружается порциями без накопления в памяти, кэш не используется
+            pages = self.msapi_network.iter_request_lo('post', url, data=post_data, limit=chunk_size)
+            return utils.iter_pages_to_df(pages)
+
         data = self.msapi_network.send_request_lo('post', url, data=post_data, use_cache=use_cache)
         if data is None or not isinstance(data, dict):
             return None
@@ -479,36 +584,18 @@ class CrossWebCats:
         if 'header' not in data or 'data' not in data:
             return None
 
-        # извлекаем все заголовки столбцов (их может быть разное количество для nullable полей)
-        res_headers = []
-        for item in data['data']:
-            for k, _ in item.items():
-                if k not in res_headers:
-                    res_headers.append(k)
-
-        # инициализируем списки данных столбцов
-        res = {}
-        for h in res_headers:
-            res[h] = []
+        df = utils.items_to_df(data['data'])
 
-        # наполняем найденные столбцы значениями
-        for item in data['data']:
-            for h in res_headers:
-                if h in item.keys():
-                    res[h].append(item[h])
-                else:
-                    res[h].append('')
-                    
         # print header
         if offset is not None and limit is not None:
             self._print_header(data['header'], offset, limit)
         else:
             self._print_header(data['header'], 0, data['header']['total'])
-        return pd.DataFrame(res)
+        return df
 
     def get_media(self, product=None, holding=None, theme=None, resource=None, resource_theme=None,
                   product_ids=None, holding_ids=None, resource_ids=None, theme_ids=None,
-                  resource_theme_ids=None, offset=None, limit=None, use_cache=True):
+                  resource_theme_ids=None, offset=None, limit=None, use_cache=True, chunk_size=None):
         """
         Получить список объектов Медиа-дерева
 
@@ -558,11 +645,17 @@ class CrossWebCats:
             с такими же параметрами - читает его из кэша, это позволяет существенно ускорить
             получение данных.
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с объектами Медиа-дерева
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {'productName': product,
@@ -579,7 +672,7 @@ class CrossWebCats:
             'resourceThemeIds': resource_theme_ids
         }
 
-        return self._get_dict('media', search_params, body_params, offset, limit, use_cache)
+        return self._get_dict('media', search_params, body_params, offset, limit, use_cache, chunk_size)
 
     def get_theme(self, product=None, holding=None, theme=None, resource=None, resource_theme=None,
                   product_ids=None, holding_ids=None, resource_ids=None, theme_ids=None,
@@ -805,7 +898,7 @@ class CrossWebCats:
 
     def get_resource(self, product=None, holding=None, theme=None, resource=None, resource_theme=None,
                      product_ids=None, holding_ids=None, resource_ids=None, theme_ids=None,
-                     resource_theme_ids=None, offset=None, limit=None, use_cache=True):
+                     resource_theme_ids=None, offset=None, limit=None, use_cache=True, chunk_size=None):
         """
         Получить список ресурсов
 
@@ -855,11 +948,17 @@ class CrossWebCats:
             с такими же параметрами - читает его из кэша, это позволяет существенно ускорить
             получение данных.
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         products : DataFrame
 
             DataFrame с найденными ресурсами
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
         search_params = {'productName': product,
                          'holdingName': holding,
@@ -875,7 +974,7 @@ class CrossWebCats:
             'resourceThemeIds': resource_theme_ids
         }
 
-        return self._get_dict('resource', search_params, body_params, offset, limit, use_cache)
+        return self._get_dict('resource', search_params, body_params, offset, limit, use_cache, chunk_size)
 
     def get_product(self, product=None, holding=None, theme=None, resource=None, resource_theme=None,
                     product_ids=None, holding_ids=None, resource_ids=None, theme_ids=None,
@@ -3,11 +3,25 @@ CrossWeb checks module
 """
 import difflib as dl
 from . import catalogs
+from ..core import utils
+from ..core import sql
 
 class CrossWebTaskChecker:
     """
     Класс для проверки заданий CrossWeb
     """
+    # методы получения атрибутов отчетов для каждого типа задания
+    _task_type_units = {'media': 'get_media_unit',
+                        'consumption-media': 'get_consumption_media_unit',
+                        'total': 'get_media_total_unit',
+                        'hour-media': 'get_hour_media_unit',
+                        'hour-total': 'get_hour_media_total_unit',
+                        'ad': 'get_ad_unit',
+                        'monitoring': 'get_monitoring_unit',
+                        'media-duplication': 'get_media_duplication_unit',
+                        'media-profile': 'get_media_profile_unit',
+                        'profile-duplication': 'get_profile_duplication_unit',
+                        'media-sp': 'get_media_sp_unit'}
 
     def __new__(cls, cats: catalogs.CrossWebCats, *args, **kwargs):
         if not hasattr(cls, 'instance'):
@@ -16,21 +30,15 @@ class CrossWebTaskChecker:
 
     def __init__(self, cats: catalogs.CrossWebCats, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # объект создается один раз: при смене справочников или их сетевого модуля атрибуты загружаются заново
+        network = getattr(cats, 'msapi_network', None)
+        if getattr(self, 'cats', None) is not cats or getattr(self, '_cats_network', None) is not network:
+            utils.reset_cached_properties(self)
         self.cats = cats
-        self.task_types = {'media': self.cats.get_media_unit(),
-                           'consumption-media': self.cats.get_consumption_media_unit(),
-                           'total': self.cats.get_media_total_unit(),
-                           'hour-media': self.cats.get_hour_media_unit(),
-                           'hour-total': self.cats.get_hour_media_total_unit(),
-                           'ad': self.cats.get_ad_unit(),
-                           'monitoring': self.cats.get_monitoring_unit(),
-                           'media-duplication': self.cats.get_media_duplication_unit(),
-                           'media-profile': self.cats.get_media_profile_unit(),
-                           'profile-duplication': self.cats.get_profile_duplication_unit(),
-                           'media-sp': self.cats.get_media_sp_unit()}
+        self._cats_network = network
         self.check_list = {
             'task_type': {'types': [list], 'msg': 'Неверно задан тип задачи\n' +
-                                                  f'Допустимые варианты: "{", ".join(self.task_types.keys())}"'
+                                                  f'Допустимые варианты: "{", ".join(self._task_type_units.keys())}"'
                           },
             'date_filter': {'types': [list], 'msg': 'Период должен быть задан, формат: ' +
                                                     '[("YYYY-MM-DD", "YYYY-MM-DD")]\n'},
@@ -49,10 +57,20 @@ class CrossWebTaskChecker:
             'statistics': {'types': [list], 'msg': 'Не заданы статистики для задания.\n'},
         }
 
+    @utils.cached_property
+    def task_types(self):
+        """
+        Атрибуты отчетов по типам заданий, загружаются при первом обращении
+        """
+        return {task_type: getattr(self.cats, method)() for task_type, method in self._task_type_units.items()}
+
     def _check_filter(self, name, obj, msg):
         if name not in self.check_list:
             return False
         if obj is not None:
+            if isinstance(obj, sql.FilterNode) and str in self.check_list[name]['types']:
+                # дерево условий принимается везде, где допустимо условие в SQL нотации
+                return True
             if type(obj) not in self.check_list[name]['types']:
                 msg += self.check_list[name]['msg']
                 return False
@@ -9,7 +9,10 @@ import pandas as pd
 from . import catalogs
 from . import checks
 from ..core import errors
+from ..core import async_net
 from ..core import net
+from ..core import poll
+from ..core import results
 from ..core import tasks
 from ..core import utils
 
@@ -45,18 +48,40 @@ class CrossWebTask:
         super().__init__(*args, **kwargs)
         if check_version:
             utils.check_version()
-        self.network_module = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                       root_url, client_id, client_secret, keycloak_url)
+        network = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                  root_url, client_id, client_secret, keycloak_url)
+        # объект создается один раз: при смене сетевого модуля справочники загружаются заново
+        if getattr(self, 'network_module', None) is not network:
+            utils.reset_cached_properties(self)
+        self.network_module = network
         self.task_builder = tasks.TaskBuilder()
-        self.usetypes = self.get_usetype()
         self.cats = catalogs.CrossWebCats(0, settings_filename, cache_path, cache_enabled, username, passw,
                                           root_url, client_id, client_secret, keycloak_url)
-        self.units = self.cats.get_media_unit()
-
-        self.media_attribs = self.cats.media_attribs[['sliceUnit', 'entityTitle', 'optionValue', 'optionName']].copy()
-        self.media_attribs['optionValue'] = self.media_attribs['optionValue'].astype('int32')
         self.task_checker = checks.CrossWebTaskChecker(self.cats)
 
+    @utils.cached_property
+    def usetypes(self):
+        """
+        Типы пользования, загружаются при первом обращении (см. get_usetype)
+        """
+        return self.get_usetype()
+
+    @utils.cached_property
+    def units(self):
+        """
+        Атрибуты отчетов Media, загружаются при первом обращении
+        """
+        return self.cats.get_media_unit()
+
+    @utils.cached_property
+    def media_attribs(self):
+        """
+        Медиа переменные, загружаются при первом обращении
+        """
+        media_attribs = self.cats.media_attribs[['sliceUnit', 'entityTitle', 'optionValue', 'optionName']].copy()
+        media_attribs['optionValue'] = media_attribs['optionValue'].astype('int32')
+        return media_attribs
+
     def get_usetype(self):
         """
         Получить списки доступных для использования в заданиях:
@@ -158,7 +183,7 @@ class CrossWebTask:
         }
         self.task_builder.save_report_info(tinfo)
         # Возвращаем JSON
-        return json.dumps(tsk)
+        return tasks.Task(tsk)
 
 
     def build_task(self, task_type, task_name='', date_filter=None, usetype_filter=None, geo_filter=None,
@@ -262,8 +287,8 @@ class CrossWebTask:
 
         Returns
         -------
-        text : json
-            Задание в формате CrossWeb API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
 
         return self._build_task(task_type, task_name=task_name, date_filter=date_filter, usetype_filter=usetype_filter,
@@ -370,8 +395,8 @@ class CrossWebTask:
 
         Returns
         -------
-        text : json
-            Задание в формате CrossWeb API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
 
         return self._build_task(task_type, task_name=task_name, date_filter=date_filter, usetype_filter=usetype_filter,
@@ -470,8 +495,8 @@ class CrossWebTask:
 
         Returns
         -------
-        text : json
-            Задание в формате CrossWeb API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
 
         return self._build_task(task_type, task_name=task_name, date_filter=date_filter, usetype_filter=usetype_filter,
@@ -563,8 +588,8 @@ class CrossWebTask:
 
         Returns
         -------
-        text : json
-            Задание в формате CrossWeb API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
 
         return self._build_task(task_type, task_name=task_name, date_filter=date_filter,
@@ -584,9 +609,13 @@ class CrossWebTask:
             return
 
         try:
-            return self.network_module.send_request('post', self.task_urls[task_type], data)
+            tsk = self.network_module.send_task_request(self.task_urls[task_type], data)
         except errors.BadRequestError as e:
             print(f"Ошибка: {e}")
+            return None
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), f'crossweb:{task_type}')
+        return tsk
 
     def send_task(self, data):
         """
@@ -595,8 +624,8 @@ class CrossWebTask:
         Parameters
         ----------
 
-        data : str
-            Текст задания в JSON формате
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
 
         Returns
         -------
@@ -607,7 +636,8 @@ class CrossWebTask:
         if data is None:
             print('Задание пустое')
             return
-        task_type = json.loads(data)['task_type']
+        data = tasks.Task.from_json(data)
+        task_type = data.params['task_type']
         if task_type not in self.task_urls:
             print(f'Не верно указать тип задания, допустимые значения: {", ".join(self.task_urls.keys())[:-2]}')
             return
@@ -822,7 +852,7 @@ class CrossWebTask:
         """
         return self._send_task('consumption-media', data)
 
-    def wait_task(self, tsk, status_delay=3, task_delay=0.2):
+    def wait_task(self, tsk, status_delay=None, task_delay=0.2):
         """
         Ожидает окончание расчета задания или заданий.
 
@@ -850,7 +880,8 @@ class CrossWebTask:
                 ]
 
         status_delay : int
-            Задержка в секундах между опросом статуса. По умолчанию 3 с
+            Задержка в секундах между опросом статуса. По умолчанию не задана: задержка увеличивается
+            экспоненциально, начиная со значения, рассчитанного по времени расчета предыдущих заданий того же типа
 
         task_delay : int
             Задержка в секундах между опросом статуса каждого задания для списка заданий. По умолчанию 0.2 с
@@ -863,12 +894,13 @@ class CrossWebTask:
         if isinstance(tsk, dict):
             if tsk.get('taskId') is not None:
                 tid = tsk.get('taskId', None)
+                scheduler = poll.PollScheduler([tid], fixed_delay=status_delay)
                 task_state = ''
                 task_state_obj = None
                 cnt = 0
                 while cnt < 5:
                     try:
-                        time.sleep(status_delay)
+                        time.sleep(scheduler.next_delay())
                         task_state_obj = self.network_module.send_request('get', f'/task/state/{tid}')
                     except errors.NotFoundError:
                         cnt += 1
@@ -886,13 +918,12 @@ class CrossWebTask:
                 # DONE, FAILED, IN_PROGRESS, CANCELLED, IN_QUEUE
                 while task_state == 'IN_QUEUE' or task_state == 'IN_PROGRESS':
                     print('=', end=' ')
-                    time.sleep(status_delay)
+                    time.sleep(scheduler.next_delay())
                     task_state_obj = self.network_module.send_request('get', f'/task/state/{tsk["taskId"]}')
                     if task_state_obj is not None:
                         task_state = task_state_obj.get('taskStatus', '')
                 if task_state == 'FAILED':
                     print(f"Задача завершилась с ошибкой: {task_state_obj.get('message', '')}")
-                time.sleep(1)
                 e = dt.datetime.now()
                 print(f"] время расчета: {str(e - s)}")
                 if task_state == 'DONE':
@@ -900,6 +931,7 @@ class CrossWebTask:
                     tsk['dtRegister'] = task_state_obj.get('dtRegister', '')
                     tsk['dtFinish'] = task_state_obj.get('dtFinish', '')
                     tsk['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
+                    poll.record_duration(tid, tsk['taskProcessingTimeSec'])
                     return tsk
         elif isinstance(tsk, list):
             task_list = list()
@@ -913,8 +945,9 @@ class CrossWebTask:
             print(f'Расчет задач ({len(task_list)}) [ ', end='')
             s = dt.datetime.now()
             errs = dict()
+            scheduler = poll.PollScheduler([t['task']['taskId'] for t in task_list], fixed_delay=status_delay)
             while True:
-                time.sleep(status_delay)
+                time.sleep(scheduler.next_delay())
                 # запросим состояние
                 done_count = 0
                 for t in task_list:
@@ -932,6 +965,7 @@ class CrossWebTask:
                         t['task']['dtRegister'] = task_state_obj.get('dtRegister', '')
                         t['task']['dtFinish'] = task_state_obj.get('dtFinish', '')
                         t['task']['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
+                        poll.record_duration(tid, t['task']['taskProcessingTimeSec'])
                         done_count += 1
                     else:
                         errs[tid] = t
@@ -1008,6 +1042,148 @@ class CrossWebTask:
             return None
         return self.network_module.send_request('get', f'/task/result/{tsk["taskId"]}')
 
+    def submit_or_reuse(self, data, status_delay=None):
+        """
+        Получить результат расчета задания. Если такое же задание уже было рассчитано,
+        результат берется из кэша результатов без отправки задания на сервер,
+        иначе задание отправляется на расчет, а результат сохраняется в кэш.
+        Вместе с результатом сохраняется период доступных данных на момент расчета (см. get_result_info).
+
+        Parameters
+        ----------
+
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
+
+        status_delay : int
+            Задержка в секундах между опросом статуса задания, см. wait_task
+
+        Returns
+        -------
+        result : dict
+            Результат расчета задания
+        """
+        if data is None:
+            print('Задание пустое')
+            return None
+        data = tasks.Task.from_json(data)
+        result_cache = results.ResultCache(self.network_module, 'crossweb')
+        return result_cache.submit_or_reuse(data, self.send_task, lambda tsk: self.wait_task(tsk, status_delay),
+                                            self.get_result, self._get_availability)
+
+    def get_result_info(self, data):
+        """
+        Получить информацию о сохраненном в кэше результате расчета задания
+
+        Parameters
+        ----------
+
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
+
+        Returns
+        -------
+        info : dict
+            Информация о результате или None, если результат не сохранен:
+                - taskId - идентификатор задания, результат которого сохранен
+                - dtSaved - дата и время сохранения результата
+                - availability - период доступных данных на момент расчета
+        """
+        entry = results.ResultCache(self.network_module, 'crossweb').get(tasks.Task.from_json(data))
+        if entry is None:
+            return None
+        return {k: v for k, v in entry.items() if k != 'result'}
+
+    def _get_availability(self):
+        try:
+            df = self.cats.get_date_range()
+        except errors.MediascopeApiError:
+            return None
+        return df.to_dict('records') if isinstance(df, pd.DataFrame) else None
+
+    def _get_async_network(self):
+        if getattr(self, 'async_network_module', None) is None:
+            self.async_network_module = async_net.AsyncMediascopeApiNetwork.from_network(self.network_module)
+        return self.async_network_module
+
+    async def send_task_async(self, data):
+        """
+        Асинхронно отправить задание на расчет, см. send_task
+
+        Parameters
+        ----------
+
+        data : str
+            Текст задания в JSON формате
+
+        Returns
+        -------
+        text : json
+            Ответ сервера, содержит taskid, который необходим для получения результата
+        """
+        if data is None:
+            print('Задание пустое')
+            return None
+        data = tasks.Task.from_json(data)
+        task_type = data.params['task_type']
+        if task_type not in self.task_urls:
+            print(f'Не верно указать тип задания, допустимые значения: {", ".join(self.task_urls.keys())}')
+            return None
+        try:
+            tsk = await self._get_async_network().send_task_request(self.task_urls[task_type], data)
+        except errors.BadRequestError as e:
+            print(f"Ошибка: {e}")
+            return None
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), f'crossweb:{task_type}')
+        return tsk
+
+    async def _get_task_state_async(self, tid):
+        task_state_obj = await self._get_async_network().send_request('get', f'/task/state/{tid}')
+        if task_state_obj is None:
+            return '', None
+        return task_state_obj.get('taskStatus', ''), task_state_obj
+
+    async def wait_task_async(self, tsk, status_delay=None):
+        """
+        Асинхронно ожидает окончание расчета задания или заданий, см. wait_task.
+        Задания списка ожидаются одновременно
+
+        Parameters
+        ----------
+
+        tsk : dict|list
+            Задание или список заданий
+
+        status_delay : int
+            Задержка в секундах между опросом статуса. По умолчанию подбирается автоматически
+
+        Returns
+        -------
+        tsk : dict|list
+            Возвращает задание или список заданий, None - если одно из заданий завершилось с ошибкой
+        """
+        return await async_net.wait_tasks(self._get_task_state_async, tsk, status_delay)
+
+    async def get_result_async(self, tsk):
+        """
+        Асинхронно получить результат выполнения задания по его ID
+
+        Parameters
+        ----------
+
+        tsk : dict
+            Задание
+
+        Returns
+        -------
+        text : json
+            Результат выполнения задания в JSON формате
+        """
+        if tsk is None or tsk.get('taskId') is None:
+            return None
+        return await self._get_async_network().send_request('get', f'/task/result/{tsk["taskId"]}')
+
     def restart_task(self, tsk: dict):
         """
         Перезапустить задание.
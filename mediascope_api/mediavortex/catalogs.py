@@ -90,6 +90,37 @@ class MediaVortexCats:
         'tv-sales-group': '/dictionary/tv/sales-group'
     }
 
+    # время жизни кэша словарей в секундах (по ключам _urls), для остальных словарей - 1 день
+    _cache_ttl = {
+        'availability-period': 3600,
+        'tv-calendar': 6 * 3600,
+        'tv-day-week': 30 * 86400,
+        'tv-ad-type': 30 * 86400,
+        'tv-ad-style': 30 * 86400,
+        'tv-ad-position': 30 * 86400,
+        'tv-research-day-type': 30 * 86400,
+        'tv-grp-type': 30 * 86400,
+        'tv-digital-broadcasting-type': 30 * 86400,
+        'tv-location': 30 * 86400,
+        'tv-time-band': 30 * 86400,
+        'tv-monitoring-type': 30 * 86400,
+        'tv-db-rd-type': 30 * 86400,
+        'tv-issue-status': 30 * 86400,
+        'tv-area': 30 * 86400,
+        'tv-prime-time-status': 30 * 86400,
+        'tv-breaks-style': 30 * 86400,
+        'tv-breaks-position': 30 * 86400,
+        'tv-breaks-distribution': 30 * 86400,
+        'tv-breaks-content': 30 * 86400,
+        'tv-no-yes-na': 30 * 86400,
+        'tv-language': 30 * 86400,
+        'tv-age-restriction': 30 * 86400,
+        'tv-playbacktype': 30 * 86400,
+        'tv-demo-attribute': 7 * 86400,
+        'tv-stat': 7 * 86400,
+        'tv-relation': 7 * 86400
+    }
+
     def __new__(cls, facility_id=None, settings_filename: str = None, cache_path: str = None,
                 cache_enabled: bool = True, username: str = None, passw: str = None, root_url: str = None,
                 client_id: str = None, client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
@@ -106,10 +137,27 @@ class MediaVortexCats:
         _ = facility_id
         super().__init__(*args, **kwargs)
 
-        self.msapi_network = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                      root_url, client_id, client_secret, keycloak_url)
-        self.tv_demo_attribs = self.load_tv_property()
-        self.tv_units = self.get_units()
+        network = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                  root_url, client_id, client_secret, keycloak_url)
+        # объект создается один раз: при смене сетевого модуля справочники загружаются заново
+        if getattr(self, 'msapi_network', None) is not network:
+            utils.reset_cached_properties(self)
+        self.msapi_network = network
+        self.msapi_network.set_cache_ttl({self._urls[k]: v for k, v in self._cache_ttl.items()})
+
+    @utils.cached_property
+    def tv_demo_attribs(self):
+        """
+        Демографические атрибуты, загружаются при первом обращении (см. load_tv_property)
+        """
+        return self.load_tv_property()
+
+    @utils.cached_property
+    def tv_units(self):
+        """
+        Списки доступных атрибутов отчетов, загружаются при первом обращении (см. get_units)
+        """
+        return self.get_units()
 
     def load_tv_property(self):
         """
@@ -223,7 +271,7 @@ class MediaVortexCats:
             f'Запрошены записи: {offset} - {offset + limit}\nВсего найдено записей: {total}\n')
 
     def _get_dict(self, entity_name, search_params=None, body_params=None, offset=None, limit=None, use_cache=False,
-                  request_type='post', show_header=True):
+                  request_type='post', show_header=True, chunk_size=None):
         """
         Получить словарь из API
 
@@ -256,11 +304,15 @@ class MediaVortexCats:
         show_header : bool
             Вывод информации о количестве загруженных записей. По умолчанию включено (True).
 
+        chunk_size : int
+            Размер порции записей. Если задан, возвращается генератор DataFrame по одному на порцию,
+            порции загружаются по мере обращения к генератору (см. MediascopeApiNetwork.iter_request_lo)
+
         Returns
         -------
         products : DataFrame
 
-            DataFrame с объектами словаря
+            DataFrame с объектами словаря или генератор DataFrame, если задан chunk_size
         """
 
         if limit is not None and offset is None:
@@ -269,6 +321,9 @@ class MediaVortexCats:
         if offset is not None and limit is None:
             raise ValueError("Необходимо указать значение параметра limit")
 
+        if chunk_size is not None and (offset is not None or limit is not None):
+            raise ValueError("Параметр chunk_size не используется совместно с параметрами offset и limit")
+
         if self._urls.get(entity_name) is None:
             return None
 
@@ -284,6 +339,11 @@ class MediaVortexCats:
 
         post_data = self._get_post_data(body_params)
 
+        if chunk_size is not None:
+            # справочник загружается порциями без накопления в памяти, кэш не используется
+            pages = self.msapi_network.iter_request_lo(request_type, url, data=post_data, limit=chunk_size)
+            return utils.iter_pages_to_df(pages)
+
         data = self.msapi_network.send_request_lo(
             request_type, url, data=post_data, use_cache=use_cache)
 
@@ -293,25 +353,7 @@ class MediaVortexCats:
         if 'header' not in data or 'data' not in data:
             return data
 
-        # извлекаем все заголовки столбцов (их может быть разное количество, особенно для поля notes)
-        res_headers = []
-        for item in data['data']:
-            for k, _ in item.items():
-                if k not in res_headers:
-                    res_headers.append(k)
-
-                    # инициализируем списки данных столбцов
-        res = {}
-        for h in res_headers:
-            res[h] = []
-
-        # наполняем найденные столбцы значениями
-        for item in data['data']:
-            for h in res_headers:
-                if h in item.keys():
-                    res[h].append(item[h])
-                else:
-                    res[h].append('')
+        df = utils.items_to_df(data['data'])
 
         # print header
         if show_header:
@@ -319,7 +361,7 @@ class MediaVortexCats:
                 self._print_header(data['header'], offset, limit)
             else:
                 self._print_header(data['header'], 0, data['header']['total'])
-        return pd.DataFrame(res)
+        return df
 
     def get_units(self):
         """
@@ -469,7 +511,8 @@ class MediaVortexCats:
             return self.tv_units.get(str(kit_id)).get('DuplicationTimeBand')
 
     def get_tv_subbrand(self, ids=None, name=None, ename=None, brand_ids=None, tv_area_ids=None, notes=None,
-                        order_by='id', order_dir=None, offset=None, limit=None, use_cache=False, show_header=True):
+                        order_by='id', order_dir=None, offset=None, limit=None, use_cache=False, show_header=True,
+                        chunk_size=None):
         """
         Получить коллекцию суббрендов
 
@@ -520,11 +563,17 @@ class MediaVortexCats:
         show_header : bool
             Вывод информации о количестве загруженных записей. По умолчанию включено (True).
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с суббрендами
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {
@@ -542,9 +591,10 @@ class MediaVortexCats:
         }
 
         df_sub = self._get_dict(entity_name='tv-subbrand', search_params=search_params, body_params=body_params,
-                                offset=offset, limit=limit, use_cache=use_cache, show_header=show_header)
+                                offset=offset, limit=limit, use_cache=use_cache, show_header=show_header,
+                                chunk_size=chunk_size)
 
-        return df_sub.reindex(columns=['id', 'name', 'ename', 'brandId', 'tvArea', 'notes'],fill_value='')
+        return utils.reindex_df(df_sub, ['id', 'name', 'ename', 'brandId', 'tvArea', 'notes'])
 
     def get_tv_subbrand_list(self, ids=None, name=None, ename=None, order_by='id', order_dir=None,
                              offset=None, limit=None, use_cache=False, show_header=True):
@@ -745,7 +795,7 @@ class MediaVortexCats:
                        first_issue_date=None, program_type_ids=None, program_category_ids=None, country_ids=None,
                        program_sport_ids=None, sport_group_ids=None, language_ids=None, program_producer_ids=None,
                        program_producer_year=None, is_program_group=None, is_child=None, notes=None, order_by='id',
-                       order_dir=None, offset=None, limit=None, use_cache=False, show_header=True):
+                       order_dir=None, offset=None, limit=None, use_cache=False, show_header=True, chunk_size=None):
         """
         Получить коллекцию программ
 
@@ -829,11 +879,17 @@ class MediaVortexCats:
         show_header : bool
             Вывод информации о количестве загруженных записей. По умолчанию включено (True).
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с программами
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {
@@ -863,13 +919,13 @@ class MediaVortexCats:
 
         df_prog =  self._get_dict(entity_name='tv-program', search_params=search_params,
                                   body_params=body_params, offset=offset, limit=limit, use_cache=use_cache,
-                                  show_header=show_header)
+                                  show_header=show_header, chunk_size=chunk_size)
 
-        return df_prog.reindex(
+        return utils.reindex_df(
+            df_prog,
             columns=['id', 'name', 'ename', 'extendedName', 'extendedEname', 'firstIssueDate', 'programTypeId',
                      'programCategoryId', 'programCountryId', 'programSportId', 'programSportGroupId', 'languageId',
-                     'programProducerId', 'producerYear', 'isProgramGroup', 'isChild', 'notes'],
-            fill_value='')
+                     'programProducerId', 'producerYear', 'isProgramGroup', 'isChild', 'notes'])
 
     def get_tv_program_type(self, ids=None, name=None, ename=None, notes=None,
                             order_by='id', order_dir=None, offset=None, limit=None, use_cache=False, show_header=True):
@@ -1299,7 +1355,7 @@ class MediaVortexCats:
 
     def get_tv_model(self, ids=None, name=None, ename=None, subbrand_ids=None, article_ids=None, tv_area_ids=None,
                      notes=None, order_by='id', order_dir=None, offset=None, limit=None, use_cache=False,
-                     show_header=True):
+                     show_header=True, chunk_size=None):
         """
         Получить коллекцию продуктов
 
@@ -1353,11 +1409,17 @@ class MediaVortexCats:
         show_header : bool
             Вывод информации о количестве загруженных записей. По умолчанию включено (True).
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с продуктами
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {
@@ -1377,11 +1439,9 @@ class MediaVortexCats:
 
         df_mod = self._get_dict(entity_name='tv-model', search_params=search_params,
                                 body_params=body_params, offset=offset, limit=limit, use_cache=use_cache,
-                                show_header=show_header)
+                                show_header=show_header, chunk_size=chunk_size)
 
-        return df_mod.reindex(
-            columns=['id', 'name', 'ename', 'subbrandId', 'articleId', 'tvArea', 'notes'],
-            fill_value='')
+        return utils.reindex_df(df_mod, ['id', 'name', 'ename', 'subbrandId', 'articleId', 'tvArea', 'notes'])
 
     def get_tv_model_list(self, ids=None, name=None, ename=None, order_by='id', order_dir=None,
                           offset=None, limit=None, use_cache=False, show_header=True):
@@ -2425,7 +2485,8 @@ class MediaVortexCats:
 
     def get_tv_appendix(self, ids=None, advertiser_ids=None, brand_ids=None, subbrand_ids=None, model_ids=None,
                         article2_ids=None, article3_ids=None, article4_ids=None,
-                        order_by='adId', order_dir=None, offset=None, limit=None, use_cache=False, show_header=True):
+                        order_by='adId', order_dir=None, offset=None, limit=None, use_cache=False, show_header=True,
+                        chunk_size=None):
         """
         Получить аппендикс
 
@@ -2482,11 +2543,17 @@ class MediaVortexCats:
         show_header : bool
             Вывод информации о количестве загруженных записей. По умолчанию включено (True).
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с аппендиксом
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {
@@ -2507,12 +2574,12 @@ class MediaVortexCats:
 
         df_appndx = self._get_dict(entity_name='tv-appendix', search_params=search_params,
                                    body_params=body_params, offset=offset, limit=limit, use_cache=use_cache,
-                                   show_header=show_header)
+                                   show_header=show_header, chunk_size=chunk_size)
 
-        return df_appndx.reindex(
+        return utils.reindex_df(
+            df_appndx,
             columns=['adId', 'advertiserId', 'brandId', 'subbrandId', 'modelId', 'articleLevel_1Id',
-                     'articleLevel_2Id', 'articleLevel_3Id', 'articleLevel_4Id'],
-            fill_value='')
+                     'articleLevel_2Id', 'articleLevel_3Id', 'articleLevel_4Id'])
 
     def get_tv_advertiser(self, ids=None, name=None, ename=None, notes=None, tv_area_ids=None,
                           order_by='id', order_dir=None, offset=None, limit=None, use_cache=False, show_header=True):
@@ -2771,7 +2838,7 @@ class MediaVortexCats:
                   advertiser_list_main_ids=None, brand_list_main_ids=None, subbrand_list_main_ids=None,
                   model_list_main_ids=None, article_list2_main_ids=None, article_list3_main_ids=None,
                   article_list4_main_ids=None, age_restriction_ids=None, tv_area_ids=None, order_by='id',
-                  order_dir=None, offset=None, limit=None, use_cache=False, show_header=True):
+                  order_dir=None, offset=None, limit=None, use_cache=False, show_header=True, chunk_size=None):
         """
         Получить коллекцию рекламных роликов
 
@@ -2882,11 +2949,17 @@ class MediaVortexCats:
         show_header : bool
             Вывод информации о количестве загруженных записей. По умолчанию включено (True).
 
+        chunk_size : int
+            Размер порции записей. Если задан, справочник загружается порциями по мере обращения к результату
+            (без кэширования), возвращается генератор DataFrame по одному на порцию.
+            Не используется совместно с параметрами offset и limit. По умолчанию не задан
+
         Returns
         -------
         media : DataFrame
 
             DataFrame с рекламой
+            Если задан параметр chunk_size - генератор DataFrame по порциям
         """
 
         search_params = {
@@ -2925,15 +2998,15 @@ class MediaVortexCats:
 
         df_ad = self._get_dict(entity_name='tv-ad', search_params=search_params,
                                body_params=body_params, offset=offset, limit=limit, use_cache=use_cache,
-                               show_header=show_header)
+                               show_header=show_header, chunk_size=chunk_size)
 
-        return df_ad.reindex(
+        return utils.reindex_df(
+            df_ad,
             columns=['id', 'adTypeId', 'name', 'ename', 'notes', 'standardDuration', 'adStyleId', 'sloganAudioId',
                      'sloganVideoId', 'firstIssueDate', 'advertiserListId', 'brandListId', 'subbrandListId',
                      'modelListId', 'articleList_2Id', 'articleList_3Id', 'articleList_4Id', 'advertiserListMainId',
                      'brandListMainId', 'subbrandListMainId', 'modelListMainId', 'articleList_2MainId',
-                     'articleList_3MainId', 'articleList_4MainId', 'ageRestrictionId', 'tvArea'],
-            fill_value='')
+                     'articleList_3MainId', 'articleList_4MainId', 'ageRestrictionId', 'tvArea'])
 
     def get_tv_ad_type(self, ids=None, name=None, ename=None, notes=None, accounting_duration_type_ids=None,
                        is_override=None, position_type=None, is_price=None, order_by='id', order_dir=None, offset=None,
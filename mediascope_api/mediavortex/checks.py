@@ -53,6 +53,9 @@ class MediaVortexTaskChecker:
         if name not in self.check_list:
             return False
         if obj:
+            if isinstance(obj, sql.FilterNode) and str in self.check_list[name]['types']:
+                # дерево условий принимается везде, где допустимо условие в SQL нотации
+                return True
             if type(obj) not in self.check_list[name]['types']:
                 self.error_text += self.check_list[name]['msg']
                 return False
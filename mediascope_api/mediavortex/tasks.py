@@ -4,12 +4,18 @@ MediaVortexTask module
 import time
 import datetime as dt
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import pandas as pd
+from requests.exceptions import RequestException
 from . import catalogs
 from . import checks
 from ..core import errors
+from ..core import async_net
+from ..core import filters
 from ..core import net
+from ..core import poll
+from ..core import results
 from ..core import tasks
 from ..core import utils
 
@@ -40,8 +46,8 @@ class MediaVortexTask:
         super().__init__(*args, **kwargs)
         if check_version:
             utils.check_version()
-        self.network_module = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                       root_url, client_id, client_secret, keycloak_url)
+        self.network_module = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                              root_url, client_id, client_secret, keycloak_url)
         self.task_builder = tasks.TaskBuilder()
         self.cats = catalogs.MediaVortexCats(0, settings_filename, cache_path, cache_enabled, username, passw,
                                              root_url, client_id, client_secret, keycloak_url)
@@ -186,8 +192,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате JSON
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         if add_city_to_basedemo_from_region:
             basedemo_filter = self._add_city_to_demo_from_region(
@@ -321,7 +327,7 @@ class MediaVortexTask:
         }
         self.task_builder.save_report_info(tinfo)
         # Возвращаем JSON
-        return json.dumps(tsk)
+        return tasks.Task(tsk)
 
     def build_timeband_task(self, task_name='', date_filter=None, weekday_filter=None,
                             daytype_filter=None, company_filter=None, region_filter=None, time_filter=None,
@@ -420,8 +426,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате JSON
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         return self.build_task(task_type='timeband', task_name=task_name, date_filter=date_filter,
                                weekday_filter=weekday_filter, daytype_filter=daytype_filter,
@@ -549,8 +555,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате JSON
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         return self.build_task(task_type='simple', task_name=task_name, date_filter=date_filter,
                                weekday_filter=weekday_filter, daytype_filter=daytype_filter,
@@ -681,8 +687,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате JSON
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         return self.build_task(task_type='crosstab', task_name=task_name, date_filter=date_filter,
                                weekday_filter=weekday_filter, daytype_filter=daytype_filter,
@@ -804,8 +810,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате MediaVortex API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         return self.build_task(task_type='consumption-target', task_name=task_name, date_filter=date_filter,
                                weekday_filter=weekday_filter, daytype_filter=daytype_filter,
@@ -920,8 +926,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате MediaVortex API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         return self.build_task(task_type='duplication-timeband', task_name=task_name, date_filter=date_filter,
                                weekday_filter=weekday_filter, daytype_filter=daytype_filter,
@@ -949,9 +955,13 @@ class MediaVortexTask:
             return
 
         try:
-            return self.network_module.send_request('post', self.task_urls[task_type], data)
+            tsk = self.network_module.send_task_request(self.task_urls[task_type], data)
         except errors.BadRequestError as e:
             print(f"Ошибка: {e}")
+            return None
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), f'mediavortex:{task_type}')
+        return tsk
 
     def send_task(self, data):
         """
@@ -960,8 +970,8 @@ class MediaVortexTask:
         Parameters
         ----------
 
-        data : str
-            Текст задания в JSON формате
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
 
         Returns
         -------
@@ -972,12 +982,97 @@ class MediaVortexTask:
         if data is None:
             print('Задание пустое')
             return
-        task_type = json.loads(data)['task_type']
+        data = tasks.Task.from_json(data)
+        task_type = data.params['task_type']
         if task_type not in self.task_urls:
             print(f'Не верно указать тип задания, допустимые значения: {" ,".join(self.task_urls.keys())}')
             return
         return self._send_task(task_type, data)
 
+    def send_tasks(self, data_list: list, max_workers: int = 5, max_active_tasks: int = None, status_delay=3):
+        """
+        Отправить список заданий на расчет параллельно
+
+        Задания отправляются порциями через пул потоков, размер порции ограничивается количеством свободных
+        мест для активных задач пользователя (см. get_active_tasks_count). Если сервер ответил ошибкой 429,
+        лимит активных задач принимается равным текущему количеству активных задач, а задание отправляется повторно.
+        Если задание отправить не удалось (другие ошибки API или сети), отправка остальных заданий продолжается,
+        а элемент списка результатов содержит ошибку: {'task': None, 'error': ...}
+
+        Parameters
+        ----------
+
+        data_list : list
+            Список заданий в JSON формате
+
+        max_workers : int
+            Максимальное количество одновременных запросов на отправку. По умолчанию 5
+
+        max_active_tasks : int
+            Лимит активных задач пользователя на сервере. По умолчанию не задан (None) и определяется
+            по ответам сервера
+
+        status_delay : int
+            Задержка в секундах перед повторной проверкой количества активных задач. По умолчанию 3 с
+
+        Returns
+        -------
+        tsks : list
+            Список заданий в формате, который принимает метод wait_task:
+
+                [
+                    {
+                        'task': {
+                            'taskId': 'xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx',
+                            'userName': 'user.name',
+                            'message': 'Задача поступила в обработку'
+                        }
+                    },
+                    ...
+                ]
+        """
+        if data_list is None:
+            return None
+        result = [{'task': None} for _ in data_list]
+        pending = [i for i, data in enumerate(data_list) if data is not None]
+        active_limit = max_active_tasks
+
+        # получаем токен заранее, чтобы потоки не запрашивали его одновременно
+        self.network_module.refresh_token()
+
+        print(f'Отправка задач ({len(pending)}) [ ', end='')
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(pending) > 0:
+                batch_size = max_workers
+                if active_limit is not None:
+                    active_tasks = self.network_module.get_active_tasks_count()
+                    if active_tasks is not None:
+                        batch_size = min(batch_size, active_limit - active_tasks)
+                if batch_size <= 0:
+                    time.sleep(status_delay)
+                    continue
+
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                futures = {executor.submit(self.send_task, data_list[i]): i for i in batch}
+                is_limited = False
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        result[i]['task'] = future.result()
+                    except errors.TooManyRequestsError:
+                        pending.append(i)
+                        is_limited = True
+                    except (errors.MediascopeApiError, RequestException) as e:
+                        # ошибка одного задания не прерывает отправку остальных
+                        result[i]['error'] = e
+                print('=', end=' ')
+                if is_limited:
+                    # сервер отклонил часть заданий: запоминаем лимит и ждем освобождения мест
+                    active_limit = max(1, self.network_module.get_active_tasks_count() or 0)
+                    time.sleep(status_delay)
+        print(']')
+        return result
+
     def send_timeband_task(self, data):
         """
         Отправить задание timeband
@@ -1073,7 +1168,7 @@ class MediaVortexTask:
         """
         return self._send_task('duplication-timeband', data)
 
-    def wait_task(self, tsk, status_delay=3, task_delay=0.2):
+    def wait_task(self, tsk, status_delay=None, task_delay=0.2, chunk_size=100):
         """
         Ожидает окончание расчета задания или заданий.
 
@@ -1101,10 +1196,14 @@ class MediaVortexTask:
                 ]
 
         status_delay : int
-            Задержка в секундах между опросом статуса. По умолчанию 3 с
+            Задержка в секундах между опросом статуса. По умолчанию не задана: задержка увеличивается
+            экспоненциально, начиная со значения, рассчитанного по времени расчета предыдущих заданий того же типа
 
         task_delay : int
-            Задержка в секундах между опросом статуса каждого задания для списка заданий. По умолчанию 0.2 с
+            Задержка в секундах между запросами статусов порций заданий для списка заданий. По умолчанию 0.2 с
+
+        chunk_size : int
+            Количество заданий, статус которых запрашивается одним запросом для списка заданий. По умолчанию 100
 
         Returns
         -------
@@ -1115,12 +1214,13 @@ class MediaVortexTask:
         if isinstance(tsk, dict):
             if tsk.get('taskId') is not None:
                 tid = tsk.get('taskId', None)
+                scheduler = poll.PollScheduler([tid], fixed_delay=status_delay)
                 task_state = ''
                 task_state_obj = None
                 cnt = 0
                 while cnt < 5:
                     try:
-                        time.sleep(status_delay)
+                        time.sleep(scheduler.next_delay())
                         task_state_obj = self.network_module.send_request('get', f'/task/state/{tid}')
                     except errors.BadRequestError:
                         cnt += 1
@@ -1138,13 +1238,12 @@ class MediaVortexTask:
                 # DONE, FAILED, IN_PROGRESS, CANCELLED, IN_QUEUE
                 while task_state == 'IN_QUEUE' or task_state == 'IN_PROGRESS':
                     print('=', end=' ')
-                    time.sleep(status_delay)
+                    time.sleep(scheduler.next_delay())
                     task_state_obj = self.network_module.send_request('get', f'/task/state/{tsk["taskId"]}')
                     if task_state_obj is not None:
                         task_state = task_state_obj.get('taskStatus', '')
                 if task_state == 'FAILED':
                     print(f"Задача завершилась с ошибкой: {task_state_obj.get('message', '')}")
-                time.sleep(1)
                 e = dt.datetime.now()
                 print(f"] время расчета: {str(e - s)}")
                 if task_state == 'DONE':
@@ -1152,49 +1251,45 @@ class MediaVortexTask:
                     tsk['dtRegister'] = task_state_obj.get('dtRegister', '')
                     tsk['dtFinish'] = task_state_obj.get('dtFinish', '')
                     tsk['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
+                    poll.record_duration(tid, tsk['taskProcessingTimeSec'])
                     return tsk
         elif isinstance(tsk, list):
-            task_list = list()
+            task_list = dict()
             # получим все идентификаторы заданий
             for t in tsk:
                 cur_task = t.get('task')
                 if cur_task is None or cur_task.get('taskId') is None:
                     continue
-                task_list.append(t)
+                task_list[cur_task['taskId']] = t
             # Проверим состояние заданий
             print(f'Расчет задач ({len(task_list)}) [ ', end='')
             s = dt.datetime.now()
-            while True:
-                time.sleep(status_delay)
-                # запросим состояние
-                done_count = 0
-                for t in task_list:
-                    tid = t['task']['taskId']
-                    task_state = ''
-                    task_state_obj = self.network_module.send_request('get', f'/task/state/{tid}')
-                    time.sleep(task_delay)
-                    if task_state_obj is not None:
-                        task_state = task_state_obj.get('taskStatus', '')
+            waiting = list(task_list.keys())
+            scheduler = poll.PollScheduler(waiting, fixed_delay=status_delay)
+            while len(waiting) > 0:
+                time.sleep(scheduler.next_delay())
+                # запросим состояние всех незавершенных заданий порциями
+                for task_state_obj in self._get_statuses_by_chunks(waiting, chunk_size, task_delay):
+                    tid = task_state_obj.get('taskId')
+                    if tid not in task_list:
+                        continue
+                    task_state = task_state_obj.get('taskStatus', '')
 
-                    if task_state == 'IN_PROGRESS' \
-                            or task_state == 'PENDING' \
-                            or task_state == 'IN_QUEUE' \
-                            or task_state == 'IDLE':
+                    if task_state in ('IN_PROGRESS', 'PENDING', 'IN_QUEUE', 'IDLE'):
                         continue
-                    elif task_state == 'DONE':
+                    t = task_list[tid]
+                    if task_state == 'DONE':
                         t['task']['message'] = 'DONE'
                         t['task']['dtRegister'] = task_state_obj.get('dtRegister', '')
                         t['task']['dtFinish'] = task_state_obj.get('dtFinish', '')
                         t['task']['taskProcessingTimeSec'] = task_state_obj.get('taskProcessingTimeSec', '')
-                        done_count += 1
+                        poll.record_duration(tid, t['task']['taskProcessingTimeSec'])
                     else:
                         errs[tid] = t
                         errs[tid]['state'] = task_state
                         errs[tid]['message'] = task_state_obj.get('message', '')
-                        done_count += 1
+                    waiting.remove(tid)
                 print('=', end=' ')
-                if done_count == len(tsk):
-                    break
 
             if len(errs) > 0:
                 print("Одна или несколько задач завершились с ошибкой")
@@ -1205,6 +1300,16 @@ class MediaVortexTask:
             print(f"] время расчета: {str(e - s)}")
             return tsk
 
+    def _get_statuses_by_chunks(self, tsk_ids: list, chunk_size: int, chunk_delay=0):
+        result = []
+        for i in range(0, len(tsk_ids), chunk_size):
+            if i > 0:
+                time.sleep(chunk_delay)
+            states = self.get_statuses(tsk_ids[i:i + chunk_size])
+            if states is not None:
+                result.extend(states)
+        return result
+
     def get_status(self, tsk):
         """
         Получить статус расчета задания.
@@ -1423,6 +1528,148 @@ class MediaVortexTask:
             return None
         return self.network_module.send_request('get', f'/task/result/{tsk["taskId"]}')
 
+    def submit_or_reuse(self, data, status_delay=None):
+        """
+        Получить результат расчета задания. Если такое же задание уже было рассчитано,
+        результат берется из кэша результатов без отправки задания на сервер,
+        иначе задание отправляется на расчет, а результат сохраняется в кэш.
+        Вместе с результатом сохраняется период доступных данных на момент расчета (см. get_result_info).
+
+        Parameters
+        ----------
+
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
+
+        status_delay : int
+            Задержка в секундах между опросом статуса задания, см. wait_task
+
+        Returns
+        -------
+        result : dict
+            Результат расчета задания
+        """
+        if data is None:
+            print('Задание пустое')
+            return None
+        data = tasks.Task.from_json(data)
+        result_cache = results.ResultCache(self.network_module, 'mediavortex')
+        return result_cache.submit_or_reuse(data, self.send_task, lambda tsk: self.wait_task(tsk, status_delay),
+                                            self.get_result, self._get_availability)
+
+    def get_result_info(self, data):
+        """
+        Получить информацию о сохраненном в кэше результате расчета задания
+
+        Parameters
+        ----------
+
+        data : str|Task
+            Задание, полученное методом build_task, или текст задания в JSON формате
+
+        Returns
+        -------
+        info : dict
+            Информация о результате или None, если результат не сохранен:
+                - taskId - идентификатор задания, результат которого сохранен
+                - dtSaved - дата и время сохранения результата
+                - availability - период доступных данных на момент расчета
+        """
+        entry = results.ResultCache(self.network_module, 'mediavortex').get(tasks.Task.from_json(data))
+        if entry is None:
+            return None
+        return {k: v for k, v in entry.items() if k != 'result'}
+
+    def _get_availability(self):
+        try:
+            df = self.cats.get_availability_period()
+        except errors.MediascopeApiError:
+            return None
+        return df.to_dict('records') if isinstance(df, pd.DataFrame) else None
+
+    def _get_async_network(self):
+        if getattr(self, 'async_network_module', None) is None:
+            self.async_network_module = async_net.AsyncMediascopeApiNetwork.from_network(self.network_module)
+        return self.async_network_module
+
+    async def send_task_async(self, data):
+        """
+        Асинхронно отправить задание на расчет, см. send_task
+
+        Parameters
+        ----------
+
+        data : str
+            Текст задания в JSON формате
+
+        Returns
+        -------
+        text : json
+            Ответ сервера, содержит taskid, который необходим для получения результата
+        """
+        if data is None:
+            print('Задание пустое')
+            return None
+        data = tasks.Task.from_json(data)
+        task_type = data.params['task_type']
+        if task_type not in self.task_urls:
+            print(f'Не верно указать тип задания, допустимые значения: {", ".join(self.task_urls.keys())}')
+            return None
+        try:
+            tsk = await self._get_async_network().send_task_request(self.task_urls[task_type], data)
+        except errors.BadRequestError as e:
+            print(f"Ошибка: {e}")
+            return None
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), f'mediavortex:{task_type}')
+        return tsk
+
+    async def _get_task_state_async(self, tid):
+        task_state_obj = await self._get_async_network().send_request('get', f'/task/state/{tid}')
+        if task_state_obj is None:
+            return '', None
+        return task_state_obj.get('taskStatus', ''), task_state_obj
+
+    async def wait_task_async(self, tsk, status_delay=None):
+        """
+        Асинхронно ожидает окончание расчета задания или заданий, см. wait_task.
+        Задания списка ожидаются одновременно
+
+        Parameters
+        ----------
+
+        tsk : dict|list
+            Задание или список заданий
+
+        status_delay : int
+            Задержка в секундах между опросом статуса. По умолчанию подбирается автоматически
+
+        Returns
+        -------
+        tsk : dict|list
+            Возвращает задание или список заданий, None - если одно из заданий завершилось с ошибкой
+        """
+        return await async_net.wait_tasks(self._get_task_state_async, tsk, status_delay)
+
+    async def get_result_async(self, tsk):
+        """
+        Асинхронно получить результат выполнения задания по его ID
+
+        Parameters
+        ----------
+
+        tsk : dict
+            Задание
+
+        Returns
+        -------
+        text : json
+            Результат выполнения задания в JSON формате
+        """
+        if tsk is None or tsk.get('taskId') is None:
+            return None
+        return await self._get_async_network().send_request('get', f'/task/result/{tsk["taskId"]}')
+
     def result2table(self, data, project_name=None, time_separator=True, to_lists=False):
         """
         Преобразовать результат выполнения задания из JSON в DataFrame
@@ -1751,8 +1998,8 @@ class MediaVortexTask:
 
         Returns
         -------
-        text : json
-            Задание в формате MediaVortex API
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         return self.build_task(task_type='respondent-analysis', task_name=task_name, date_filter=date_filter,
                                weekday_filter=weekday_filter, daytype_filter=daytype_filter,
@@ -1776,34 +2023,31 @@ class MediaVortexTask:
         if company_filter is None:
             return demo_filter
 
-        # Собираем JSON
-        tsk = {
-            "filter": {}
-        }
-        self.task_builder.add_filter(tsk, company_filter, 'companyFilter')
+        company = filters.to_filter(company_filter)
+        elements = company.items if isinstance(company, filters.ConditionGroup) else [company]
+        for element in elements:
+            if isinstance(element, filters.Condition) and element.unit == 'regionId':
+                region_value = element.value
+                if not isinstance(element.value, (list, tuple)):
+                    region_value = [element.value]
+
+                cities = self.cats.get_tv_monitoring_cities(region_id=list(region_value), kit_id=kit_id,
+                                                            show_header=False)
+                if cities.empty:
+                    return demo_filter
 
-        for element in tsk['filter']['companyFilter']['elements']:
-            if element['unit'] == 'regionId':
-                region_value = element['value']
-                if not isinstance(element['value'], list):
-                    region_value = [element['value']]
-
-                city_ids = self.cats.get_tv_monitoring_cities(region_id=region_value,
-                                                              kit_id=kit_id,
-                                                              return_city_ids_as_string=True,
-                                                              show_header=False)
-                if city_ids:
-                    relation_element = 'IN'
-                    if element['relation'] == 'NIN':
-                        relation_element = element['relation']
-
-                    if demo_filter is None:
-                        return 'city ' + relation_element + ' (' + city_ids + ')'
-                    else:
-                        if 'city' not in demo_filter:
-                            return demo_filter + ' AND city ' + relation_element + ' (' + city_ids + ')'
+                city_ids = cities['demoAttributeValueId'].unique().tolist()
+                if element.relation == 'NIN':
+                    city_filter = filters.NotIn('city', city_ids)
                 else:
-                    return demo_filter
+                    city_filter = filters.In('city', city_ids)
+
+                if demo_filter is None:
+                    return city_filter
+                if 'city' not in filters.sql_to_units(demo_filter):
+                    return filters.And(demo_filter, city_filter)
+                return demo_filter
+        return demo_filter
 
     def get_active_tasks_count(self):
         """
@@ -25,8 +25,8 @@ class ResponsumCats:
                  client_id: str = None, client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # load holdings
-        self.msapi_network = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw,
-                                                      root_url, client_id, client_secret, keycloak_url)
+        self.msapi_network = net.get_network(settings_filename, cache_path, cache_enabled, username, passw,
+                                             root_url, client_id, client_secret, keycloak_url)
         if facility_id != self.facility_id or not hasattr(self, 'demattr') or not hasattr(self, 'holdings'):
             self.facility_id = facility_id
             self.demattr = self.get_demo()
@@ -8,22 +8,12 @@ import hashlib
 import re
 import json
 import pandas as pd
-from pyparsing import (
-    Word,
-    delimitedList,
-    Group,
-    alphas,
-    alphanums,
-    Forward,
-    oneOf,
-    quotedString,
-    infixNotation,
-    opAssoc,
-    restOfLine,
-    CaselessKeyword,
-    pyparsing_common as ppc
-)
+from ..core import async_net
+from ..core import filters
 from ..core import net
+from ..core import poll
+from ..core import sql
+from ..core import tasks
 from . import catalogs
 
 class ResponsumTask:
@@ -52,175 +42,36 @@ class ResponsumTask:
                  cache_enabled: bool = True, username: str = None, passw: str = None, root_url: str = None,
                  client_id: str = None, client_secret: str = None, keycloak_url: str = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.rnet = net.MediascopeApiNetwork(settings_filename, cache_path, cache_enabled, username, passw, root_url,
-                                             client_id, client_secret, keycloak_url)
-        self.rcats = catalogs.ResponsumCats(facility_id, settings_filename, cache_path)
+        self.rnet = net.get_network(settings_filename, cache_path, cache_enabled, username, passw, root_url,
+                                    client_id, client_secret, keycloak_url)
+        self.rcats = catalogs.ResponsumCats(facility_id, settings_filename, cache_path, cache_enabled, username, passw,
+                                            root_url, client_id, client_secret, keycloak_url)
         self.demo_attr = self.rcats.get_demo()
         self.demo_dict = self.rcats.get_demo_dict(self.demo_attr)
-        self.sql_parser = self._prepare_sql_parser()
+        # идентификаторы демографических атрибутов для условий фильтров
+        self.demo_units = {k: v['v'] for k, v in self.demo_dict.items()}
         self.task_info = dict()
         self.task_info['tasks'] = dict()
 
     @staticmethod
-    def _prepare_sql_parser():
+    def _to_filter(filter_obj):
         """
-        Подготовка SQL-like парсера для разбора условий в фильтрах.
-
-        Returns
-        -------
-
-        simple_sql : obj
-            Объект класса, отвечающего за парсинг.
-        """
-        # define SQL tokens
-        select_stmt = Forward()
-        op_and, op_or, op_in, op_notin = map(
-            CaselessKeyword, "and or in notin".split()
-        )
-
-        ident = Word(alphas, alphanums + "_$").setName("identifier")
-        column_name = delimitedList(ident, ".", combine=True).setName("column name")
-        column_name.addParseAction(ppc.downcaseTokens)
-
-        binop = oneOf("= != > <", caseless=True)
-        real_num = ppc.real()
-        int_num = ppc.signed_integer()
-
-        column_rval = (
-                real_num | int_num | quotedString | column_name
-        )  # need to add support for alg expressions
-        where_condition = Group(
-            (column_name + binop + column_rval)
-            | (column_name + op_in + Group("(" + delimitedList(column_rval) + ")"))
-            | (column_name + op_in + Group("(" + select_stmt + ")"))
-            | (column_name + op_notin + Group("(" + delimitedList(column_rval) + ")"))
-        )
-
-        where_expression = infixNotation(
-            where_condition,
-            [(op_and, 2, opAssoc.LEFT), (op_or, 2, opAssoc.LEFT), ],
-        )
-
-        # define the grammar
-        select_stmt <<= where_expression
-        simple_sql = select_stmt
-
-        # define Oracle comment format, and ignore them
-        oracle_sql_comment = "--" + restOfLine
-        simple_sql.ignore(oracle_sql_comment)
-        return simple_sql
-
-    def _get_point(self, left_obj, logic_oper, right_obj):
-        """
-        Формирует объект - point, понятный для API Responsum.
-
-        Parameters
-        ----------
-
-        left_obj : str
-            Левая часть выражения.
-        logic_oper : str
-            Логический оператор.
-        right_obj : obj
-            Правая часть выражения.
-
-
-        Returns
-        -------
-        point : dict
-            Объект - point, понятный для API Responsum.
-
-        """
-        # корректируем демо атрибуты: переводим названия в идентификаторы
-        if left_obj in self.demo_dict:
-            left_obj = self.demo_dict[left_obj]['v']
-        # проверяем логику
-        point = {}
-        if logic_oper == 'in' or logic_oper == 'notin':
-            # ожидаем в правой части список атрибутов, бежим по нему
-            if isinstance(right_obj, list):
-                point = {"children": []}
-                for robj in right_obj:
-                    if isinstance(robj, str) and (robj in ['(', ')']):
-                        # пропускаем скобки, объекты и так лежат в отдельном списке
-                        continue
-                    # формируем условие в json формате
-                    p = {"point": {"type": left_obj, "val": robj}, "operator": "EQUAL", "isNot": False}
-                    point['children'].append(p)
-                point["logic"] = "OR"
-                point["isNot"] = False
-
-        elif logic_oper == '!=':
-            point = {"point": {"type": left_obj, "val": right_obj}, "operator": "EQUAL", "isNot": True}
-        elif logic_oper == '>':
-            point = {"point": {"type": left_obj, "val": right_obj}, "operator": "ABOVE", "isNot": False}
-        elif logic_oper == '<':
-            point = {"point": {"type": left_obj, "val": right_obj}, "operator": "LESS", "isNot": False}
-        else:
-            point = {"point": {"type": left_obj, "val": right_obj}, "operator": "EQUAL", "isNot": False}
-
-        return point
-
-    def _find_points(self, obj):
-        """
-        Ищет в исходном объекте объекты типа point и преобразует их в формат Responsum API
+        Преобразует условие фильтрации, записанное в SQL нотации, в дерево условий.
+        Имена атрибутов в условиях Responsum не зависят от регистра и переводятся в нижний регистр.
         """
-        if isinstance(obj, list):
-            if len(obj) == 3 and isinstance(obj[0], str) and obj[1] in ['=', '!=', '>', '<', 'in', 'notin']:
-                return self._get_point(obj[0], obj[1], obj[2])
-
-        i = 0
-        while i < len(obj):
-            obj_item = obj[i]
-            if isinstance(obj_item, list):
-                obj[i] = self._find_points(obj_item)
-            i += 1
-        return obj
-
-    def _parse_expr(self, obj):
-        """
-        Преобразует выражение для фильтрации из набора вложенных списков в формат Responsum API.
-
-        Parameters
-        ----------
-
-        obj : dict | list
-            Объект с условиями фильтрации в виде набора вложенных списков, полученный после работы SQL парсера.
-
-
-        Returns
-        -------
-        jdat : dict
-            Условия фильтрации в формате Responsum API.
-        """
-        if isinstance(obj, list):
-            jdat = {'children': []}
-            for obj_item in obj:
-                if isinstance(obj_item, list):
-                    ret_data = self._parse_expr(obj_item)
-                    jdat['children'].append(ret_data)
-                elif isinstance(obj_item, dict):  # and 'point' in obj_item.keys():
-                    jdat['children'].append(obj_item)
-                elif isinstance(obj_item, str) and obj_item in ['or', 'and']:
-                    jdat["logic"] = obj_item.upper()
-                    jdat["isNot"] = False
-            return jdat
-        elif isinstance(obj, dict):
-            jdat = {'children': []}
-            jdat['children'].append(obj)
-            jdat["logic"] = 'OR'
-            jdat["isNot"] = False
-            return jdat
+        if isinstance(filter_obj, str):
+            return sql.parse_filter(filter_obj, downcase=True)
+        return filters.to_filter(filter_obj)
 
     def _sql_to_json(self, sql_text):
         """
-        Преобразует условие фильтрации, записанное в SQL нотации, в формат Responsum API.
+        Преобразует условие фильтрации, записанное в SQL нотации или деревом условий, в формат Responsum API.
 
         Parameters
         ----------
 
-        sql_text : str
-            Текст условия в SQL формате.
+        sql_text : str | filters.FilterNode
+            Текст условия в SQL формате или дерево условий (см. модуль filters).
 
 
         Returns
@@ -229,12 +80,10 @@ class ResponsumTask:
             Условия фильтрации в формате Responsum API.
 
         """
-
-        sql_obj = self.sql_parser.parseString(sql_text)
-        # sql_obj.pprint()
-        s = sql_obj.asList()[0]
-        prep_points = self._find_points(s)
-        return self._parse_expr(prep_points)
+        node = self._to_filter(sql_text)
+        if filters.OPTIMIZE_FILTERS:
+            node = filters.optimize(node)
+        return node.to_responsum(self.demo_units)
 
     @staticmethod
     def get_sql_from_list(obj_name, obj_data):
@@ -289,32 +138,27 @@ class ResponsumTask:
                 elif 4 in usetype_filter and 3 not in usetype_filter:
                     usetype_filter.append(3)
 
-            usetype_sql = 'usetype_id in (' + ','.join(str(x) for x in usetype_filter) + ')'
+            usetype = filters.In('usetype_id', usetype_filter)
             if media_filter is not None:
-                media_filter = '(' + media_filter + ') AND ' + usetype_sql
+                media_filter = filters.And(self._to_filter(media_filter), usetype)
             else:
-                media_filter = usetype_sql
+                media_filter = usetype
             if task_type == 'duplication':
                 if dup_media_filter is not None:
-                    dup_media_filter = '(' + dup_media_filter + ') AND ' + usetype_sql
+                    dup_media_filter = filters.And(self._to_filter(dup_media_filter), usetype)
                 else:
-                    dup_media_filter = usetype_sql
+                    dup_media_filter = usetype
 
-        # Добавляем фильтр по населению
-        if population_filter is not None:
-            population_sql = 'CITY_TYPE2 in (' + ','.join(str(x) for x in population_filter) + ')'
-            if demo_filter is not None:
-                demo_filter = population_sql + ' AND ' + demo_filter
-            else:
-                demo_filter = population_sql
-
-        # Добавляем фильтр по возрастным группам
+        # Добавляем фильтры по возрастным группам и по населению
+        demo_items = []
         if ages_filter is not None:
-            ages_sql = 'AGE_GROUPS in (' + ','.join(str(x) for x in ages_filter) + ')'
+            demo_items.append(filters.In('age_groups', ages_filter))
+        if population_filter is not None:
+            demo_items.append(filters.In('city_type2', population_filter))
+        if demo_items:
             if demo_filter is not None:
-                demo_filter = ages_sql + ' AND ' + demo_filter
-            else:
-                demo_filter = ages_sql
+                demo_items.append(self._to_filter(demo_filter))
+            demo_filter = filters.combine('AND', *demo_items)
 
         # Формируем фильтры
         if media_filter is not None:
@@ -332,9 +176,11 @@ class ResponsumTask:
 
         # Сохраняем информацию о задании, для последующего сохранения в Excel
         self._save_task_info(task_name, facility, date_from, date_to, usetype_filter,
-                             population_filter, ages_filter, media_filter, demo_filter,
+                             population_filter, ages_filter,
+                             None if media_filter is None else str(media_filter),
+                             None if demo_filter is None else str(demo_filter),
                              statistics, structure)
-        return json.dumps(tsk)
+        return tasks.Task(tsk)
 
     def build_audience_task(self, task_name='', facility=None, date_from=None, date_to=None, usetype_filter=None,
                             population_filter=None, ages_filter=None, media_filter=None, demo_filter=None,
@@ -432,8 +278,8 @@ class ResponsumTask:
 
         Returns
         -------
-        text : json
-            Задание в формате Responsum API.
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         error_text = self._check_task_params(date_from, date_to, facility, statistics, structure, self.AUDIENCE_STAT)
         if 'ReachN' in statistics:
@@ -505,8 +351,8 @@ class ResponsumTask:
 
         Returns
         -------
-        text : json
-            Задание в формате Responsum API.
+        text : Task
+            Задание в формате JSON (str, tasks.Task), параметры задания в виде словаря возвращает атрибут params
         """
         if task_name is None or task_name == '':
             # make task name by user and datetime
@@ -571,8 +417,8 @@ class ResponsumTask:
 
         Returns
         -------
-        text : json
-            Задание в формате Responsum API.
+        text : Task
+            Задание в формате Responsum API: словарь с параметрами задания, при отправке передается в JSON формате.
         """
 
         if task_name is None or task_name == '':
@@ -639,6 +485,14 @@ class ResponsumTask:
             structure['demo'] = demo_vals
         return structure
 
+    def _send_task(self, task_type, data):
+        if data is None:
+            return None
+        tsk = self.rnet.send_task_request(f'/task/{task_type}', data)
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), f'responsum:{task_type}')
+        return tsk
+
     def send_audience_task(self, data):
         """
         Отправить задание на расчет аудиторных статистик.
@@ -656,10 +510,7 @@ class ResponsumTask:
             Ответ сервера, содержит taskid, который будет необходим для получения результата.
 
         """
-        if data is not None:
-            return self.rnet.send_request('post', '/task/audience', data)
-        else:
-            return None
+        return self._send_task('audience', data)
 
     def send_duplication_task(self, data):
         """
@@ -678,10 +529,7 @@ class ResponsumTask:
             Ответ сервера, содержит taskid, который будет необходим для получения результата.
 
         """
-        if data is not None:
-            return self.rnet.send_request('post', '/task/duplication', data)
-        else:
-            return None
+        return self._send_task('duplication', data)
 
     def _send_duration_task(self, data):
         """
@@ -700,14 +548,21 @@ class ResponsumTask:
             Ответ сервера, содержит taskid, который будет необходим для получения результата.
 
         """
-        if data is not None:
-            return self.rnet.send_request('post', '/task/audience-duration', data)
-        else:
-            return None
+        return self._send_task('audience-duration', data)
 
-    def wait_task(self, tsk):
+    def wait_task(self, tsk, status_delay=None):
         """
         Ожидание завершения задания.
+
+        Parameters
+        ----------
+
+        tsk : dict|list
+            Задание или список заданий
+
+        status_delay : int
+            Задержка в секундах между опросом статуса. По умолчанию не задана: задержка увеличивается
+            экспоненциально, начиная со значения, рассчитанного по времени расчета предыдущих заданий того же типа
         """
         if tsk is None:
             return None
@@ -718,18 +573,19 @@ class ResponsumTask:
 
             if tsk.get('taskId') is not None:
                 tid = tsk.get('taskId', None)
-                time.sleep(1)
+                scheduler = poll.PollScheduler([tid], fixed_delay=status_delay)
+                time.sleep(scheduler.next_delay())
                 tstate = self.rnet.send_raw_request('get', f'/task/state?task-id={tid}')
                 print('Расчет задачи [ ', end='')
                 s = dt.datetime.now()
                 while tstate == 'IN_PROGRESS' or tstate == 'PENDING' or tstate == 'IN_QUEUE' or tstate == 'IDLE':
                     print('=', end=' ')
-                    time.sleep(3)
+                    time.sleep(scheduler.next_delay())
                     tstate = self.rnet.send_raw_request('get', f'/task/state?task-id={tsk["taskId"]}')
-                time.sleep(1)
                 e = dt.datetime.now()
                 print(f"] время расчета: {str(e - s)}")
                 if tstate == 'DONE':
+                    poll.record_duration(tid, (e - s).total_seconds())
                     return tsk
                 else:
                     print(f" Задача завершена со статутом: {tstate}")
@@ -748,8 +604,9 @@ class ResponsumTask:
             print(f'Расчет задач ({len(tasks)}) [ ', end='')
             s = dt.datetime.now()
             errors = dict()
+            scheduler = poll.PollScheduler(tasks, fixed_delay=status_delay)
             while True:
-                time.sleep(3)
+                time.sleep(scheduler.next_delay())
                 # запросим состояние
                 done_count = 0
 
@@ -763,6 +620,7 @@ class ResponsumTask:
                         if tstate == 'IN_PROGRESS' or tstate == 'PENDING' or tstate == 'IN_QUEUE' or tstate == 'IDLE':
                             continue
                         elif tstate == 'DONE':
+                            poll.record_duration(tid, (dt.datetime.now() - s).total_seconds())
                             done_count += 1
                         else:
                             errors[tid] = tstate
@@ -800,6 +658,80 @@ class ResponsumTask:
             return None
         return self.rnet.send_request('get', f'/task/result?task-id={tsk["taskId"]}')
 
+    def _get_async_network(self):
+        if getattr(self, 'async_network_module', None) is None:
+            self.async_network_module = async_net.AsyncMediascopeApiNetwork.from_network(self.rnet)
+        return self.async_network_module
+
+    async def send_task_async(self, task_type, data):
+        """
+        Асинхронно отправить задание на расчет
+
+        Parameters
+        ----------
+
+        task_type : str
+            Тип задания: audience, duplication или audience-duration
+
+        data : str
+            Текст задания в JSON формате
+
+        Returns
+        -------
+        text : json
+            Ответ сервера, содержит taskid, который будет необходим для получения результата
+        """
+        if data is None:
+            return None
+        tsk = await self._get_async_network().send_task_request(f'/task/{task_type}', data)
+        if isinstance(tsk, dict):
+            poll.register_task(tsk.get('taskId'), f'responsum:{task_type}')
+        return tsk
+
+    async def _get_task_state_async(self, tid):
+        tstate = await self._get_async_network().send_raw_request('get', f'/task/state?task-id={tid}')
+        return tstate, None
+
+    async def wait_task_async(self, tsk, status_delay=None):
+        """
+        Асинхронно ожидает окончание расчета задания или заданий, см. wait_task.
+        Задания списка ожидаются одновременно
+
+        Parameters
+        ----------
+
+        tsk : dict|list
+            Задание или список заданий
+
+        status_delay : int
+            Задержка в секундах между опросом статуса. По умолчанию подбирается автоматически
+
+        Returns
+        -------
+        tsk : dict|list
+            Возвращает задание или список заданий, None - если одно из заданий завершилось с ошибкой
+        """
+        return await async_net.wait_tasks(self._get_task_state_async, tsk, status_delay)
+
+    async def get_result_async(self, tsk):
+        """
+        Асинхронно получить результат выполнения задания по его ID
+
+        Parameters
+        ----------
+
+        tsk : dict
+            Задание
+
+        Returns
+        -------
+        text : json
+            Результат выполнения задания в JSON формате
+        """
+        if tsk is None or tsk.get('taskId') is None:
+            return None
+        return await self._get_async_network().send_request('get', f'/task/result?task-id={tsk["taskId"]}')
+
     @staticmethod
     def _result2table(data, axis_y=None):
         """
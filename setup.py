@@ -18,11 +18,17 @@ setup(
     license='BSD-3-Clause',
     requires=['pandas', 'requests', 'pyparsing', 'urllib3'],
     install_requires=['pandas', 'requests', 'pyparsing', 'urllib3>=1.26.7'],
+    extras_require={
+        'async': ['httpx'],
+        'cache': ['msgpack', 'zstandard'],
+        'token': ['cryptography'],
+        'json': ['orjson']
+    },
     url='https://github.com/MEDIASCOPE-JSC/mediascope-api-lib',
     download_url='https://github.com/MEDIASCOPE-JSC/mediascope-api-lib/tarball/v1.7.2',
     classifiers=[
         "Development Status :: 5 - Production/Stable",
-        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3.7",
         "Natural Language :: Russian",
         "License :: OSI Approved :: BSD License",
         'Operating System :: Microsoft :: Windows',
@@ -30,5 +36,5 @@ setup(
         'Operating System :: Unix',
         'Operating System :: MacOS'
     ],
-    python_requires='>=3.6'
+    python_requires='>=3.7'
 )
@@ -0,0 +1,39 @@
+"""
+Сравнение скорости разбора условий фильтрации: быстрый парсер и pyparsing.
+Запуск: python bench_sql.py
+"""
+import time
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import sql
+
+
+def bench(name, func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{name:<40} {elapsed * 1000:10.2f} ms')
+    return elapsed
+
+
+def main():
+    in_list = f"programId IN ({','.join(str(i) for i in range(10000))})"
+    texts = {
+        'IN (10000 значений)': in_list,
+        'IN (10000 значений) AND условия': f'({in_list}) AND regionId IN (1, 2, 3) AND demoSex = 1',
+        'Условия без списков': 'demoSex = 1 AND (demoAge >= 18 AND demoAge <= 44 OR demoEducation = 3)'
+    }
+    for title, text in texts.items():
+        print(title)
+        assert sql._parse_sql_fast(text) == sql._parse_sql_pyparsing(text)
+        repeat = 3 if len(text) > 1000 else 300
+        slow = bench('  pyparsing', sql._parse_sql_pyparsing, text, repeat)
+        fast = bench('  быстрый парсер', sql._parse_sql_fast, text, repeat)
+        print(f'  ускорение: {slow / fast:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
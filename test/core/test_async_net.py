@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+import sys
+sys.path.insert(1, "../..")
+
+pytest.importorskip('httpx')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # локальная заглушка Mediascope API: авторизация, словарь с постраничной загрузкой и задания
+    protocol_version = 'HTTP/1.1'
+    states = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        self._read_body()
+        if self.path == '/token':
+            self._send(200, {'access_token': 'token', 'expires_in': 300})
+        elif self.path == '/task/timeband':
+            tid = f'task-{len(self.states)}'
+            self.states[tid] = 0
+            self._send(200, {'taskId': tid, 'userName': 'user', 'message': 'Задача поступила в обработку'})
+        else:
+            self._send(404, 'not found')
+
+    def do_GET(self):
+        self._read_body()
+        if self.headers.get('Authorization') != 'Bearer token':
+            self._send(401, 'unauthorized')
+        elif self.path.startswith('/dictionary'):
+            query = dict(p.split('=') for p in self.path.split('?')[1].split('&'))
+            offset, limit = int(query['offset']), int(query['limit'])
+            self._send(200, {'header': {'total': 25},
+                             'data': [{'id': i} for i in range(offset, min(offset + limit, 25))]})
+        elif self.path.startswith('/task/state/'):
+            tid = self.path.split('/')[-1]
+            self.states[tid] += 1
+            status = 'DONE' if self.states[tid] > 2 else 'IN_PROGRESS'
+            self._send(200, {'taskId': tid, 'taskStatus': status, 'taskProcessingTimeSec': 1})
+        elif self.path.startswith('/task/result/'):
+            self._send(200, {'taskId': self.path.split('/')[-1], 'data': [1, 2, 3]})
+        else:
+            self._send(404, 'not found')
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+@pytest.fixture(scope='module')
+def stub_url():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def anet(stub_url):
+    from mediascope_api.core import async_net
+    return async_net.AsyncMediascopeApiNetwork(cache_enabled=False, username='user', passw='passw',
+                                               root_url=stub_url, client_id='client', client_secret='secret',
+                                               keycloak_url=stub_url + '/token')
+
+
+def test_send_request_lo(anet):
+    async def run():
+        async with anet:
+            return await anet.send_request_lo('get', '/dictionary/test', limit=10)
+    result = asyncio.run(run())
+    assert result['header']['total'] == 25
+    assert [i['id'] for i in result['data']] == list(range(25))
+
+
+def test_wait_tasks(anet):
+    from mediascope_api.core import async_net
+
+    async def get_state(tid):
+        obj = await anet.send_request('get', f'/task/state/{tid}')
+        return obj['taskStatus'], obj
+
+    async def run():
+        async with anet:
+            tsks = [{'task': await anet.send_request('post', '/task/timeband', '{}')} for _ in range(20)]
+            tsks = await async_net.wait_tasks(get_state, tsks, status_delay=0.01)
+            return tsks, await anet.send_request('get', f'/task/result/{tsks[0]["task"]["taskId"]}')
+
+    tsks, result = asyncio.run(run())
+    assert all(t['task']['message'] == 'DONE' for t in tsks)
+    assert result['data'] == [1, 2, 3]
+
+
+def test_several_event_loops(anet):
+    # сетевой модуль используется в нескольких вызовах asyncio.run без закрытия пула соединений
+    tsk = asyncio.run(anet.send_request('post', '/task/timeband', '{}'))
+    state = asyncio.run(anet.send_request('get', f'/task/state/{tsk["taskId"]}'))
+    assert state['taskId'] == tsk['taskId']
+    assert len(anet._loop_states) == 1
+
+
+def test_from_network_shares_token(stub_url):
+    from mediascope_api.core import async_net
+    from mediascope_api.core import net
+    network = net.MediascopeApiNetwork(cache_enabled=False, username='user', passw='passw', root_url=stub_url,
+                                       client_id='client', client_secret='secret', keycloak_url=stub_url + '/token')
+    anet = async_net.AsyncMediascopeApiNetwork.from_network(network)
+    assert anet.token_manager is network.token_manager
+
+    async def run():
+        async with anet:
+            await anet.refresh_token()
+    asyncio.run(run())
+    # токен, полученный асинхронным модулем, используется исходным без повторной авторизации
+    assert network.token is anet.token
+    assert network.token_manager.is_valid(network.token)
+
+
+@pytest.mark.parametrize('error', [None, ValueError('failed')])
+def test_single_flight_async(anet, error):
+    result = {'header': {'total': 1}, 'data': [{'id': 1}]}
+    calls = []
+
+    async def send():
+        calls.append(1)
+        # остальные задачи начинают ожидать результат, пока выполняется запрос
+        await asyncio.sleep(0.05)
+        if error is not None:
+            raise error
+        return result
+
+    async def run():
+        results = await asyncio.gather(*[anet._single_flight_async('key', send) for _ in range(8)],
+                                       return_exceptions=True)
+        return results, dict(anet._get_loop_state()['in_flight'])
+
+    results, in_flight = asyncio.run(run())
+    assert len(calls) == 1
+    assert in_flight == {}
+    if error is not None:
+        assert all(r is error for r in results)
+    else:
+        assert results[0] is result
+        for r in results[1:]:
+            assert r == result and r is not result and r['data'] is not result['data']
@@ -0,0 +1,94 @@
+import time
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import availability
+from mediascope_api.core import cache
+from mediascope_api.core import net
+from mediascope_api.core import results
+from mediascope_api.core import sql
+from mediascope_api.core import tasks
+
+
+class FakeNetwork:
+    def __init__(self):
+        self.cache_backend = cache.MemoryCacheBackend()
+        self.cache_in_as_set = False
+        self.username = 'user'
+
+
+def build_task(date_from, date_to):
+    tsk = {'filter': {}}
+    tasks.TaskBuilder.add_range_filter(tsk, [(date_from, date_to)])
+    return tasks.Task(tsk)
+
+
+def test_get_period():
+    assert availability.get_period(build_task('2024-01-01', '2024-02-01')) == ('2024-01-01', '2024-02-01')
+    assert availability.get_period(build_task('2024-01-01', '2024-02-01').body) == ('2024-01-01', '2024-02-01')
+    assert availability.get_period({'filter': {}}) is None
+
+    def period(text):
+        return availability.get_period({'filter': {'dateFilter': sql.sql_to_json(text)}, 'task_type': 'simple'})
+
+    assert period("researchDate >= '2024-01-01'") is None
+    assert period("researchDate != '2024-01-01'") is None
+    assert period("researchDate nin ('2024-01-01')") is None
+    assert period("researchDate = '2024-01-01' or sex = 1") is None
+    assert period("researchDate >= '2024-01-01' and researchDate <= '2024-01-31' and sex = 1") == \
+        ('2024-01-01', '2024-01-31')
+    assert period("researchDate in ('2024-01-03', '2024-01-01') or researchDate = '2024-02-01'") == \
+        ('2024-01-01', '2024-02-01')
+    assert period("researchDate < '2024-01-31' and researchDate != '2024-01-05'") == (None, '2024-01-31')
+    assert availability.is_closed(period("researchDate >= '2024-01-01'"), '2024-06-30') is False
+
+
+def test_get_published_until():
+    assert availability.get_published_until([
+        {'id': 1, 'from': '2020-01-01', 'to': '2024-03-31'},
+        {'id': 2, 'periodFrom': '2020-01-01', 'periodTo': '2024-05-01'}
+    ]) == '2024-03-31'
+    assert availability.get_published_until(None) is None
+
+
+def test_result_cache_closed_period():
+    rc = results.ResultCache(FakeNetwork(), 'test', ttl=0.1)
+    closed = build_task('2024-01-01', '2024-03-31')
+    opened = build_task('2024-03-01', '2024-04-30')
+    for tsk in (closed, opened):
+        rc.save(tsk, '1', {'data': []}, [{'from': '2020-01-01', 'to': '2024-03-31'}])
+    time.sleep(0.2)
+    assert rc.get(closed) is not None
+    assert rc.get(opened) is None
+
+
+def test_submit_or_reuse_availability_before_submit():
+    rc = results.ResultCache(FakeNetwork(), 'test')
+    published = [{'from': '2020-01-01', 'to': '2024-03-31'}]
+
+    def send_task(tsk):
+        # данные опубликованы во время расчета
+        published[0] = {'from': '2020-01-01', 'to': '2024-04-30'}
+        return {'taskId': '1'}
+
+    tsk = build_task('2024-03-01', '2024-04-30')
+    rc.submit_or_reuse(tsk, send_task, lambda t: t, lambda t: {'data': []}, lambda: list(published))
+    assert rc.get(tsk)['availability'] == [{'from': '2020-01-01', 'to': '2024-03-31'}]
+
+
+def test_network_cache_published_until_at_request():
+    network = net.MediascopeApiNetwork(username='user', passw='pass', root_url='https://api', client_id='id',
+                                       client_secret='secret', keycloak_url='https://auth',
+                                       cache_backend=cache.MemoryCacheBackend(ttl=0.1))
+    body = build_task('2024-03-01', '2024-03-31').body
+    period = availability.get_period(body)
+    opened = cache.get_query('post', '/opened', body)
+    closed = cache.get_query('post', '/closed', body)
+    network._save_cache(opened, {'data': 1}, period, '2024-02-29')
+    network._save_cache(closed, {'data': 2}, period, '2024-03-31')
+    # данные опубликованы после запроса: результат, полученный до публикации, устаревает как обычно
+    network.set_published_until('2024-12-31')
+    time.sleep(0.2)
+    assert network._get_cache(opened, '/opened', data=body) is None
+    assert network._get_cache(closed, '/closed', data=body) == {'data': 2}
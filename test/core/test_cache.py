@@ -0,0 +1,132 @@
+import json
+import time
+import pytest
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import cache
+
+
+@pytest.fixture(params=['file', 'memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'file':
+        return cache.FileCacheBackend(str(tmp_path))
+    if request.param == 'memory':
+        return cache.MemoryCacheBackend()
+    return cache.SqliteCacheBackend(str(tmp_path / 'cache.sqlite'))
+
+
+def test_get_set(backend):
+    key = cache.get_key('get\n/dictionary/tv/region\n[]', 'user')
+    assert backend.get(key) is None
+    backend.set(key, {'header': {'total': 1}, 'data': [{'id': 1}]})
+    assert backend.get(key) == {'header': {'total': 1}, 'data': [{'id': 1}]}
+    backend.delete(key)
+    assert backend.get(key) is None
+
+
+def test_ttl(backend):
+    backend.set('key', [1, 2, 3])
+    assert backend.get('key', ttl=60) == [1, 2, 3]
+    time.sleep(0.05)
+    assert backend.get('key', ttl=0.01) is None
+
+
+def test_clear(backend):
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.clear()
+    assert backend.get('a') is None and backend.get('b') is None
+
+
+@pytest.mark.parametrize('backend_cls', [cache.MemoryCacheBackend, cache.SqliteCacheBackend])
+def test_eviction(backend_cls, tmp_path):
+    value = {'data': 'x' * 100}
+    if backend_cls is cache.SqliteCacheBackend:
+        backend = backend_cls(str(tmp_path / 'cache.sqlite'), max_bytes=350)
+    else:
+        backend = backend_cls(max_bytes=350)
+    backend.set('a', value)
+    backend.set('b', value)
+    backend.set('c', value)
+    # обращение к 'a' делает ее последней использованной, вытесняется 'b'
+    assert backend.get('a') == value
+    backend.set('d', value)
+    assert backend.get('b') is None
+    assert backend.get('a') == value
+    assert backend.get('d') == value
+
+
+@pytest.mark.parametrize('codec', [cache.CODEC_JSON, cache.CODEC_JSON_ZLIB, cache.CODEC_MSGPACK_ZSTD, cache.CODEC_AUTO])
+def test_codecs(codec):
+    if codec == cache.CODEC_MSGPACK_ZSTD and cache.msgpack is None:
+        pytest.skip('msgpack и zstandard не установлены')
+    value = {'header': {'total': 2}, 'data': [{'id': 1, 'name': 'Москва', 'v': 1.5, 'n': None}] * 5000}
+    data = cache.dumps(value, codec)
+    assert cache.loads(data) == value
+    if codec != cache.CODEC_JSON:
+        assert data.startswith(cache.MAGIC)
+        assert len(data) < len(json.dumps(value))
+
+
+def test_legacy_json_file(tmp_path):
+    backend = cache.FileCacheBackend(str(tmp_path))
+    key = cache.get_key('get\n/dictionary/tv/region\n[]')
+    with open(tmp_path / (key + '.cache'), 'w', encoding='utf-8') as f:
+        json.dump({'data': [1, 2]}, f)
+    assert backend.get(key) == {'data': [1, 2]}
+
+
+def test_query_key_ordering():
+    q1 = cache.get_query('post', '/dictionary/tv/region?b=2&a=1', '{"filter": {"x": 1, "y": [1, 2]}}')
+    q2 = cache.get_query('post', '/dictionary/tv/region?a=1&b=2', {'filter': {'y': [1, 2], 'x': 1}})
+    assert q1 == q2
+    assert cache.get_query('post', '/a', {'y': [2, 1]}) != q2
+
+
+def test_query_key_in_as_set():
+    from mediascope_api.core import tasks
+    f1 = {'unit': 'programId', 'relation': 'IN', 'value': [3, 1, 2, 1]}
+    f2 = tasks.Task({'unit': 'programId', 'relation': 'IN', 'value': [1, 2, 3]})
+    assert cache.get_query('post', '/task', f1) != cache.get_query('post', '/task', f2)
+    assert cache.get_query('post', '/task', f1, True) == cache.get_query('post', '/task', f2, True)
+
+
+def test_store_created(backend):
+    backend.store('key', [1], time.time() - 120)
+    assert backend.get('key', ttl=60) is None
+    assert backend.get('key', ttl=180) == [1]
+
+
+def test_memory_copy():
+    backend = cache.MemoryCacheBackend()
+    backend.set('key', {'data': [1]})
+    backend.get('key')['data'].append(2)
+    assert backend.get('key') == {'data': [1]}
+
+
+@pytest.mark.parametrize('content', [b'{"data": [1, 2', cache.MAGIC + b'\x01broken', b'\xff\xfe'])
+def test_file_corrupted(tmp_path, content):
+    backend = cache.FileCacheBackend(str(tmp_path))
+    with open(tmp_path / 'key.cache', 'wb') as f:
+        f.write(content)
+    assert backend.get('key') is None
+    assert backend.load('key') is None
+    backend.set('key', {'data': [1]})
+    assert backend.get('key') == {'data': [1]}
+
+
+def test_file_store_replace(tmp_path):
+    backend = cache.FileCacheBackend(str(tmp_path))
+    backend.set('key', {'data': [1]})
+    backend.set('key', {'data': [2]})
+    assert backend.get('key') == {'data': [2]}
+    # временные файлы не остаются в каталоге кэша
+    assert [f.name for f in tmp_path.iterdir()] == ['key.cache']
+
+
+def test_memory_size_bytes():
+    backend = cache.MemoryCacheBackend()
+    backend.set('key', {'name': 'Москва'})
+    assert backend.size == len(json.dumps({'name': 'Москва'}, ensure_ascii=False).encode('utf-8'))
@@ -0,0 +1,130 @@
+import pytest
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import filters
+from mediascope_api.core import sql
+from mediascope_api.core import tasks
+
+
+def test_same_as_sql():
+    flt = filters.And(filters.In('regionId', [1, 2]), filters.Range('age', 18, 44), 'sex = 1 or sex = 2')
+    assert flt.to_json() == sql.sql_to_json('regionId in (1, 2) and (age >= 18 and age <= 44) and (sex = 1 or sex = 2)')
+    assert sql.sql_to_json(flt.to_sql()) == flt.to_json()
+
+
+def test_operators():
+    flt = filters.Eq('a', "it's") | filters.NotIn('b', [1, 2])
+    assert flt.to_json() == {
+        'elements': [
+            {'unit': 'a', 'relation': 'EQ', 'value': "it's"},
+            {'unit': 'b', 'relation': 'NIN', 'value': [1, 2]}
+        ],
+        'operand': 'OR'
+    }
+    assert flt.to_sql() == "a = 'it''s' or b nin (1, 2)"
+
+
+def test_from_json():
+    data = sql.sql_to_json('a = 1 and (b in (1, 2) or c != 3)')
+    assert sql.from_json(data).to_json() == data
+    assert sql.sql_to_units(data) == ['a', 'b', 'c']
+
+
+def test_add_filter():
+    tsk = {'filter': {}}
+    tasks.TaskBuilder.add_filter(tsk, {'operand': 'OR', 'elements': []}, 'demoFilter')
+    tasks.TaskBuilder.add_filter(tsk, filters.Eq('sex', 1), 'baseDemoFilter')
+    assert tsk['filter'] == {
+        'demoFilter': {'operand': 'OR', 'elements': []},
+        'baseDemoFilter': {'elements': [{'unit': 'sex', 'relation': 'EQ', 'value': 1}], 'operand': 'OR'}
+    }
+    tasks.TaskBuilder.add_filter(tsk, 'sex = 1 and sex = 2', 'demoFilter')
+    assert tsk['filter']['demoFilter'] == sql.sql_to_json('sex = 1 and sex = 2')
+
+
+def test_combine():
+    assert filters.combine('AND', None, 'a = 1') == filters.Eq('a', 1)
+    assert filters.combine('OR', None) is None
+    assert filters.combine('and', 'a = 1', filters.Eq('b', 2)).to_sql() == 'a = 1 and b = 2'
+
+
+def _match(node, row):
+    if isinstance(node, sql.ConditionGroup):
+        results = [_match(i, row) for i in node.items]
+        return all(results) if node.operand == 'AND' else any(results)
+    v = row[node.unit]
+    try:
+        return _compare(node, v)
+    except TypeError:
+        # несравнимые значения (строка и число) условию не соответствуют
+        return False
+
+
+def _compare(node, v):
+    return {
+        'EQ': lambda: v == node.value,
+        'NEQ': lambda: v != node.value,
+        'GT': lambda: v > node.value,
+        'GTE': lambda: v >= node.value,
+        'LT': lambda: v < node.value,
+        'LTE': lambda: v <= node.value,
+        'IN': lambda: v in node.value,
+        'NIN': lambda: v not in node.value,
+    }[node.relation]()
+
+
+def _random_value(rnd):
+    # значения разных типов: числа и строки, несравнимые с границами диапазонов
+    return rnd.choice([0, 1, 2, 3, 4, 'x'])
+
+
+def _random_filter(rnd, depth=0):
+    if depth > 2 or rnd.random() < 0.4:
+        unit = rnd.choice('ab')
+        relation = rnd.choice(['EQ', 'NEQ', 'GT', 'GTE', 'LT', 'LTE', 'IN', 'NIN'])
+        if relation in ('IN', 'NIN'):
+            return sql.Condition(unit, relation, tuple(_random_value(rnd) for _ in range(rnd.randint(1, 3))))
+        if relation in ('EQ', 'NEQ'):
+            return sql.Condition(unit, relation, _random_value(rnd))
+        return sql.Condition(unit, relation, rnd.randint(0, 4))
+    items = [_random_filter(rnd, depth + 1) for _ in range(rnd.randint(1, 4))]
+    return sql.ConditionGroup(rnd.choice(['AND', 'OR']), items)
+
+
+def test_optimize_same_result():
+    import itertools
+    import random
+    rows = [{'a': a, 'b': b} for a, b in itertools.product(list(range(-1, 6)) + ['x', 'y'], repeat=2)]
+    rnd = random.Random(5)
+    for _ in range(2000):
+        node = _random_filter(rnd)
+        expected = [_match(node, row) for row in rows]
+        try:
+            optimized = filters.optimize(node, strict=True)
+        except ValueError:
+            assert not any(expected), node
+            continue
+        assert [_match(optimized, row) for row in rows] == expected, (node, optimized)
+
+
+def test_optimize():
+    assert filters.optimize_filter('((a = 1 or a in (2, 3, 2)) and (b = 1 and (c >= 1 and c > 2 and c <= 5)))') == {
+        'elements': [
+            {'unit': 'a', 'relation': 'IN', 'value': [1, 2, 3]},
+            {'unit': 'b', 'relation': 'EQ', 'value': 1},
+            {'unit': 'c', 'relation': 'GT', 'value': 2},
+            {'unit': 'c', 'relation': 'LTE', 'value': 5}
+        ],
+        'operand': 'AND'
+    }
+    assert filters.optimize('a in (1, 2, 3) and a nin (2) and a < 3') == filters.Eq('a', 1)
+    assert filters.optimize("d >= '2024-01-01' and d <= '2024-01-01'") == filters.Eq('d', '2024-01-01')
+    assert filters.optimize('(a = 1 and a = 2) or b = 1') == filters.Eq('b', 1)
+    assert filters.optimize("a in (2, 'x') and a >= 1 and a <= 1") == \
+        filters.And(filters.In('a', [2, 'x']), filters.Eq('a', 1))
+    # условие без записей передается без упрощения, ошибка возникает только при strict=True
+    assert filters.optimize('a = 1 and a > 1 and a > 1') == filters.And('a = 1', 'a > 1', 'a > 1')
+    with pytest.raises(ValueError):
+        filters.optimize('a = 1 and a > 1', strict=True)
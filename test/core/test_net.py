@@ -0,0 +1,171 @@
+import io
+import threading
+import time
+import pytest
+from requests import Request, Response
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import errors
+from mediascope_api.core import net
+from mediascope_api.core import ratelimit
+
+COUNT_ENDPOINT = net.MediascopeApiNetwork.ACTIVE_TASKS_COUNT_ENDPOINT
+
+
+class FakeNetwork(net.MediascopeApiNetwork):
+    # ответы точек API задаются списками: исключение возникает, остальные значения возвращаются
+    def __init__(self, responses):
+        super().__init__(username='user', passw='pass', root_url='https://api', client_id='id',
+                         client_secret='secret', keycloak_url='https://auth', cache_enabled=False)
+        self.submit_retries.backoff_factor = 0
+        self.responses = responses
+        self.calls = []
+
+    def send_request(self, method, endpoint, data=None, use_cache=False):
+        self.calls.append(endpoint)
+        response = self.responses[endpoint].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_send_task_success():
+    network = FakeNetwork({'/task/simple': [{'taskId': '1'}], COUNT_ENDPOINT: [{'count': 2}]})
+    assert network.send_task_request('/task/simple', '{}') == {'taskId': '1'}
+    assert network.calls == [COUNT_ENDPOINT, '/task/simple']
+
+    network = FakeNetwork({'/task/simple': [{'taskId': '1'}]})
+    assert network.send_task_request('/task/simple', '{}', retries=0) == {'taskId': '1'}
+    assert network.calls == ['/task/simple']
+
+
+def test_send_task_ambiguous():
+    # количество активных задач не изменилось: задание не принято и отправляется повторно
+    network = FakeNetwork({'/task/simple': [errors.ServerError('', 502), {'taskId': '1'}],
+                           COUNT_ENDPOINT: [{'count': 2}, {'count': 2}]})
+    assert network.send_task_request('/task/simple', '{}') == {'taskId': '1'}
+    assert network.calls == [COUNT_ENDPOINT, '/task/simple', COUNT_ENDPOINT, '/task/simple']
+
+    # количество активных задач увеличилось: задание могло быть принято
+    network = FakeNetwork({'/task/simple': [errors.ServerError('', 502)],
+                           COUNT_ENDPOINT: [{'count': 2}, {'count': 3}]})
+    with pytest.raises(errors.TaskSubmitError):
+        network.send_task_request('/task/simple', '{}')
+
+    # количество активных задач не удалось получить
+    network = FakeNetwork({'/task/simple': [errors.ServerError('', 502)],
+                           COUNT_ENDPOINT: [{'count': 0}, errors.ServerError('', 500)]})
+    with pytest.raises(errors.TaskSubmitError):
+        network.send_task_request('/task/simple', '{}')
+
+    # повторные отправки исчерпаны
+    network = FakeNetwork({'/task/simple': [errors.ServerError('', 502)]})
+    with pytest.raises(errors.TaskSubmitError):
+        network.send_task_request('/task/simple', '{}', retries=0)
+
+
+def test_send_task_without_count_endpoint():
+    network = FakeNetwork({'/task/simple': [errors.ServerError('', 504), {'taskId': '1'}],
+                           COUNT_ENDPOINT: [errors.NotFoundError('', 404)]})
+    assert network.send_task_request('/task/simple', '{}') == {'taskId': '1'}
+    assert network.calls == [COUNT_ENDPOINT, '/task/simple', '/task/simple']
+
+
+class FakeAdapter(net.MediascopeHTTPAdapter):
+    # ответы задаются списком кодов статуса
+    def __init__(self, statuses):
+        super().__init__(rate_limiter=ratelimit.RateLimiter('https://api'))
+        self.statuses = statuses
+        self.sent = 0
+
+    def _send(self, request, stream, timeout, verify, cert, proxies):
+        self.sent += 1
+        resp = Response()
+        resp.status_code = self.statuses.pop(0)
+        resp.raw = io.BytesIO()
+        resp.headers['Retry-After'] = '0'
+        return resp
+
+
+def test_adapter_too_many_requests():
+    adapter = FakeAdapter([429, 200])
+    resp = adapter.send(Request('GET', 'https://api/dictionary/tv/region').prepare())
+    assert resp.status_code == 200 and adapter.sent == 2
+
+    # ответ 429 на отправку задания (лимит активных задач) возвращается вызывающему коду
+    adapter = FakeAdapter([429, 200])
+    resp = adapter.send(Request('POST', 'https://api/task/simple').prepare())
+    assert resp.status_code == 429 and adapter.sent == 1
+    assert adapter.rate_limiter.get_stats() == {}
+
+
+class CountingEvent(threading.Event):
+    # количество потоков, ожидающих завершения запроса
+    def __init__(self):
+        super().__init__()
+        self.waiters = 0
+
+    def wait(self, timeout=None):
+        self.waiters += 1
+        return super().wait(timeout)
+
+
+class CountingCall(net._InFlightCall):
+    def __init__(self):
+        super().__init__()
+        self.done = CountingEvent()
+
+
+def run_single_flight(monkeypatch, result=None, error=None, callers=8):
+    monkeypatch.setattr(net, '_InFlightCall', CountingCall)
+    network = FakeNetwork({})
+    calls = []
+
+    def send():
+        calls.append(1)
+        # запрос завершается, когда остальные потоки ожидают его результата
+        call = network._in_flight['key']
+        while call.done.waiters < callers - 1:
+            time.sleep(0.001)
+        if error is not None:
+            raise error
+        return result
+
+    results = [None] * callers
+
+    def run(i):
+        try:
+            results[i] = network._single_flight('key', send)
+        except Exception as e:
+            results[i] = e
+
+    leader = threading.Thread(target=run, args=(0,))
+    leader.start()
+    while 'key' not in network._in_flight:
+        time.sleep(0.001)
+    followers = [threading.Thread(target=run, args=(i,)) for i in range(1, callers)]
+    for t in followers:
+        t.start()
+    for t in [leader] + followers:
+        t.join(10)
+    return network, calls, results
+
+
+def test_single_flight(monkeypatch):
+    result = {'header': {'total': 1}, 'data': [{'id': 1}]}
+    network, calls, results = run_single_flight(monkeypatch, result=result)
+    assert len(calls) == 1
+    assert results[0] is result
+    for r in results[1:]:
+        assert r == result and r is not result and r['data'] is not result['data']
+    assert network._in_flight == {}
+
+
+def test_single_flight_error(monkeypatch):
+    error = errors.ServerError('', 500)
+    network, calls, results = run_single_flight(monkeypatch, error=error)
+    assert len(calls) == 1
+    assert all(r is error for r in results)
+    assert network._in_flight == {}
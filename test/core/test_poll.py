@@ -0,0 +1,69 @@
+import pytest
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import poll
+
+
+@pytest.fixture(autouse=True)
+def history():
+    poll._durations.clear()
+    poll._task_types.clear()
+    yield
+    poll._durations.clear()
+    poll._task_types.clear()
+
+
+def test_delay_growth_and_cap():
+    scheduler = poll.PollScheduler(min_delay=0.5, max_delay=2, factor=2, jitter=0)
+    assert [scheduler.next_delay() for _ in range(5)] == [0.5, 1, 2, 2, 2]
+
+
+def test_jitter_bounds():
+    scheduler = poll.PollScheduler(min_delay=1, max_delay=1, jitter=0.2)
+    delays = [scheduler.next_delay() for _ in range(200)]
+    assert all(0.8 <= d <= 1.2 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_fixed_delay():
+    poll.register_task('1', 'mediavortex:timeband')
+    poll.record_duration('1', 100)
+    poll.register_task('2', 'mediavortex:timeband')
+    scheduler = poll.PollScheduler(['2'], fixed_delay=3)
+    assert [scheduler.next_delay() for _ in range(4)] == [3, 3, 3, 3]
+
+
+def test_seed_from_expected_duration():
+    poll.register_task('1', 'mediavortex:timeband')
+    poll.record_duration('1', 10)
+    poll.register_task('2', 'mediavortex:timeband')
+    poll.register_task('3', 'mediavortex:simple')
+    assert poll.get_expected_duration(['2', '3']) == 10
+    assert poll.get_expected_duration(['3']) is None
+
+    scheduler = poll.PollScheduler(['2', '3'], jitter=0)
+    # первый опрос незадолго до ожидаемого окончания расчета, далее задержка растет от 10% ожидаемого времени
+    assert scheduler.next_delay() == pytest.approx(8)
+    assert scheduler.next_delay() == pytest.approx(1.5)
+    assert scheduler.next_delay() == pytest.approx(2.25)
+
+
+def test_record_duration_ema():
+    for tid, duration in [('1', 10), ('2', 20), ('3', 'bad'), ('4', 40)]:
+        poll.register_task(tid, 'crossweb:media')
+        poll.record_duration(tid, duration)
+    # 10 -> 0.5 * 20 + 0.5 * 10 = 15 -> 0.5 * 40 + 0.5 * 15 = 27.5, некорректное значение не учитывается
+    assert poll._durations['crossweb:media'] == pytest.approx(27.5)
+    # время расчета учитывается один раз, тип задания удаляется
+    poll.record_duration('4', 1000)
+    assert poll._durations['crossweb:media'] == pytest.approx(27.5)
+    assert len(poll._task_types) == 0
+
+
+def test_task_types_bounded(monkeypatch):
+    monkeypatch.setattr(poll, 'MAX_TASKS', 3)
+    for tid in range(5):
+        poll.register_task(str(tid), 'counter:daily-task')
+    assert list(poll._task_types) == ['2', '3', '4']
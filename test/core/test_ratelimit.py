@@ -0,0 +1,59 @@
+import time
+import pytest
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import ratelimit
+
+
+def test_token_bucket_rate():
+    bucket = ratelimit.TokenBucket(20, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.45
+
+
+def test_token_bucket_throttled():
+    bucket = ratelimit.TokenBucket(10)
+    bucket.on_throttled(0.3)
+    assert bucket.rate == 5
+    assert bucket.reserve() >= 0.25
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 10
+
+
+def test_get_retry_after():
+    assert ratelimit.get_retry_after({'Retry-After': '3'}, 0) == 3
+    assert ratelimit.get_retry_after({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, 0) == 0
+    assert ratelimit.get_retry_after({}, 2) == 4
+
+
+def test_get_group():
+    limiter = ratelimit.RateLimiter('https://api.example.com/mediavortex')
+    assert limiter.get_group('POST', 'https://api.example.com/mediavortex/task/simple') == 'task'
+    assert limiter.get_group('GET', 'https://api.example.com/mediavortex/task/state/1') == 'state'
+    assert limiter.get_group('GET', 'https://api.example.com/mediavortex/task/result/1') == 'dictionary'
+    assert limiter.get_group('POST', 'https://api.example.com/mediavortex/daily-task') == 'task'
+    assert limiter.get_group('POST', 'https://auth.example.com/token') is None
+    with pytest.raises(ValueError):
+        limiter.set_rates({'unknown': 1})
+
+
+def test_unlimited_until_throttled():
+    limiter = ratelimit.RateLimiter('https://api.example.com/counter')
+    url = 'https://api.example.com/counter/daily-task'
+    assert limiter.get_bucket('POST', url) is None
+    bucket = limiter.get_throttled_bucket('POST', url)
+    assert bucket.max_rate == ratelimit.THROTTLED_RATES['task']
+    assert limiter.get_bucket('POST', url) is bucket
+    assert limiter.get_bucket('GET', 'https://api.example.com/counter/dictionary') is None
+
+
+def test_task_submit_not_retryable():
+    limiter = ratelimit.RateLimiter('https://api.example.com/mediavortex')
+    assert not limiter.is_retryable('POST', 'https://api.example.com/mediavortex/task/simple')
+    assert limiter.is_retryable('GET', 'https://api.example.com/mediavortex/task/state/1')
+    assert limiter.is_retryable('GET', 'https://api.example.com/mediavortex/dictionary/tv/region')
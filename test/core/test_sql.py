@@ -0,0 +1,249 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import sql
+
+
+CASES = [
+    "a = 1",
+    "(a = 1)",
+    "((a=1))",
+    "a != 'x'",
+    "a >= -1 AND b <= +2 and c > 1. and d < .5",
+    "a = 1 or b = 2 and c = 3",
+    "a = 1 and b = 2 or c = 3",
+    "(a = 1 or b = 2) and c = 3",
+    "a IN (1, 2, 3) Or b NotIn ('x', \"y\") AND c nin (1.5)",
+    "demo.sex = 1 and demo.age in (18,19,20)",
+    "a = b.c",
+    "a in (b, c)",
+    "a$1_b = 'it''s'",
+    "a = 'x\\'y'",
+    "a = 1 -- comment\n and b = 2",
+    "-- leading comment\na = 1",
+    "a = 1 --",
+    "\t a \n=\r 1 ",
+    # условия, которые быстрый парсер передает pyparsing
+    "a = 1 b = 2",
+    "a = 1and b = 2",
+    "a = 1.5.3",
+    "a in (b = 1)",
+    "a in ((1, 2))",
+    "and = 1",
+    "a = or",
+    "a == 1",
+    "a = 1 and",
+    "a in ()",
+    "",
+    "a = 'unterminated",
+    "a = 1 - 2",
+    "a.1 = 2",
+    "_a = 1",
+]
+
+
+def _pyparsing(text):
+    try:
+        return repr(sql._parse_sql_pyparsing(text))
+    except (sql.pyparsing.ParseBaseException, IndexError) as e:
+        return type(e).__name__
+
+
+def _fast(text):
+    try:
+        return repr(sql._parse_sql_fast(text))
+    except sql._FastParseError:
+        return None
+
+
+def _check(text):
+    fast = _fast(text)
+    if fast is not None:
+        assert fast == _pyparsing(text), text
+    return fast is not None
+
+
+@pytest.mark.parametrize('text', CASES)
+def test_cases(text):
+    _check(text)
+
+
+def _random_value(rnd):
+    kind = rnd.randrange(8)
+    if kind == 0:
+        return str(rnd.randint(-1000, 100000))
+    if kind == 1:
+        return rnd.choice(['1.', '.5', '-2.25', '+3.0', '0.0', '+7'])
+    if kind == 2:
+        return "'" + rnd.choice(['', 'x', "it''s", 'a b', 'and', '--', 'Москва']) + "'"
+    if kind == 3:
+        return '"' + rnd.choice(['', 'y', 'a""b', 'or']) + '"'
+    return _random_name(rnd)
+
+
+def _random_name(rnd):
+    name = rnd.choice(['a', 'demoSex', 'age', 'x1', 'b_c', 'd$', 'Region'])
+    if rnd.random() < 0.2:
+        name += '.' + rnd.choice(['id', 'name', 'v2'])
+    return name
+
+
+def _random_keyword(rnd, word):
+    return ''.join(c.upper() if rnd.random() < 0.5 else c for c in word)
+
+
+def _random_space(rnd):
+    return rnd.choice([' ', ' ', '  ', '\n', '\t', ' -- note\n', ''])
+
+
+def _random_condition(rnd):
+    column = _random_name(rnd)
+    if rnd.random() < 0.5:
+        op = rnd.choice(['=', '!=', '>', '<', '>=', '<='])
+        return f'{column}{_random_space(rnd)}{op} {_random_value(rnd)}'
+    op = _random_keyword(rnd, rnd.choice(['in', 'notin', 'nin']))
+    values = ','.join(_random_space(rnd) + _random_value(rnd) for _ in range(rnd.randint(1, 6)))
+    return f'{column} {op} ({values})'
+
+
+def _random_expression(rnd, depth=0):
+    if depth > 3 or rnd.random() < 0.3:
+        expr = _random_condition(rnd)
+    else:
+        parts = [_random_expression(rnd, depth + 1) for _ in range(rnd.randint(2, 4))]
+        expr = ''
+        for i, part in enumerate(parts):
+            if i > 0:
+                expr += f' {_random_keyword(rnd, rnd.choice(["and", "or"]))} '
+            expr += part
+    if rnd.random() < 0.3:
+        expr = f'({_random_space(rnd)}{expr}{_random_space(rnd)})'
+    return expr
+
+
+def _mutate(rnd, text):
+    pos = rnd.randrange(len(text) + 1)
+    kind = rnd.randrange(3)
+    if kind == 0:
+        return text[:pos] + text[pos + 1:]
+    if kind == 1:
+        return text[:pos] + rnd.choice('()=,\'" -.1aA!<>') + text[pos:]
+    return text[:pos] + text[pos:pos + 1] * 2 + text[pos + 1:]
+
+
+def test_fuzz_valid():
+    rnd = random.Random(20241017)
+    for _ in range(300):
+        text = _random_expression(rnd)
+        assert _check(text), text
+
+
+def test_fuzz_mutated():
+    rnd = random.Random(42)
+    for _ in range(600):
+        text = _random_expression(rnd)
+        for _ in range(rnd.randint(1, 3)):
+            text = _mutate(rnd, text)
+        _check(text)
+
+
+def test_sql_to_json_same_as_pyparsing():
+    rnd = random.Random(7)
+    texts = [t for t in CASES[:18]] + [_random_expression(rnd) for _ in range(100)]
+    try:
+        sql.USE_FAST_PARSER = False
+        sql.parse_sql.cache_clear()
+        expected = [repr(sql.sql_to_json(t)) for t in texts]
+    finally:
+        sql.USE_FAST_PARSER = True
+        sql.parse_sql.cache_clear()
+    assert [repr(sql.sql_to_json(t)) for t in texts] == expected
+
+
+# результаты sql_to_json до появления кэша и быстрого парсера
+BASELINE = [
+    ("a = 1", {'elements': [{'unit': 'a', 'relation': 'EQ', 'value': 1}], 'operand': 'OR'}),
+    ("a != 'x'", {'elements': [{'unit': 'a', 'relation': 'NEQ', 'value': 'x'}], 'operand': 'OR'}),
+    ("a >= -1 AND b <= +2 and c > 1. and d < .5", {
+        'elements': [{'unit': 'a', 'relation': 'GTE', 'value': -1}, {'unit': 'b', 'relation': 'LTE', 'value': 2},
+                     {'unit': 'c', 'relation': 'GT', 'value': 1.0}, {'unit': 'd', 'relation': 'LT', 'value': 0.5}],
+        'operand': 'AND'}),
+    ("a = 1 or b = 2 and c = 3", {
+        'elements': [{'unit': 'a', 'relation': 'EQ', 'value': 1}], 'operand': 'OR',
+        'children': [{'elements': [{'unit': 'b', 'relation': 'EQ', 'value': 2},
+                                   {'unit': 'c', 'relation': 'EQ', 'value': 3}], 'operand': 'AND'}]}),
+    ("(a = 1 or b = 2) and c = 3", {
+        'children': [{'elements': [{'unit': 'a', 'relation': 'EQ', 'value': 1},
+                                   {'unit': 'b', 'relation': 'EQ', 'value': 2}], 'operand': 'OR'}],
+        'operand': 'AND', 'elements': [{'unit': 'c', 'relation': 'EQ', 'value': 3}]}),
+    ("a in (1, 2, 3) and c nin (1.5)", {
+        'elements': [{'unit': 'a', 'relation': 'IN', 'value': [1, 2, 3]},
+                     {'unit': 'c', 'relation': 'NIN', 'value': [1.5]}], 'operand': 'AND'}),
+    ("demo.sex = 1 and demo.age in (18,19,20)", {
+        'elements': [{'unit': 'demo.sex', 'relation': 'EQ', 'value': 1},
+                     {'unit': 'demo.age', 'relation': 'IN', 'value': [18, 19, 20]}], 'operand': 'AND'}),
+    ("a = 1 -- comment\n and b = 2", {
+        'elements': [{'unit': 'a', 'relation': 'EQ', 'value': 1}, {'unit': 'b', 'relation': 'EQ', 'value': 2}],
+        'operand': 'AND'}),
+    ("researchDate >= '2024-01-01' and researchDate <= '2024-01-31' and (regionId in (1, 2) or sex != 2)", {
+        'elements': [{'unit': 'researchDate', 'relation': 'GTE', 'value': '2024-01-01'},
+                     {'unit': 'researchDate', 'relation': 'LTE', 'value': '2024-01-31'}], 'operand': 'AND',
+        'children': [{'elements': [{'unit': 'regionId', 'relation': 'IN', 'value': [1, 2]},
+                                   {'unit': 'sex', 'relation': 'NEQ', 'value': 2}], 'operand': 'OR'}]}),
+]
+
+
+@pytest.mark.parametrize('text,expected', BASELINE)
+def test_sql_to_json_baseline(text, expected):
+    assert sql.sql_to_json(text) == expected
+    try:
+        sql.USE_FAST_PARSER = False
+        sql.parse_sql.cache_clear()
+        assert sql.sql_to_json(text) == expected
+    finally:
+        sql.USE_FAST_PARSER = True
+        sql.parse_sql.cache_clear()
+
+
+def test_pyparsing_threads():
+    rnd = random.Random(5)
+    texts = [_random_expression(rnd) for _ in range(200)]
+    expected = [sql._parse_sql_pyparsing(t) for t in texts]
+    with ThreadPoolExecutor(8) as executor:
+        assert list(executor.map(sql._parse_sql_pyparsing, texts)) == expected
+
+
+def test_cached_result_is_not_shared():
+    first = sql.sql_to_json('a in (1, 2) and b = 1')
+    first['elements'][0]['value'].append(3)
+    assert sql.sql_to_json('a in (1, 2) and b = 1') != first
+
+
+def test_downcase_same_as_pyparsing():
+    rnd = random.Random(11)
+    for _ in range(100):
+        text = _random_expression(rnd)
+        expected = sql._parse_sql_pyparsing(text, downcase=True)
+        assert sql._parse_sql_fast(text, downcase=True) == expected, text
+
+
+def test_sql_to_responsum():
+    result = sql.sql_to_responsum("SEX = 1 and (Age >= 18 or city notin ('Москва', Tver))", {'sex': 11})
+    assert result == {
+        'children': [
+            {'point': {'type': 11, 'val': 1}, 'operator': 'EQUAL', 'isNot': False},
+            {'children': [
+                {'point': {'type': 'age', 'val': 18}, 'operator': 'LESS', 'isNot': True},
+                {'children': [
+                    {'point': {'type': 'city', 'val': 'Москва'}, 'operator': 'EQUAL', 'isNot': False},
+                    {'point': {'type': 'city', 'val': 'tver'}, 'operator': 'EQUAL', 'isNot': False}
+                ], 'logic': 'OR', 'isNot': True}
+            ], 'logic': 'OR', 'isNot': False}
+        ],
+        'logic': 'AND',
+        'isNot': False
+    }
@@ -0,0 +1,47 @@
+import sys
+sys.path.insert(1, "../..")
+
+from mediascope_api.core import utils
+
+
+class Cats:
+    def __init__(self, network):
+        if getattr(self, 'network', None) is not network:
+            utils.reset_cached_properties(self)
+        self.network = network
+        self.loads = 0
+
+    @utils.cached_property
+    def units(self):
+        self.loads += 1
+        return f'units of {self.network}'
+
+
+def test_reset_cached_properties():
+    cats = Cats('alice')
+    assert cats.units == 'units of alice'
+    assert cats.units == 'units of alice'
+    assert cats.loads == 1
+
+    cats.__init__('alice')
+    assert cats.units == 'units of alice'
+    assert cats.loads == 0
+
+    cats.__init__('bob')
+    assert cats.units == 'units of bob'
+    assert cats.loads == 1
+
+
+def test_iter_pages_to_df():
+    pages = [{'header': {'total': 3}, 'data': [{'id': 1, 'name': 'a'}, {'id': 2}]},
+             {'header': {'total': 3}, 'data': []},
+             {'header': {'total': 3}, 'data': [{'id': 3, 'ename': 'c'}]}]
+    dfs = list(utils.iter_pages_to_df(iter(pages)))
+    assert len(dfs) == 2
+    assert list(dfs[0].columns) == ['id', 'name']
+    assert list(dfs[1].columns) == ['id', 'name', 'ename']
+    assert dfs[1]['name'].tolist() == ['']
+
+    dfs = list(utils.reindex_df(utils.iter_pages_to_df(iter(pages)), ['id', 'notes']))
+    assert [list(df.columns) for df in dfs] == [['id', 'notes'], ['id', 'notes']]
+    assert utils.reindex_df(dfs[0], ['notes'])['notes'].tolist() == ['', '']